@@ -0,0 +1,119 @@
+"""
+Two-tier cache for AI styling advice - exact LRU on the normalized question, then near-duplicate matching by embedding
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import numpy as np
+from metrics import REGISTRY
+from text_vectors import hash_embed
+
+# Words that flip what a question asks for; "t" is what is left of "don't", "isn't", ... after normalization
+NEGATIONS = frozenset({'not', 'no', 'never', 'nor', 'without', 'avoid', 'except', 't'})
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop punctuation so trivial variants share a key"""
+    return ' '.join(re.sub(r"[^\w\s]", ' ', str(question or '').lower()).split())
+
+
+def negations(normalized: str) -> frozenset:
+    """The negation words of a normalized question"""
+    return NEGATIONS.intersection(normalized.split())
+
+
+class AdviceCache:
+    """LRU of answered questions keyed by (normalized question, catalog version)
+
+    Tier 1 is an exact lookup on that key. On a miss, tier 2 compares the question's
+    embedding with every live entry for the same catalog version and negation words
+    (so "what not to wear" never reuses "what to wear") and reuses the closest answer
+    if its cosine similarity reaches similarity_threshold. Entries expire after
+    ttl_seconds; the least recently used are evicted past max_entries.
+    """
+
+    def __init__(self,
+                 max_entries: int = 512,
+                 similarity_threshold: float = 0.85,
+                 ttl_seconds: float = 6 * 3600,
+                 embed: Callable[[str], np.ndarray] = hash_embed):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.embed = embed
+        self.entries: "OrderedDict[tuple[str, object], Dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def get(self, question: str, catalog_version: object = None) -> Optional[str]:
+        """Return a cached answer for the question (or a near-duplicate of it), else None"""
+        key = (normalize_question(question), catalog_version)
+        now = time.time()
+        with self.lock:
+            self.expire(now)
+
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.exact_hits += 1
+                REGISTRY.inc('ai_stylist_cache_requests_total', cache='advice', result='hit')
+                return entry['answer']
+
+            negated = negations(key[0])
+            candidates = [(k, e) for k, e in self.entries.items()
+                          if k[1] == catalog_version and e['negations'] == negated]
+            if candidates and self.similarity_threshold <= 1.0:
+                vector = self.embed(key[0])
+                similarities = np.stack([e['vector'] for _, e in candidates]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    best_key = candidates[best][0]
+                    self.entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    REGISTRY.inc('ai_stylist_cache_requests_total', cache='advice', result='semantic_hit')
+                    return candidates[best][1]['answer']
+
+            self.misses += 1
+            REGISTRY.inc('ai_stylist_cache_requests_total', cache='advice', result='miss')
+            return None
+
+    def put(self, question: str, answer: str, catalog_version: object = None):
+        """Remember the answer to a question for this catalog version"""
+        normalized = normalize_question(question)
+        vector = self.embed(normalized)
+        with self.lock:
+            self.entries[(normalized, catalog_version)] = {
+                'answer': answer,
+                'vector': vector,
+                'negations': negations(normalized),
+                'created': time.time()
+            }
+            self.entries.move_to_end((normalized, catalog_version))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def expire(self, now: float):
+        """Drop entries older than the TTL"""
+        expired = [k for k, e in self.entries.items() if now - e['created'] > self.ttl_seconds]
+        for k in expired:
+            del self.entries[k]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit and miss counters for both tiers"""
+        with self.lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'exact_hits': self.exact_hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+            }
@@ -2,11 +2,12 @@
 Streamlit app for the AI Fashion Stylist
 """
 import streamlit as st
-import json
+import math
 import os
-from stylist_backend import AIStyler
+from catalog_service import CatalogService
 from import_google_sheets import import_from_google_sheets
-from enrich_with_gpt import ProductEnricher
+from enrichment_jobs import ACTIVE_STATES, CANCELLING, JobQueue, start_worker
+from metrics import REGISTRY, serve
 
 # Page configuration
 st.set_page_config(
@@ -16,6 +17,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Products per page in the Browse Catalog tab
+PAGE_SIZE = 20
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -98,15 +102,101 @@ def display_product(product):
         
         st.markdown('</div>', unsafe_allow_html=True)
 
+def facet_multiselect(label, facet, counts, selection, defaults):
+    """Multiselect over a facet's values, each labelled with its product count given the rest of the selection
+    
+    Values that would match nothing are hidden unless already selected.
+    """
+    facet_counts = counts.get(facet, {})
+    default = defaults.get(facet, [])
+    options = sorted(set(facet_counts) | set(selection.get(facet) or []) | set(default))
+    return st.multiselect(
+        label,
+        options,
+        default=default,
+        format_func=lambda value: f"{value} ({facet_counts.get(value, 0):,})",
+        key=f"rec-{facet}"
+    )
+
+@st.cache_resource
+def get_catalog_service():
+    """One catalog service per process, shared by every browser session, refreshed whenever the catalog file changes"""
+    service = CatalogService()
+    service.watch()
+    return service
+
+@st.cache_resource
+def get_job_queue():
+    """The enrichment job queue; jobs run in a worker process, not in any session"""
+    return JobQueue()
+
+def format_eta(seconds):
+    if seconds is None:
+        return "estimating..."
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+
+def enrichment_job_status(queue):
+    """Progress of the latest enrichment job, with a cancel button while it is queued or running"""
+    jobs = queue.jobs(limit=1)
+    if not jobs:
+        return
+    job = jobs[0]
+    if job['status'] not in ACTIVE_STATES:
+        finished = {"completed": st.success, "failed": st.error, "cancelled": st.info}[job['status']]
+        finished(f"Enrichment job {job['id']} {job['status']}: {job['processed']:,} products, {job['failed']:,} failed"
+                 + (f" ({job['error']})" if job['error'] else ""))
+        return
+    
+    total = job['total']
+    st.write(f"**Enrichment job {job['id']}:** {job['status']}")
+    st.progress(min(1.0, job['processed'] / total) if total else 0.0,
+                text=f"{job['processed']:,}/{total:,} products" if total else "Waiting for the worker...")
+    st.caption(f"{job['failed']:,} failed · ETA {format_eta(job['eta_seconds'])}")
+    if job['status'] != CANCELLING and st.button("Cancel enrichment", key=f"cancel-{job['id']}"):
+        queue.cancel(job['id'])
+
+# Re-runs on its own every few seconds where Streamlit supports fragments, without rerunning the page
+display_enrichment_jobs = st.fragment(run_every=3)(enrichment_job_status) if hasattr(st, 'fragment') else enrichment_job_status
+
+@st.cache_resource
+def start_metrics_server():
+    """Serve Prometheus metrics once per process when METRICS_PORT is set"""
+    port = os.getenv('METRICS_PORT')
+    return serve(int(port), os.getenv('METRICS_HOST', '127.0.0.1')) if port else None
+
+def display_diagnostics(stylist, service):
+    """Catalog, cache and latency metrics; only shown when the app is opened with ?diagnostics=1"""
+    with st.expander("🩺 Diagnostics", expanded=True):
+        st.write("**Catalog service**")
+        st.json(service.stats())
+        st.write("**Advice cache**")
+        st.json(stylist.advice_cache.stats())
+        
+        for name, rows in REGISTRY.snapshot().items():
+            st.write(f"**{name}**")
+            if name.endswith('_seconds'):
+                # Latencies read better in milliseconds
+                rows = [{k: v * 1000 if k in ('mean', 'p50', 'p95', 'p99') and v is not None else v
+                         for k, v in row.items()} for row in rows]
+                st.caption("milliseconds")
+            st.dataframe(rows)
+        
+        st.download_button("Download metrics (Prometheus text)", REGISTRY.render(), file_name="metrics.txt")
+
 def main():
     st.title("👗 AI Fashion Stylist")
     st.markdown("*Your personal AI-powered fashion assistant*")
+    start_metrics_server()
     
-    # Initialize the stylist
-    if 'stylist' not in st.session_state:
-        st.session_state.stylist = AIStyler()
-    
-    stylist = st.session_state.stylist
+    # Pin the shared catalog snapshot for this script run
+    service = get_catalog_service()
+    with service.snapshot() as stylist:
+        render(stylist, service)
+
+def render(stylist, service):
+    """Render the app against one catalog snapshot"""
     
     # Sidebar for data management
     with st.sidebar:
@@ -118,22 +208,20 @@ def main():
             if st.button("Import from Google Sheets"):
                 with st.spinner("Importing data..."):
                     import_from_google_sheets()
-                    st.session_state.stylist = AIStyler()
+                    service.refresh()
                     st.rerun()
         else:
             st.success(f"✅ {len(stylist.products)} products loaded")
         
-        # Data enrichment
+        # Data enrichment runs as a background job; the catalog watcher picks up the enriched file when it lands
+        queue = get_job_queue()
         if st.button("Enrich with AI Tags"):
             if not os.getenv('OPENAI_API_KEY'):
                 st.error("Please set your OPENAI_API_KEY in the .env file")
             else:
-                with st.spinner("Enriching products with AI tags..."):
-                    enricher = ProductEnricher()
-                    enricher.enrich_catalog()
-                    st.session_state.stylist = AIStyler()
-                    st.success("Products enriched with AI tags!")
-                    st.rerun()
+                queue.submit()
+                start_worker(queue.path)
+        display_enrichment_jobs(queue)
         
         # Display available options
         if stylist.products:
@@ -150,6 +238,9 @@ def main():
             brands = stylist.get_available_brands()
             if brands:
                 st.write(f"**Brands:** {', '.join(brands[:3])}{'...' if len(brands) > 3 else ''}")
+        
+        if st.query_params.get('diagnostics') == '1':
+            display_diagnostics(stylist, service)
     
     # Main content area
     if not stylist.products:
@@ -162,39 +253,63 @@ def main():
     with tab1:
         st.header("🎯 Get Style Recommendations")
         
+        available_styles = stylist.get_available_styles()
+        available_occasions = stylist.get_available_occasions()
+        defaults = {
+            'style_preferences': available_styles[:2],
+            'occasions': available_occasions[:1]
+        }
+        min_price, max_price = stylist.get_price_bounds()
+        
+        # Count every option against the current selection (the widgets' session state), so each
+        # shows how many products it would add and options that would add none are hidden
+        selection = {facet: st.session_state.get(f"rec-{facet}", defaults.get(facet, []))
+                     for facet in ('style_preferences', 'occasions', 'categories', 'brands', 'colors', 'materials')}
+        selected_range = st.session_state.get("rec-price_range", (min_price, max_price))
+        selection['price_range'] = selected_range if tuple(selected_range) != (min_price, max_price) else None
+        counts = stylist.facet_counts(selection)
+        
         col1, col2 = st.columns(2)
         
         with col1:
             # Style preferences
-            available_styles = stylist.get_available_styles()
-            selected_styles = st.multiselect(
-                "Select your style preferences:",
-                available_styles,
-                default=available_styles[:2] if available_styles else []
-            )
+            selected_styles = facet_multiselect("Select your style preferences:", 'style_preferences',
+                                                counts, selection, defaults)
             
             # Occasions
-            available_occasions = stylist.get_available_occasions()
-            selected_occasions = st.multiselect(
-                "Select occasions:",
-                available_occasions,
-                default=available_occasions[:1] if available_occasions else []
-            )
+            selected_occasions = facet_multiselect("Select occasions:", 'occasions', counts, selection, defaults)
         
         with col2:
             # Categories
-            available_categories = stylist.get_available_categories()
-            selected_categories = st.multiselect(
-                "Select categories (optional):",
-                available_categories
-            )
+            selected_categories = facet_multiselect("Select categories (optional):", 'categories',
+                                                    counts, selection, defaults)
             
             # Brands
-            available_brands = stylist.get_available_brands()
-            selected_brands = st.multiselect(
-                "Select brands (optional):",
-                available_brands
-            )
+            selected_brands = facet_multiselect("Select brands (optional):", 'brands', counts, selection, defaults)
+        
+        col3, col4 = st.columns(2)
+        
+        with col3:
+            # Colors
+            selected_colors = facet_multiselect("Select colors (optional):", 'colors', counts, selection, defaults)
+            
+            # Materials
+            selected_materials = facet_multiselect("Select materials (optional):", 'materials',
+                                                   counts, selection, defaults)
+        
+        with col4:
+            # Price range
+            price_range = None
+            if max_price > min_price:
+                selected_range = st.slider(
+                    "Price range ($):",
+                    float(min_price),
+                    float(max_price),
+                    (float(min_price), float(max_price)),
+                    key="rec-price_range"
+                )
+                if selected_range != (min_price, max_price):
+                    price_range = selected_range
         
         # Number of recommendations
         max_items = st.slider("Number of recommendations:", 1, 12, 6)
@@ -205,7 +320,10 @@ def main():
                 occasions=selected_occasions,
                 categories=selected_categories,
                 brands=selected_brands,
-                max_items=max_items
+                max_items=max_items,
+                colors=selected_colors,
+                materials=selected_materials,
+                price_range=price_range
             )
             
             if recommendations:
@@ -227,29 +345,38 @@ def main():
         with col1:
             outfit_style = st.selectbox(
                 "Choose outfit style:",
-                stylist.get_available_styles() if stylist.get_available_styles() else ["casual"]
+                available_styles or ["casual"]
             )
             
             outfit_occasion = st.selectbox(
                 "Choose occasion:",
-                stylist.get_available_occasions() if stylist.get_available_occasions() else ["everyday"]
+                available_occasions or ["everyday"]
             )
             
             outfit_items = st.slider("Number of items in outfit:", 2, 5, 3)
+            
+            outfit_alternatives = st.slider("Alternatives to show:", 1, 5, 3)
+            
+            outfit_budget = st.number_input("Budget ($, 0 for no limit):", min_value=0, value=0, step=25)
         
         if st.button("Create Outfit", type="primary"):
-            outfit = stylist.create_outfit(
+            outfits = stylist.create_outfits(
                 style_preference=outfit_style,
                 occasion=outfit_occasion,
-                max_items=outfit_items
+                max_items=outfit_items,
+                top_k=outfit_alternatives,
+                budget=outfit_budget or None
             )
             
-            if outfit:
-                st.success(f"Here's your {outfit_style} outfit for {outfit_occasion}!")
+            if outfits:
+                st.success(f"Here are {len(outfits)} {outfit_style} outfit(s) for {outfit_occasion}!")
                 
-                for i, item in enumerate(outfit):
-                    st.subheader(f"Item {i+1}")
-                    display_product(item)
+                outfit_tabs = st.tabs([f"Outfit {i+1} (${outfit['total_price']:,.0f})" for i, outfit in enumerate(outfits)])
+                for outfit_tab, outfit in zip(outfit_tabs, outfits):
+                    with outfit_tab:
+                        for i, item in enumerate(outfit['items']):
+                            st.subheader(f"Item {i+1}")
+                            display_product(item)
             else:
                 st.warning("Couldn't create an outfit with your criteria. Try different options.")
     
@@ -266,39 +393,49 @@ def main():
             if not os.getenv('OPENAI_API_KEY'):
                 st.error("Please set your OPENAI_API_KEY in the .env file to use AI advice feature.")
             else:
-                with st.spinner("Getting personalized advice..."):
-                    advice = stylist.get_ai_styling_advice(user_question)
-                    st.markdown("### 💡 Styling Advice")
-                    st.write(advice)
+                st.markdown("### 💡 Styling Advice")
+                # Render tokens as they arrive instead of waiting for the whole completion
+                st.write_stream(stylist.stream_ai_styling_advice(user_question))
     
     with tab4:
         st.header("🔍 Browse Full Catalog")
         
         # Search functionality
         search_term = st.text_input("Search products:", placeholder="Enter product name, brand, or description...")
+        semantic = st.checkbox("Search by meaning", value=False, help="Find related products even when the exact words differ")
         
         # Filter products based on search
-        if search_term:
-            filtered_products = [
-                p for p in stylist.products 
-                if search_term.lower() in p.get('name', '').lower() 
-                or search_term.lower() in p.get('brand', '').lower()
-                or search_term.lower() in p.get('description', '').lower()
-            ]
+        close_matches = False
+        if search_term and semantic:
+            product_ids = stylist.search_ids(search_term, k=100)
+        elif search_term:
+            product_ids = stylist.search_catalog(search_term)
+            if not len(product_ids):
+                product_ids = stylist.search_catalog(search_term, typo_tolerant=True)
+                close_matches = len(product_ids) > 0
         else:
-            filtered_products = stylist.products
+            product_ids = range(len(stylist.products))
+        
+        total = len(product_ids)
+        pages = max(1, math.ceil(total / PAGE_SIZE))
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                               key=f"browse-page-{search_term}-{semantic}") if pages > 1 else 1
+        start = (page - 1) * PAGE_SIZE
+        page_products = stylist.products_for_ids(product_ids[start:start + PAGE_SIZE])
         
-        st.write(f"Showing {len(filtered_products)} products")
+        if close_matches:
+            st.caption(f"No exact matches for \"{search_term}\" - showing similar spellings")
+        if page_products:
+            st.write(f"Showing {start + 1}-{start + len(page_products)} of {total} products")
+        else:
+            st.write("Showing 0 products")
         
-        # Display products in a grid
-        if filtered_products:
+        # Display products in a grid, one page at a time
+        if page_products:
             cols = st.columns(2)
-            for i, product in enumerate(filtered_products[:20]):  # Limit to first 20 for performance
+            for i, product in enumerate(page_products):
                 with cols[i % 2]:
                     display_product(product)
-            
-            if len(filtered_products) > 20:
-                st.info(f"Showing first 20 of {len(filtered_products)} products. Use search to narrow down results.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Batch recommendations for offline jobs (e.g. nightly email campaigns) - profiles JSONL in, results JSONL out, across a process pool
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+from catalog_store import compile_catalog, open_compiled
+from enrichment_stream import iter_products
+from stylist_backend import AIStyler
+
+# Set in each worker process by init_worker
+_stylist: Optional[AIStyler] = None
+_seed = 0
+
+
+def init_worker(catalog_file: str, seed: int):
+    """Open the compiled catalog once per worker; its memory-mapped pages are shared by every process"""
+    global _stylist, _seed
+    _stylist = AIStyler(catalog_file, columnar=True)
+    _seed = seed
+
+
+def run_chunk(task) -> List[str]:
+    """Serialize the results for one chunk of profiles (runs in a worker)"""
+    kind, profiles = task
+    if kind == 'outfits':
+        results = _stylist.create_outfits_batch(profiles, seed=_seed)
+    else:
+        results = _stylist.recommend_batch(profiles, seed=_seed)
+    return [json.dumps(result, ensure_ascii=False) for result in results]
+
+
+def chunks(profiles: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    while True:
+        chunk = list(islice(profiles, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def number_profiles(profiles: Iterator[Dict]) -> Iterator[Dict]:
+    """Give profiles without a customer_id their line position, which would otherwise restart per chunk"""
+    for position, profile in enumerate(profiles):
+        if 'customer_id' not in profile:
+            profile = {**profile, 'customer_id': position}
+        yield profile
+
+
+def run_batch(profiles_file: str,
+              output_file: str,
+              catalog_file: str = 'catalog_enriched.json',
+              kind: str = 'recommendations',
+              workers: Optional[int] = None,
+              chunk_size: int = 2000,
+              seed: int = 0) -> Dict:
+    """Write one result line per profile to output_file, in profile order, and return throughput stats
+
+    Results are streamed to a temporary file as chunks complete and renamed into place at the end.
+    """
+    # Workers memory-map the compiled catalog instead of each parsing the JSON
+    if open_compiled(catalog_file) is None and os.path.exists(catalog_file):
+        compile_catalog(catalog_file)
+
+    workers = workers or os.cpu_count() or 1
+    tasks = ((kind, chunk) for chunk in chunks(number_profiles(iter_products(profiles_file)), chunk_size))
+    tmp_file = f"{output_file}.tmp"
+    start = time.perf_counter()
+    written = 0
+
+    with open(tmp_file, 'w', encoding='utf-8') as out, \
+            multiprocessing.Pool(workers, initializer=init_worker, initargs=(catalog_file, seed)) as pool:
+        # imap keeps results in profile order while workers run ahead on later chunks
+        for lines in pool.imap(run_chunk, tasks):
+            if lines:
+                out.write('\n'.join(lines) + '\n')
+            written += len(lines)
+            elapsed = time.perf_counter() - start
+            print(f"  {written} profiles written ({written / elapsed:,.0f}/s)")
+    os.replace(tmp_file, output_file)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'profiles': written,
+        'seconds': round(elapsed, 2),
+        'profiles_per_second': round(written / elapsed, 1) if elapsed else 0.0,
+        'workers': workers
+    }
+    print(f"Wrote {written} {kind} to {output_file} in {elapsed:.1f}s "
+          f"({stats['profiles_per_second']:,.0f} profiles/s, {workers} workers)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate recommendations or outfits for many customer profiles")
+    parser.add_argument('profiles', help="customer profiles (.jsonl, or a .json array)")
+    parser.add_argument('--output', default='recommendations.jsonl', help="results file, one JSON line per profile")
+    parser.add_argument('--catalog', default='catalog_enriched.json', help="enriched catalog to recommend from")
+    parser.add_argument('--outfits', action='store_true', help="create outfits instead of item recommendations")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="profiles per worker task")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the per-customer random picks")
+    args = parser.parse_args()
+
+    run_batch(
+        profiles_file=args.profiles,
+        output_file=args.output,
+        catalog_file=args.catalog,
+        kind='outfits' if args.outfits else 'recommendations',
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        seed=args.seed
+    )
+
+if __name__ == "__main__":
+    main()
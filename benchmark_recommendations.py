@@ -0,0 +1,121 @@
+"""
+Benchmark get_recommendations: the legacy per-product filter scan vs the index query planner
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Dict
+from stylist_backend import AIStyler
+
+STYLES = ['casual', 'minimal', 'athleisure', 'sporty', 'elegant', 'boho', 'edgy', 'classic', 'trendy', 'vintage']
+OCCASIONS = ['everyday', 'gym', 'yoga', 'running', 'work', 'date night', 'travel', 'lounging', 'outdoor', 'studio']
+CATEGORIES = ['Tops', 'Leggings', 'Shorts', 'Dresses', 'Outerwear', 'Shoes', 'Accessories']
+BRANDS = ['Alo Yoga', 'Lululemon', 'Nike', 'Athleta', 'Outdoor Voices', 'Manduka', 'Hydro Flask']
+
+QUERY = {
+    'style_preferences': ['casual', 'minimal'],
+    'occasions': ['everyday'],
+    'categories': ['tops'],
+    'brands': ['Lululemon'],
+}
+
+# Above this size the legacy implementation is timed on a sample of its outer loop and extrapolated
+LEGACY_FULL_RUN_LIMIT = 1000
+LEGACY_SAMPLE = 50
+
+
+def generate_products(num_products: int, seed: int = 42) -> List[Dict]:
+    """Generate a synthetic enriched catalog"""
+    rng = random.Random(seed)
+    return [
+        {
+            "name": f"Product {i}",
+            "brand": rng.choice(BRANDS),
+            "price": f"${rng.randint(20, 200)}",
+            "description": "Synthetic product for benchmarking.",
+            "category": rng.choice(CATEGORIES),
+            "style_tags": rng.sample(STYLES, rng.randint(1, 3)),
+            "occasion_tags": rng.sample(OCCASIONS, rng.randint(1, 3)),
+        }
+        for i in range(num_products)
+    ]
+
+
+def legacy_filter(products: List[Dict], field: str, values: List[str]) -> List[Dict]:
+    """The pre-index filter_by_* scan"""
+    if field in ('style_tags', 'occasion_tags'):
+        return [p for p in products
+                if any(v.lower() in [t.lower() for t in p.get(field, [])] for v in values)]
+    return [p for p in products if any(v.lower() in p.get(field, '').lower() for v in values)]
+
+
+def legacy_recommendations(products: List[Dict], outer: List[Dict] = None) -> List[Dict]:
+    """The pre-index get_recommendations intersection, optionally over a subset of the outer loop"""
+    filtered_products = list(outer if outer is not None else products)
+    for field, key in (('style_tags', 'style_preferences'), ('occasion_tags', 'occasions'),
+                       ('category', 'categories'), ('brand', 'brands')):
+        filtered_products = [p for p in filtered_products if p in legacy_filter(products, field, QUERY[key])]
+    return filtered_products
+
+
+def time_call(func, repeat: int = 5, before=None) -> float:
+    """Return the best wall time of a call in milliseconds; before (untimed) runs ahead of every call"""
+    best = float('inf')
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def benchmark(num_products: int) -> Dict:
+    """Time both implementations on a catalog of the given size"""
+    products = generate_products(num_products)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog_file = os.path.join(tmp, 'catalog_enriched.json')
+        with open(catalog_file, 'w', encoding='utf-8') as f:
+            json.dump(products, f)
+        stylist = AIStyler(catalog_file)
+
+    # Clear the query cache before each call so every repeat runs the planner, not a cache hit
+    new_ms = time_call(lambda: stylist.get_recommendations(max_items=len(products), **QUERY),
+                       before=stylist.query_cache.clear)
+
+    if num_products <= LEGACY_FULL_RUN_LIMIT:
+        legacy_ms = time_call(lambda: legacy_recommendations(products), repeat=1)
+        extrapolated = False
+    else:
+        sample = products[:LEGACY_SAMPLE]
+        legacy_ms = time_call(lambda: legacy_recommendations(products, sample), repeat=1)
+        legacy_ms *= num_products / LEGACY_SAMPLE
+        extrapolated = True
+
+    return {
+        'products': num_products,
+        'legacy_ms': legacy_ms,
+        'legacy_extrapolated': extrapolated,
+        'planner_ms': new_ms,
+        'speedup': legacy_ms / new_ms if new_ms else float('inf'),
+    }
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+
+    print(f"{'products':>10} {'legacy (ms)':>16} {'planner (ms)':>14} {'speedup':>10}")
+    for size in sizes:
+        result = benchmark(size)
+        legacy = f"{result['legacy_ms']:.1f}{'*' if result['legacy_extrapolated'] else ''}"
+        print(f"{result['products']:>10} {legacy:>16} {result['planner_ms']:>14.2f} {result['speedup']:>9.0f}x")
+
+    print(f"\n* extrapolated from the first {LEGACY_SAMPLE} products of the legacy outer loop")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Benchmark suite - AIStyler latency percentiles and peak memory on synthetic catalogs, saved as JSON to compare versions
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from catalog_store import compile_catalog
+from create_sample_data import create_synthetic_catalog
+from stylist_backend import AIStyler
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+# Timed calls per scenario after the first; catalog loads are slow enough to need fewer
+DEFAULT_CALLS = 20
+LOAD_CALLS = 3
+
+PERCENTILES = (50, 90, 99)
+
+
+def random_profile(rng: random.Random, vocabulary: Dict[str, List[str]]) -> Dict:
+    """A get_recommendations query like the Style Recommendations tab sends"""
+    profile = {
+        'style_preferences': rng.sample(vocabulary['styles'], min(len(vocabulary['styles']), rng.randint(1, 2))),
+        'occasions': rng.sample(vocabulary['occasions'], min(len(vocabulary['occasions']), 1)),
+        'max_items': 6
+    }
+    if vocabulary['categories'] and rng.random() < 0.5:
+        profile['categories'] = [rng.choice(vocabulary['categories'])]
+    if vocabulary['brands'] and rng.random() < 0.3:
+        profile['brands'] = [rng.choice(vocabulary['brands'])]
+    if rng.random() < 0.3:
+        low = rng.choice((0, 25, 50))
+        profile['price_range'] = (low, low + rng.choice((50, 100, 200)))
+    return profile
+
+
+def search_term(rng: random.Random, stylist: AIStyler) -> str:
+    """A word from a random product name, sometimes cut short as if still being typed"""
+    name = str(stylist.products[rng.randrange(len(stylist.products))].get('name', ''))
+    word = rng.choice(name.split() or ['top'])
+    return word[:rng.randint(3, len(word))] if len(word) > 3 and rng.random() < 0.3 else word
+
+
+def scenarios(stylist: AIStyler, rng: random.Random) -> List[Tuple[str, Callable[[], object]]]:
+    """(name, call) for every operation the app serves; each call draws its own arguments"""
+    vocabulary = {
+        'styles': stylist.get_available_styles() or ['casual'],
+        'occasions': stylist.get_available_occasions() or ['everyday'],
+        'categories': stylist.get_available_categories(),
+        'brands': stylist.get_available_brands()
+    }
+    fixed_profile = random_profile(rng, vocabulary)
+
+    def uncached_recommendations():
+        stylist.query_cache.clear()
+        return stylist.get_recommendations(**random_profile(rng, vocabulary))
+
+    return [
+        ('filter_by_style', lambda: stylist.filter_by_style([rng.choice(vocabulary['styles'])])),
+        ('filter_by_occasion', lambda: stylist.filter_by_occasion([rng.choice(vocabulary['occasions'])])),
+        ('filter_by_category', lambda: stylist.filter_by_category([rng.choice(vocabulary['categories'] or ['tops'])])),
+        ('filter_by_brand', lambda: stylist.filter_by_brand([rng.choice(vocabulary['brands'] or ['nike'])])),
+        ('get_recommendations', uncached_recommendations),
+        ('get_recommendations_cached', lambda: stylist.get_recommendations(**fixed_profile)),
+        ('create_outfit', lambda: stylist.create_outfit(
+            rng.choice(vocabulary['styles']), rng.choice(vocabulary['occasions']), max_items=4)),
+        ('search_catalog', lambda: stylist.search_catalog(search_term(rng, stylist))),
+        ('search_catalog_typo_tolerant', lambda: stylist.search_catalog(search_term(rng, stylist) + 'q', typo_tolerant=True)),
+        ('search_semantic', lambda: stylist.search_ids(
+            f"{rng.choice(vocabulary['styles'])} {rng.choice(vocabulary['occasions'])} {search_term(rng, stylist)}", k=100)),
+        ('get_available_styles', stylist.get_available_styles),
+        ('get_available_occasions', stylist.get_available_occasions),
+        ('get_available_categories', stylist.get_available_categories),
+        ('get_available_brands', stylist.get_available_brands),
+        ('get_available_colors', stylist.get_available_colors),
+        ('get_available_materials', stylist.get_available_materials),
+        ('get_price_bounds', stylist.get_price_bounds),
+    ]
+
+
+def measure(call: Callable[[], object], calls: int) -> Dict:
+    """Latency of a first call and percentiles of `calls` more (ms), plus peak memory of one traced call (MB)
+
+    The first call is reported on its own because it pays for lazily built indexes.
+    Memory is the tracemalloc peak (Python and NumPy allocations) during the extra traced call.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    call()
+    first_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {'first_ms': round(first_ms, 3), 'calls': calls}
+    if latencies:
+        for percentile in PERCENTILES:
+            result[f'p{percentile}_ms'] = round(float(np.percentile(latencies, percentile)), 3)
+        result['mean_ms'] = round(float(np.mean(latencies)), 3)
+        result['max_ms'] = round(float(np.max(latencies)), 3)
+    result['peak_mb'] = round(peak / 2**20, 2)
+    return result
+
+
+def print_result(name: str, result: Dict):
+    print(f"  {name:<30} first {result['first_ms']:>10.1f} ms   p50 {result.get('p50_ms', 0):>9.2f} ms   "
+          f"p99 {result.get('p99_ms', 0):>9.2f} ms   peak {result['peak_mb']:>8.1f} MB")
+
+
+def max_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far, where the platform reports it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (2**20 if platform.system() == 'Darwin' else 2**10), 1)
+
+
+def synthetic_catalog(num_products: int, catalog_dir: str, seed: int) -> str:
+    """Path of the synthetic catalog of this size and seed, generated on first use and reused after"""
+    os.makedirs(catalog_dir, exist_ok=True)
+    path = os.path.join(catalog_dir, f"catalog_synthetic_{num_products}_{seed}.jsonl")
+    if not os.path.exists(path):
+        create_synthetic_catalog(num_products, path, seed)
+    return path
+
+
+def benchmark_size(num_products: int,
+                   catalog_dir: str,
+                   columnar: bool = False,
+                   calls: int = DEFAULT_CALLS,
+                   seed: int = 42,
+                   only: Optional[List[str]] = None) -> Dict:
+    """Run every scenario (or those named in only) against one synthetic catalog size"""
+    catalog_file = synthetic_catalog(num_products, catalog_dir, seed)
+    results = {}
+
+    if columnar:
+        results['compile_catalog'] = measure(lambda: compile_catalog(catalog_file), 0)
+        print_result('compile_catalog', results['compile_catalog'])
+    results['load_catalog'] = measure(lambda: AIStyler(catalog_file, columnar=columnar), min(calls, LOAD_CALLS))
+    print_result('load_catalog', results['load_catalog'])
+
+    stylist = AIStyler(catalog_file, columnar=columnar)
+    for name, call in scenarios(stylist, random.Random(seed)):
+        if only and name not in only:
+            continue
+        results[name] = measure(call, calls)
+        print_result(name, results[name])
+
+    return {
+        'products': len(stylist.products),
+        'catalog_file': catalog_file,
+        'scenarios': results,
+        'max_rss_mb': max_rss_mb()
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Commit of the code under test, so result files can be matched to versions"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes=DEFAULT_SIZES,
+              output_file: str = 'benchmark_results.json',
+              catalog_dir: str = 'benchmark_catalogs',
+              columnar: bool = False,
+              calls: int = DEFAULT_CALLS,
+              seed: int = 42,
+              only: Optional[List[str]] = None) -> Dict:
+    """Benchmark every size and write the results, with the environment they were measured in, to output_file"""
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'columnar': columnar,
+        'calls': calls,
+        'seed': seed,
+        'results': []
+    }
+    for size in sizes:
+        print(f"\n{size:,} products ({'columnar' if columnar else 'list'} catalog)")
+        report['results'].append(benchmark_size(size, catalog_dir, columnar, calls, seed, only))
+        # Write after every size so a long run that is interrupted keeps what it measured
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(f"\nWrote {output_file}")
+    return report
+
+
+def compare(baseline_file: str, report: Dict):
+    """Print the p50 latency of each scenario next to a baseline report's, matched by catalog size"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {r['products']: r['scenarios'] for r in json.load(f)['results']}
+    print(f"\n{'products':>10} {'scenario':<30} {'baseline p50':>13} {'p50':>10} {'change':>8}")
+    for result in report['results']:
+        before = baseline.get(result['products'], {})
+        for name, current in result['scenarios'].items():
+            old, new = before.get(name, {}).get('p50_ms'), current.get('p50_ms')
+            if old is None or new is None:
+                continue
+            change = f"{new / old:.2f}x" if old else '-'
+            print(f"{result['products']:>10} {name:<30} {old:>13.2f} {new:>10.2f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AIStyler on synthetic catalogs")
+    parser.add_argument('sizes', nargs='*', type=int, help=f"catalog sizes (default: {' '.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument('--output', default='benchmark_results.json', help="results file")
+    parser.add_argument('--catalog-dir', default='benchmark_catalogs', help="where synthetic catalogs are generated and reused")
+    parser.add_argument('--columnar', action='store_true', help="benchmark the compiled columnar catalog")
+    parser.add_argument('--calls', type=int, default=DEFAULT_CALLS, help="timed calls per scenario")
+    parser.add_argument('--seed', type=int, default=42, help="seed of the catalogs and the queries")
+    parser.add_argument('--only', nargs='+', metavar='SCENARIO', help="run only these scenarios (loading always runs)")
+    parser.add_argument('--compare', metavar='BASELINE', help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = run_suite(args.sizes or DEFAULT_SIZES, args.output, args.catalog_dir, args.columnar,
+                       args.calls, args.seed, args.only)
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Catalog diffs - which products of a reloaded catalog file are new, and which loaded ones are gone or changed
+"""
+import hashlib
+import json
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+
+def product_hash(product) -> bytes:
+    """Digest of a product's full contents; any edit to any field changes it"""
+    encoded = json.dumps(dict(product), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).digest()
+
+
+def diff_catalog(old_hashes: Sequence[bytes], products: Sequence[Dict]) -> Tuple[np.ndarray, List[bytes]]:
+    """Match a new catalog against the product_hash of every loaded product
+
+    Returns (source, hashes): for each product of the new catalog, in file order, the ID
+    it had in the loaded catalog (-1 if it is new or edited), and its product_hash.
+    Products keep the IDs a fresh load of the file gives them. An edited product is a
+    removal of its old version plus an addition of the new one, and identical duplicates
+    are matched one to one, in order.
+    """
+    unmatched: Dict[bytes, List[int]] = {}
+    for product_id, digest in enumerate(old_hashes):
+        unmatched.setdefault(digest, []).append(product_id)
+    for ids in unmatched.values():
+        ids.reverse()
+
+    source = np.full(len(products), -1, dtype=np.int64)
+    hashes = []
+    for product_id, product in enumerate(products):
+        digest = product_hash(product)
+        ids = unmatched.get(digest)
+        if ids:
+            source[product_id] = ids.pop()
+        hashes.append(digest)
+    return source, hashes
+
+
+def survivor_map(source: np.ndarray, size: int) -> np.ndarray:
+    """Old product ID -> new ID (-1 if removed), with one extra -1 slot so indexing with -1 stays -1"""
+    remap = np.full(size + 1, -1, dtype=np.int64)
+    kept = np.flatnonzero(source >= 0)
+    remap[source[kept]] = kept
+    return remap
+
+
+def added_ids(source: np.ndarray) -> np.ndarray:
+    """Sorted new IDs of the products that were not in the loaded catalog"""
+    return np.flatnonzero(source < 0)
@@ -0,0 +1,157 @@
+"""
+Inverted index over the product catalog - maps normalized tag, category, brand, color and material values to product IDs
+"""
+from array import array
+from bisect import bisect_left
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple
+import numpy as np
+from catalog_diff import added_ids, survivor_map
+
+# Fields whose values are lists of tags (matched exactly, case-insensitive)
+TAG_FIELDS = ('style_tags', 'occasion_tags')
+
+# Fields holding a single string value (matched as a case-insensitive substring)
+VALUE_FIELDS = ('category', 'brand', 'color', 'material')
+
+# NumPy dtype with the layout of array('l') on this platform (8 bytes on Linux/macOS, 4 on Windows)
+POSTING_DTYPE = np.dtype(f"i{array('l').itemsize}")
+
+
+def normalize(value: Any) -> str:
+    """Normalize a catalog value for index lookups"""
+    if value is None:
+        return ''
+    return str(value).lower()
+
+
+class CatalogIndex:
+    """Postings of product IDs (positions in the product list) keyed by field and normalized value"""
+
+    def __init__(self, products: List[Dict]):
+        self.size = len(products)
+        self.postings: Dict[str, Dict[str, array]] = {}
+        self.build(products)
+
+    def build(self, products: List[Dict]):
+        """Build the postings for every indexed field in one pass over the catalog"""
+        lists: Dict[str, Dict[str, List[int]]] = {field: {} for field in TAG_FIELDS + VALUE_FIELDS}
+
+        for product_id, product in enumerate(products):
+            for field in TAG_FIELDS:
+                tags = product.get(field) or []
+                if isinstance(tags, str):
+                    tags = [tags]
+                # A product is posted once per distinct tag so postings stay sorted and unique
+                for tag in {normalize(t) for t in tags}:
+                    lists[field].setdefault(tag, []).append(product_id)
+
+            for field in VALUE_FIELDS:
+                lists[field].setdefault(normalize(product.get(field, '')), []).append(product_id)
+
+        self.size = len(products)
+        self.postings = {
+            field: {key: array('l', ids) for key, ids in values.items()}
+            for field, values in lists.items()
+        }
+
+    def with_changes(self, source: np.ndarray, products: Sequence[Dict]) -> 'CatalogIndex':
+        """The index of a changed catalog (see catalog_diff.diff_catalog), leaving this one untouched
+
+        products is the new catalog and source the old ID of each of its products. Only
+        the added products are indexed; existing postings are renumbered.
+        """
+        added = added_ids(source)
+        new = CatalogIndex([products[i] for i in added.tolist()])
+        remap = survivor_map(source, self.size)
+        index = CatalogIndex.__new__(CatalogIndex)
+        index.size = len(products)
+        index.postings = {}
+        for field in TAG_FIELDS + VALUE_FIELDS:
+            old_postings, new_postings = self.postings.get(field, {}), new.postings.get(field, {})
+            merged = {}
+            for key in list(old_postings) + [key for key in new_postings if key not in old_postings]:
+                ids, _ = merge_postings(old_postings.get(key), remap, new_postings.get(key), added)
+                if len(ids):
+                    merged[key] = to_postings(ids)
+            # Keys in order of first occurrence, as a fresh build lists them
+            index.postings[field] = dict(sorted(merged.items(), key=lambda item: item[1][0]))
+        return index
+
+    def keys(self, field: str) -> List[str]:
+        """Return the normalized values indexed for a field"""
+        return list(self.postings.get(field, {}))
+
+    def postings_for(self, field: str, values: Iterable[str], substring: bool = False) -> List[array]:
+        """Return the postings a filter on this field would union, without materializing them"""
+        field_postings = self.postings.get(field, {})
+        needles = {normalize(v) for v in values}
+        if substring:
+            # Scans the distinct field values (a few hundred brands/categories), never the catalog
+            return [ids for key, ids in field_postings.items() if any(n in key for n in needles)]
+        return [field_postings[key] for key in needles if key in field_postings]
+
+    def query(self, predicates: List[List[array]]) -> List[int]:
+        """Return sorted product IDs matching every predicate (each predicate is a union of postings)
+
+        The predicate with the fewest estimated matches is materialized first; the
+        remaining predicates only probe its candidates by binary search, so the cost
+        follows the most selective filter rather than the catalog size.
+        """
+        if not predicates:
+            return list(range(self.size))
+
+        plan = sorted(predicates, key=estimate)
+        candidates = union(plan[0])
+        for postings in plan[1:]:
+            if not candidates:
+                break
+            candidates = [i for i in candidates if any(contains(ids, i) for ids in postings)]
+        return candidates
+
+
+def to_postings(ids: np.ndarray) -> array:
+    """Pack NumPy product IDs into a postings array"""
+    postings = array('l')
+    postings.frombytes(np.asarray(ids, dtype=POSTING_DTYPE).tobytes())
+    return postings
+
+
+def as_ids(postings: Optional[array]) -> np.ndarray:
+    """A postings array (or None) as NumPy IDs"""
+    if not postings:
+        return np.zeros(0, dtype=np.int64)
+    return np.frombuffer(postings, dtype=POSTING_DTYPE).astype(np.int64)
+
+
+def merge_postings(old: Optional[array], remap: np.ndarray,
+                   new: Optional[array], added: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted IDs in a changed catalog of old postings (mapped through survivor_map, removed
+    products dropped) and of postings over the added products alone (mapped through added)
+
+    Also returns, for each merged ID, its position in old + new, so values stored alongside
+    the postings (e.g. term frequencies) can be carried over the same way.
+    """
+    ids = np.concatenate([remap[as_ids(old)], added[as_ids(new)]])
+    positions = np.flatnonzero(ids >= 0)
+    positions = positions[np.argsort(ids[positions], kind='stable')]
+    return ids[positions], positions
+
+
+def estimate(postings: List[array]) -> int:
+    """Upper bound on the number of products a union of postings matches"""
+    return sum(len(ids) for ids in postings)
+
+
+def contains(ids: array, product_id: int) -> bool:
+    """Binary search a sorted postings array for a product ID"""
+    position = bisect_left(ids, product_id)
+    return position < len(ids) and ids[position] == product_id
+
+
+def union(postings: List[array]) -> List[int]:
+    """Union sorted postings into one sorted list of unique product IDs"""
+    if not postings:
+        return []
+    if len(postings) == 1:
+        return postings[0].tolist()
+    return sorted(set().union(*postings))
@@ -0,0 +1,97 @@
+"""
+Process-wide catalog service - one shared AIStyler snapshot for every session, hot-swapped on reload
+"""
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from advice_cache import AdviceCache
+from query_cache import QueryCache
+from stylist_backend import AIStyler
+
+
+class CatalogService:
+    """Holds the current AIStyler snapshot shared by all sessions in the process
+
+    Snapshots are never mutated: a refresh builds a new AIStyler off to the side
+    and swaps the reference in one assignment, so readers see either the old catalog or
+    the new one, never a mix. A reader that grabbed the old snapshot keeps it alive until
+    it finishes; the service counts active readers per version for diagnostics.
+
+    The advice and query caches outlive snapshots; their keys include the catalog
+    version, so a refresh that changes the catalog file invalidates them by itself.
+
+    refresh (or the watch thread, which polls the catalog file's mtime) swaps in a
+    snapshot with only the products that changed on disk applied (see AIStyler.refresh).
+    """
+
+    def __init__(self, factory: Optional[Callable[[], AIStyler]] = None):
+        self.advice_cache = AdviceCache()
+        self.query_cache = QueryCache()
+        self.factory = factory or (lambda: AIStyler(
+            columnar=True, advice_cache=self.advice_cache, query_cache=self.query_cache
+        ))
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.version = 1
+        self.stylist = self.factory()
+        self.readers: Dict[int, int] = {}
+        self.watcher: Optional[threading.Thread] = None
+        self.stop_watching = threading.Event()
+
+    @contextmanager
+    def snapshot(self):
+        """Pin the current snapshot for the duration of a block (e.g. one script run)"""
+        with self.lock:
+            stylist, version = self.stylist, self.version
+            self.readers[version] = self.readers.get(version, 0) + 1
+        try:
+            yield stylist
+        finally:
+            with self.lock:
+                self.readers[version] -= 1
+                if not self.readers[version]:
+                    del self.readers[version]
+
+    def refresh(self) -> AIStyler:
+        """Apply the changes in the catalog file to a new snapshot and swap it in; a no-op if the file is unchanged"""
+        # One refresh at a time; the build happens outside the swap lock so readers never wait on it
+        with self.reload_lock:
+            stylist = self.stylist.refresh()
+            if stylist is not self.stylist:
+                with self.lock:
+                    self.stylist = stylist
+                    self.version += 1
+                print(f"Catalog refreshed from {stylist.source_file}: "
+                      f"{stylist.last_change['added']} added, {stylist.last_change['removed']} removed")
+        return stylist
+
+    def watch(self, interval: float = 2.0):
+        """Poll the catalog file from a daemon thread and refresh whenever it changes (idempotent)"""
+        if self.watcher is not None and self.watcher.is_alive():
+            return
+        self.stop_watching.clear()
+
+        def poll():
+            # Hash the loaded products up front so the first refresh only has to hash the new file
+            self.stylist.hashes()
+            while not self.stop_watching.wait(interval):
+                try:
+                    if self.stylist.catalog_changed():
+                        self.refresh()
+                except Exception as e:
+                    # E.g. a catalog caught half-written; the next poll retries
+                    print(f"Warning: catalog refresh failed: {e}")
+
+        self.watcher = threading.Thread(target=poll, name='catalog-watcher', daemon=True)
+        self.watcher.start()
+
+    def stats(self) -> Dict:
+        """Current version, catalog size, active readers per version, last refresh and query cache counters"""
+        with self.lock:
+            return {
+                "version": self.version,
+                "products": len(self.stylist.products),
+                "readers": dict(self.readers),
+                "last_refresh": self.stylist.last_change,
+                "query_cache": self.stylist.query_cache.stats()
+            }
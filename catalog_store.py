@@ -0,0 +1,580 @@
+"""
+Columnar, array-backed product catalog with a dict-like row view
+"""
+import json
+import os
+import re
+import shutil
+import sys
+from collections.abc import Mapping, Sequence
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+import numpy as np
+from catalog_diff import added_ids, survivor_map
+from catalog_index import normalize
+from enrichment_stream import iter_products
+
+# Low-cardinality string fields stored as integer codes into a shared value table
+CATEGORICAL_FIELDS = ('brand', 'category', 'color', 'size', 'material')
+
+# List-of-string fields stored as dictionary-encoded codes with per-row offsets
+TAG_FIELDS = ('style_tags', 'occasion_tags')
+
+PRICE_FIELD = 'price'
+
+# Bump when the on-disk layout written by CatalogStore.save changes
+FORMAT_VERSION = 1
+
+# Marks a field a product does not have in the plain (non-encoded) columns
+_MISSING = object()
+
+_PRICE_PATTERN = re.compile(r'^\s*\$?\s*(\d[\d,]*)(?:\.(\d{1,2}))?\s*$')
+
+
+def load_mapped(path: str) -> np.ndarray:
+    """Memory-map a saved array read-only
+
+    Returned as a plain ndarray view of the mapping: np.memmap routes every element
+    access through Python-level __getitem__, which dominates row-at-a-time reads.
+    """
+    return np.load(path, mmap_mode='r').view(np.ndarray)
+
+
+def parse_price_cents(price: Any) -> int:
+    """Parse a price like "$88" or "$1,299.50" into cents, or -1 if it is not a plain price"""
+    if isinstance(price, (int, float)) and not isinstance(price, bool):
+        return int(round(price * 100)) if price == price else -1
+    match = _PRICE_PATTERN.match(str(price)) if price is not None else None
+    if not match:
+        return -1
+    dollars = int(match.group(1).replace(',', ''))
+    cents = int((match.group(2) or '0').ljust(2, '0'))
+    return dollars * 100 + cents
+
+
+def format_price(cents: int) -> str:
+    """Format cents the way the catalog writes prices ("$88", "$88.50")"""
+    if cents % 100 == 0:
+        return f"${cents // 100}"
+    return f"${cents // 100}.{cents % 100:02d}"
+
+
+class DictionaryColumn:
+    """A string column stored as int32 codes into a table of interned values (-1 = missing)"""
+
+    def __init__(self, values: Iterable[Any]):
+        self.values: List[Any] = []
+        lookup: Dict[Any, int] = {}
+        codes = []
+        for value in values:
+            if value is _MISSING:
+                codes.append(-1)
+                continue
+            key = (type(value), value)
+            code = lookup.get(key)
+            if code is None:
+                code = lookup[key] = len(self.values)
+                self.values.append(sys.intern(value) if isinstance(value, str) else value)
+            codes.append(code)
+        self.codes = np.array(codes, dtype=np.int32)
+        self.lookup = {value: code for (_, value), code in lookup.items() if isinstance(value, str)}
+
+    def save(self, directory: str, prefix: str) -> Dict:
+        np.save(os.path.join(directory, f"{prefix}_codes.npy"), self.codes)
+        return {"kind": "dictionary", "values": self.values}
+
+    @classmethod
+    def load(cls, directory: str, prefix: str, meta: Dict) -> 'DictionaryColumn':
+        column = cls.__new__(cls)
+        column.values = [sys.intern(v) if isinstance(v, str) else v for v in meta["values"]]
+        column.codes = load_mapped(os.path.join(directory, f"{prefix}_codes.npy"))
+        column.lookup = {value: code for code, value in enumerate(column.values) if isinstance(value, str)}
+        return column
+
+    def with_changes(self, source: np.ndarray, added: List[Any]) -> 'DictionaryColumn':
+        """The column of a changed catalog (see catalog_diff.diff_catalog), given the values of
+        the added products in order; values not seen before extend the table"""
+        new = DictionaryColumn(added)
+        column = DictionaryColumn.__new__(DictionaryColumn)
+        column.values = list(self.values)
+        codes = {(type(value), value): code for code, value in enumerate(self.values)}
+        remap = np.array([codes.setdefault((type(v), v), len(codes)) for v in new.values] + [-1], dtype=np.int32)
+        column.values += [v for v in new.values if codes[(type(v), v)] >= len(self.values)]
+        column.codes = gather_rows(self.codes, source, remap[new.codes])
+        column.lookup = {value: code for code, value in enumerate(column.values) if isinstance(value, str)}
+        return column
+
+    def get(self, row: int) -> Any:
+        code = self.codes[row]
+        return _MISSING if code < 0 else self.values[code]
+
+    def mask(self, needles: Iterable[str], substring: bool = True) -> np.ndarray:
+        """Boolean row mask of values matching any needle (case-insensitive)"""
+        needles = {normalize(n) for n in needles}
+        # One extra False slot so missing rows (code -1) gather False
+        lut = np.zeros(len(self.values) + 1, dtype=bool)
+        for code, value in enumerate(self.values):
+            key = normalize(value)
+            lut[code] = any(n in key for n in needles) if substring else key in needles
+        return lut[self.codes]
+
+
+class TagColumn:
+    """A list-of-strings column stored as dictionary codes with CSR-style row offsets"""
+
+    def __init__(self, rows: Iterable[Any]):
+        self.values: List[str] = []
+        self.lookup: Dict[str, int] = {}
+        offsets = [0]
+        codes = []
+        present = []
+        for tags in rows:
+            present.append(tags is not _MISSING)
+            if tags is _MISSING or not tags:
+                tags = []
+            elif isinstance(tags, str):
+                tags = [tags]
+            for tag in tags:
+                code = self.lookup.get(tag)
+                if code is None:
+                    code = self.lookup[tag] = len(self.values)
+                    self.values.append(sys.intern(str(tag)))
+                codes.append(code)
+            offsets.append(len(codes))
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.codes = np.array(codes, dtype=np.int32)
+        self.present = np.array(present, dtype=bool)
+        # Row of every tag occurrence, so tag hits can be scattered back onto rows
+        self.rows = np.repeat(np.arange(len(present), dtype=np.int32), np.diff(self.offsets))
+
+    def save(self, directory: str, prefix: str) -> Dict:
+        for name in ('offsets', 'codes', 'present', 'rows'):
+            np.save(os.path.join(directory, f"{prefix}_{name}.npy"), getattr(self, name))
+        return {"kind": "tags", "values": self.values}
+
+    @classmethod
+    def load(cls, directory: str, prefix: str, meta: Dict) -> 'TagColumn':
+        column = cls.__new__(cls)
+        column.values = [sys.intern(v) for v in meta["values"]]
+        column.lookup = {value: code for code, value in enumerate(column.values)}
+        for name in ('offsets', 'codes', 'present', 'rows'):
+            setattr(column, name, load_mapped(os.path.join(directory, f"{prefix}_{name}.npy")))
+        return column
+
+    def mask(self, needles: Iterable[str]) -> np.ndarray:
+        """Boolean row mask of rows carrying any of the tags (exact, case-insensitive)"""
+        needles = {normalize(n) for n in needles}
+        lut = np.array([normalize(tag) in needles for tag in self.values] + [False], dtype=bool)
+        mask = np.zeros(len(self.present), dtype=bool)
+        mask[self.rows[lut[self.codes]]] = True
+        return mask
+
+    def with_changes(self, source: np.ndarray, added: List[Any]) -> 'TagColumn':
+        """The column of a changed catalog (see catalog_diff.diff_catalog), given the tag lists of
+        the added products in order; tags not seen before extend the table"""
+        new = TagColumn(added)
+        column = TagColumn.__new__(TagColumn)
+        column.values = list(self.values)
+        column.lookup = dict(self.lookup)
+        for tag in new.values:
+            if tag not in column.lookup:
+                column.lookup[tag] = len(column.values)
+                column.values.append(tag)
+        remap = np.array([column.lookup[tag] for tag in new.values], dtype=np.int32)
+
+        column.offsets, picks = gather_ranges(self.offsets, new.offsets, source)
+        column.codes = np.concatenate([self.codes, remap[new.codes]]).astype(np.int32)[picks]
+        column.present = gather_rows(self.present, source, new.present)
+        column.rows = np.repeat(np.arange(len(column.present), dtype=np.int32), np.diff(column.offsets))
+        return column
+
+    def row_codes(self, row: int) -> np.ndarray:
+        return self.codes[self.offsets[row]:self.offsets[row + 1]]
+
+    def get(self, row: int) -> Any:
+        if not self.present[row]:
+            return _MISSING
+        return [self.values[code] for code in self.row_codes(row)]
+
+
+class PriceColumn:
+    """Prices as int64 cents; rows whose text does not round-trip keep their original string"""
+
+    def __init__(self, values: Iterable[Any]):
+        cents = []
+        self.overrides: Dict[int, Any] = {}
+        for row, value in enumerate(values):
+            if value is _MISSING:
+                cents.append(-1)
+                self.overrides[row] = _MISSING
+                continue
+            parsed = parse_price_cents(value)
+            cents.append(parsed)
+            if parsed < 0 or format_price(parsed) != value:
+                self.overrides[row] = value
+        self.cents = np.array(cents, dtype=np.int64)
+
+    def save(self, directory: str, prefix: str) -> Dict:
+        np.save(os.path.join(directory, f"{prefix}_cents.npy"), self.cents)
+        return {
+            "kind": "price",
+            "missing": [row for row, value in self.overrides.items() if value is _MISSING],
+            "overrides": [[row, value] for row, value in self.overrides.items() if value is not _MISSING]
+        }
+
+    @classmethod
+    def load(cls, directory: str, prefix: str, meta: Dict) -> 'PriceColumn':
+        column = cls.__new__(cls)
+        column.cents = load_mapped(os.path.join(directory, f"{prefix}_cents.npy"))
+        column.overrides = {row: value for row, value in meta["overrides"]}
+        column.overrides.update({row: _MISSING for row in meta["missing"]})
+        return column
+
+    def mask(self, min_price: Optional[float] = None, max_price: Optional[float] = None) -> np.ndarray:
+        """Boolean row mask of parseable prices within [min_price, max_price] dollars"""
+        mask = self.cents >= 0
+        if min_price is not None:
+            mask &= self.cents >= int(round(min_price * 100))
+        if max_price is not None:
+            mask &= self.cents <= int(round(max_price * 100))
+        return mask
+
+    def with_changes(self, source: np.ndarray, added: List[Any]) -> 'PriceColumn':
+        """The column of a changed catalog (see catalog_diff.diff_catalog), given the prices of the added products in order"""
+        new = PriceColumn(added)
+        column = PriceColumn.__new__(PriceColumn)
+        column.cents = gather_rows(self.cents, source, new.cents)
+        remap, added_rows = survivor_map(source, len(self.cents)), added_ids(source)
+        column.overrides = {int(remap[row]): value for row, value in self.overrides.items() if remap[row] >= 0}
+        column.overrides.update({int(added_rows[row]): value for row, value in new.overrides.items()})
+        return column
+
+    def get(self, row: int) -> Any:
+        if row in self.overrides:
+            return self.overrides[row]
+        return format_price(int(self.cents[row]))
+
+
+class BlobColumn:
+    """Arbitrary JSON values packed into one UTF-8 byte blob with row offsets, for memory-mapped stores"""
+
+    def __init__(self, values: Iterable[Any]):
+        chunks = []
+        offsets = [0]
+        for value in values:
+            encoded = b'' if value is _MISSING else json.dumps(value, ensure_ascii=False).encode('utf-8')
+            chunks.append(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+        self.blob = np.frombuffer(b''.join(chunks), dtype=np.uint8)
+        self.offsets = np.array(offsets, dtype=np.int64)
+
+    def get(self, row: int) -> Any:
+        start, end = self.offsets[row], self.offsets[row + 1]
+        if start == end:
+            return _MISSING
+        return json.loads(self.blob[start:end].tobytes().decode('utf-8'))
+
+    def with_changes(self, source: np.ndarray, added: List[Any]) -> 'BlobColumn':
+        """The column of a changed catalog (see catalog_diff.diff_catalog), given the values of the added products in order"""
+        new = BlobColumn(added)
+        column = BlobColumn.__new__(BlobColumn)
+        column.offsets, picks = gather_ranges(self.offsets, new.offsets, source)
+        column.blob = np.concatenate([self.blob, new.blob])[picks]
+        return column
+
+    def save(self, directory: str, prefix: str) -> Dict:
+        np.save(os.path.join(directory, f"{prefix}_blob.npy"), self.blob)
+        np.save(os.path.join(directory, f"{prefix}_offsets.npy"), self.offsets)
+        return {"kind": "blob"}
+
+    @classmethod
+    def load(cls, directory: str, prefix: str, meta: Dict) -> 'BlobColumn':
+        column = cls.__new__(cls)
+        column.blob = load_mapped(os.path.join(directory, f"{prefix}_blob.npy"))
+        column.offsets = load_mapped(os.path.join(directory, f"{prefix}_offsets.npy"))
+        return column
+
+
+def gather_rows(old: np.ndarray, source: np.ndarray, added: np.ndarray) -> np.ndarray:
+    """Per-row values of a changed catalog: old[source[i]] for kept rows, the added values in order elsewhere"""
+    rows = np.empty(len(source), dtype=np.result_type(old, added))
+    kept = np.flatnonzero(source >= 0)
+    rows[kept] = old[source[kept]]
+    rows[added_ids(source)] = added
+    return rows
+
+
+def gather_ranges(old_offsets: np.ndarray, added_offsets: np.ndarray,
+                  source: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Row offsets of a changed catalog for a CSR-style column, and the positions to take
+    from the old column's items followed by the added rows' items"""
+    starts = gather_rows(old_offsets[:-1], source, added_offsets[:-1] + old_offsets[-1])
+    lengths = gather_rows(np.diff(old_offsets), source, np.diff(added_offsets))
+    offsets = np.zeros(len(source) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # Item j of row i sits at starts[i] + j
+    picks = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+    return offsets, picks
+
+
+def build_column(field: str, values: List[Any]):
+    """Encode one field's values (_MISSING where a product lacks it) in the column type for that field"""
+    if field in CATEGORICAL_FIELDS:
+        return DictionaryColumn(values)
+    if field in TAG_FIELDS:
+        return TagColumn(values)
+    if field == PRICE_FIELD:
+        return PriceColumn(values)
+    return values
+
+
+COLUMN_KINDS = {
+    "dictionary": DictionaryColumn,
+    "tags": TagColumn,
+    "price": PriceColumn,
+    "blob": BlobColumn
+}
+
+
+class ProductRow(Mapping):
+    """Read-only dict-like view of one product in a CatalogStore"""
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store: 'CatalogStore', row: int):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, key: str) -> Any:
+        column = self.store.columns.get(key)
+        if column is None:
+            raise KeyError(key)
+        value = column.get(self.row) if not isinstance(column, list) else column[self.row]
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for key in self.store.fields:
+            if key in self:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ProductRow) and other.store is self.store:
+            return other.row == self.row
+        return super().__eq__(other)
+
+    def __hash__(self) -> int:
+        return hash((id(self.store), self.row))
+
+    def __repr__(self) -> str:
+        return f"ProductRow({self.copy()!r})"
+
+    def copy(self) -> Dict[str, Any]:
+        """Materialize the row as a plain dict"""
+        return dict(self.items())
+
+
+class CatalogStore(Sequence):
+    """Columnar product catalog; indexing yields ProductRow views so it can stand in for a list of dicts"""
+
+    def __init__(self, products: List[Dict]):
+        self.size = len(products)
+        self.source: Optional[Dict] = None
+        self.fields: List[str] = []
+        seen = set()
+        for product in products:
+            for key in product:
+                if key not in seen:
+                    seen.add(key)
+                    self.fields.append(key)
+
+        self.columns: Dict[str, Any] = {
+            field: build_column(field, [product.get(field, _MISSING) for product in products])
+            for field in self.fields
+        }
+
+    @classmethod
+    def from_records(cls, products: List[Dict]) -> 'CatalogStore':
+        """Build a store from the list of product dicts load_catalog returns"""
+        return cls(products)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ProductRow(self, row) for row in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('catalog index out of range')
+        return ProductRow(self, index)
+
+    def with_changes(self, source: np.ndarray, products: Sequence) -> 'CatalogStore':
+        """The store of a changed catalog (see catalog_diff.diff_catalog), rows in its file order
+
+        Kept rows are copied from the columns and only the added products are encoded;
+        this store is left untouched.
+        """
+        added_rows = added_ids(source).tolist()
+        added = [products[row] for row in added_rows]
+        store = CatalogStore.__new__(CatalogStore)
+        store.size = len(source)
+        store.source = None
+        store.fields = list(self.fields)
+        for product in added:
+            for key in product:
+                if key not in self.columns and key not in store.fields:
+                    store.fields.append(key)
+
+        store.columns = {}
+        for field in store.fields:
+            values = [product.get(field, _MISSING) for product in added]
+            column = self.columns.get(field)
+            if column is None:
+                rows = [_MISSING] * store.size
+                for row, value in zip(added_rows, values):
+                    rows[row] = value
+                store.columns[field] = build_column(field, rows)
+            elif isinstance(column, list):
+                rows = [column[row] if row >= 0 else None for row in source.tolist()]
+                for row, value in zip(added_rows, values):
+                    rows[row] = value
+                store.columns[field] = rows
+            else:
+                store.columns[field] = column.with_changes(source, values)
+        return store
+
+    def column(self, field: str) -> Optional[Any]:
+        """Return the raw column for a field, or None if no product has it"""
+        return self.columns.get(field)
+
+    def filter_mask(self,
+                    style_preferences: List[str] = None,
+                    occasions: List[str] = None,
+                    categories: List[str] = None,
+                    brands: List[str] = None,
+                    colors: List[str] = None,
+                    materials: List[str] = None,
+                    price_range: Tuple[Optional[float], Optional[float]] = None) -> np.ndarray:
+        """Combine every active predicate into one boolean row mask"""
+        mask = np.ones(self.size, dtype=bool)
+        for field, needles in (('style_tags', style_preferences), ('occasion_tags', occasions),
+                               ('category', categories), ('brand', brands),
+                               ('color', colors), ('material', materials)):
+            if needles:
+                mask &= self._mask(field, lambda column: column.mask(needles))
+        if price_range:
+            mask &= self._mask(PRICE_FIELD, lambda column: column.mask(*price_range))
+        return mask
+
+    def _mask(self, field: str, build) -> np.ndarray:
+        """Mask for one predicate; a field no product has matches nothing"""
+        column = self.columns.get(field)
+        if column is None:
+            return np.zeros(self.size, dtype=bool)
+        return build(column)
+
+    def save(self, path: str, source: Optional[Dict] = None):
+        """Write the store as a directory of .npy arrays plus meta.json, replacing any previous copy
+
+        The new copy is written beside the old one and swapped in by rename, so processes that
+        still have the previous arrays memory-mapped keep reading a consistent catalog.
+        """
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        columns_meta = []
+        for i, field in enumerate(self.fields):
+            column = self.columns[field]
+            if isinstance(column, list):
+                column = BlobColumn(column)
+            columns_meta.append({"field": field, **column.save(tmp_path, f"c{i}")})
+
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "size": self.size,
+                "fields": self.fields,
+                "columns": columns_meta,
+                "source": source
+            }, f, ensure_ascii=False)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def open(cls, path: str) -> 'CatalogStore':
+        """Open a saved store; arrays are memory-mapped, so pages load on first touch and are shared between processes"""
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog format version {meta.get('version')} in {path}")
+
+        store = cls.__new__(cls)
+        store.size = meta["size"]
+        store.fields = meta["fields"]
+        store.source = meta.get("source")
+        store.columns = {
+            column_meta["field"]: COLUMN_KINDS[column_meta["kind"]].load(path, f"c{i}", column_meta)
+            for i, column_meta in enumerate(meta["columns"])
+        }
+        return store
+
+
+def compiled_path(catalog_file: str) -> str:
+    """Where the compiled form of a JSON/JSONL catalog lives (catalog_enriched.json -> catalog_enriched.catalog)"""
+    return os.path.splitext(catalog_file)[0] + '.catalog'
+
+
+def source_signature(catalog_file: str) -> Dict:
+    """Size and mtime of the source catalog a compiled store was built from"""
+    stat = os.stat(catalog_file)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def compile_catalog(catalog_file: str, products: Optional[List[Dict]] = None) -> str:
+    """Compile a JSON/JSONL catalog into the memory-mappable store format; returns the store path"""
+    if products is None:
+        products = list(iter_products(catalog_file))
+    path = compiled_path(catalog_file)
+    CatalogStore(products).save(path, source=source_signature(catalog_file))
+    return path
+
+
+def write_catalog_with_compiled(catalog_file: str, products: List[Dict]) -> str:
+    """Write products as a JSON array catalog plus the compiled copy AIStyler opens instead of parsing it
+
+    Used by the importers; returns the compiled store path.
+    """
+    with open(catalog_file, 'w', encoding='utf-8') as f:
+        json.dump(products, f, indent=2, ensure_ascii=False)
+    return compile_catalog(catalog_file, products)
+
+
+def open_compiled(catalog_file: str) -> Optional[CatalogStore]:
+    """Open the compiled store for a catalog if it exists and is up to date with the source file"""
+    path = compiled_path(catalog_file)
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    try:
+        store = CatalogStore.open(path)
+    except (ValueError, KeyError, OSError, json.JSONDecodeError):
+        return None
+    if os.path.exists(catalog_file) and store.source != source_signature(catalog_file):
+        return None
+    return store
@@ -1,7 +1,13 @@
 """
-Create comprehensive sample data for testing the AI stylist
+Create comprehensive sample data for testing the AI stylist, and synthetic enriched catalogs for benchmarking
 """
+import argparse
+import itertools
 import json
+import math
+import random
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from catalog_store import write_catalog_with_compiled
 
 def create_sample_catalog():
     """Create a comprehensive sample catalog with various fashion items"""
@@ -197,11 +203,126 @@ def create_sample_catalog():
     ]
     
     # Save to JSON file
-    with open('catalog.json', 'w', encoding='utf-8') as f:
-        json.dump(sample_products, f, indent=2, ensure_ascii=False)
+    write_catalog_with_compiled('catalog.json', sample_products)
     
     print(f"✅ Created sample catalog with {len(sample_products)} products")
     return sample_products
 
+# Synthetic catalog vocabulary. Brands, tags and colors are drawn with skewed weights so a few
+# values are common and most are rare, as in a real catalog.
+SYNTHETIC_BRANDS = [
+    'Lululemon', 'Nike', 'Alo Yoga', 'Athleta', 'Outdoor Voices', 'Adidas', 'Under Armour', 'Vuori',
+    'Gymshark', 'Sweaty Betty', 'Beyond Yoga', 'Girlfriend Collective', 'Patagonia', 'The North Face',
+    'Reebok', 'Puma', 'New Balance', 'Hoka', 'On Running', 'Brooks', 'Fabletics', 'Rhone', 'Set Active',
+    'Varley', 'Splits59', 'Year of Ours', 'Manduka', 'Hydro Flask', 'Arc\'teryx', 'Salomon'
+]
+
+# Category: (share of the catalog, product nouns, median price in dollars)
+SYNTHETIC_CATEGORIES = {
+    'Tops': (0.26, ['Tank', 'Tee', 'Long Sleeve', 'Crop Top', 'Sports Bra', 'Hoodie', 'Pullover'], 58),
+    'Leggings': (0.16, ['Legging', 'Tight', '7/8 Legging', 'Flare Legging'], 92),
+    'Shorts': (0.09, ['Short', 'Running Short', 'Bike Short'], 52),
+    'Pants': (0.08, ['Jogger', 'Wide-Leg Pant', 'Track Pant'], 98),
+    'Dresses': (0.05, ['Dress', 'Tennis Dress', 'Jumpsuit'], 110),
+    'Outerwear': (0.09, ['Jacket', 'Vest', 'Parka', 'Windbreaker'], 168),
+    'Shoes': (0.12, ['Sneaker', 'Trainer', 'Running Shoe', 'Slide'], 130),
+    'Accessories': (0.15, ['Belt Bag', 'Cap', 'Socks', 'Yoga Mat', 'Water Bottle', 'Headband'], 36),
+}
+
+SYNTHETIC_STYLES = ['casual', 'athleisure', 'sporty', 'minimal', 'classic', 'trendy', 'elegant',
+                    'streetwear', 'boho', 'edgy', 'vintage', 'preppy']
+SYNTHETIC_OCCASIONS = ['everyday', 'gym', 'yoga', 'running', 'lounging', 'travel', 'work', 'outdoor',
+                       'studio', 'brunch', 'date night', 'hiking']
+SYNTHETIC_COLORS = ['Black', 'White', 'Navy', 'Grey', 'Beige', 'Olive', 'Sage', 'Blush', 'Burgundy',
+                    'Cobalt', 'Lavender', 'Rust', 'Cream', 'Charcoal', 'Teal', 'Coral']
+SYNTHETIC_MATERIALS = ['Nylon, Spandex', 'Polyester', 'Cotton', 'Organic Cotton', 'Recycled Polyester',
+                       'Modal, Spandex', 'Merino Wool', 'Fleece', 'Mesh', 'Natural Rubber', 'Stainless Steel']
+SYNTHETIC_ADJECTIVES = ['Airy', 'Align', 'Cloud', 'Core', 'Everyday', 'Flow', 'Essential', 'Pace', 'Studio',
+                        'Luxe', 'Seamless', 'Softstreme', 'Swift', 'Trail', 'Warmup', 'Ribbed', 'Sculpt']
+SYNTHETIC_FEATURES = ['moisture-wicking fabric', 'four-way stretch', 'a hidden waistband pocket',
+                      'breathable mesh panels', 'a relaxed fit', 'a second-skin feel', 'reflective details',
+                      'a brushed interior', 'flatlock seams', 'a water-resistant finish']
+
+
+def zipf_weights(count: int, exponent: float = 1.1) -> List[float]:
+    """Cumulative weights where the value at rank r is drawn in proportion to 1 / r^exponent"""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def sample_tags(rng: random.Random, values: Sequence[str], cum_weights: List[float], counts: Tuple[int, ...]) -> List[str]:
+    """1 to len(counts) distinct values, fewer tags being more likely"""
+    wanted = rng.choices(range(1, len(counts) + 1), weights=counts)[0]
+    tags: List[str] = []
+    while len(tags) < wanted:
+        tag = rng.choices(values, cum_weights=cum_weights)[0]
+        if tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def iter_synthetic_products(num_products: int, seed: int = 42) -> Iterator[Dict]:
+    """Yield a reproducible synthetic enriched catalog of num_products products
+
+    Categories follow SYNTHETIC_CATEGORIES shares; brands, colors and tags are Zipf-skewed;
+    prices are log-normal around each category's median.
+    """
+    rng = random.Random(seed)
+    categories = list(SYNTHETIC_CATEGORIES)
+    category_weights = list(itertools.accumulate(SYNTHETIC_CATEGORIES[c][0] for c in categories))
+    brand_weights = zipf_weights(len(SYNTHETIC_BRANDS))
+    style_weights = zipf_weights(len(SYNTHETIC_STYLES), 0.8)
+    occasion_weights = zipf_weights(len(SYNTHETIC_OCCASIONS), 0.8)
+    color_weights = zipf_weights(len(SYNTHETIC_COLORS))
+
+    for i in range(num_products):
+        category = rng.choices(categories, cum_weights=category_weights)[0]
+        _, nouns, median_price = SYNTHETIC_CATEGORIES[category]
+        noun = rng.choice(nouns)
+        brand = rng.choices(SYNTHETIC_BRANDS, cum_weights=brand_weights)[0]
+        color = rng.choices(SYNTHETIC_COLORS, cum_weights=color_weights)[0]
+        material = rng.choice(SYNTHETIC_MATERIALS)
+        occasion_tags = sample_tags(rng, SYNTHETIC_OCCASIONS, occasion_weights, (5, 3, 2))
+        price = max(5, round(median_price * math.exp(rng.gauss(0, 0.35))))
+        yield {
+            "name": f"{rng.choice(SYNTHETIC_ADJECTIVES)} {noun}",
+            "brand": brand,
+            "price": f"${price}" if rng.random() < 0.8 else f"${price - 1}.99",
+            "description": f"{noun} in {material.lower()} with {rng.choice(SYNTHETIC_FEATURES)}, "
+                           f"made for {occasion_tags[0]}.",
+            "image_url": f"https://example.com/products/{i}.jpg",
+            "category": category,
+            "color": color,
+            "size": "XS-XL",
+            "material": material,
+            "style_tags": sample_tags(rng, SYNTHETIC_STYLES, style_weights, (5, 3, 2)),
+            "occasion_tags": occasion_tags
+        }
+
+
+def create_synthetic_catalog(num_products: int, output_file: Optional[str] = None, seed: int = 42) -> str:
+    """Write a synthetic enriched catalog as JSONL (one product per line) and return its path
+
+    JSONL keeps memory flat while writing; AIStyler and the importers read it like a JSON array.
+    """
+    output_file = output_file or f"catalog_synthetic_{num_products}.jsonl"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for product in iter_synthetic_products(num_products, seed):
+            f.write(json.dumps(product, ensure_ascii=False) + '\n')
+    print(f"✅ Created synthetic catalog with {num_products} products in {output_file}")
+    return output_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the sample catalog, or a synthetic enriched catalog")
+    parser.add_argument('--synthetic', type=int, metavar='N', help="write a synthetic enriched catalog of N products instead")
+    parser.add_argument('--output', default=None, help="synthetic catalog file (default: catalog_synthetic_N.jsonl)")
+    parser.add_argument('--seed', type=int, default=42, help="seed of the synthetic catalog")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        create_synthetic_catalog(args.synthetic, args.output, args.seed)
+    else:
+        create_sample_catalog()
+
 if __name__ == "__main__":
-    create_sample_catalog()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -1,22 +1,88 @@
 """
 Enrich product catalog with GPT-4 generated style and occasion tags
 """
+import argparse
+import asyncio
 import json
 import os
-from openai import OpenAI
+import random
+from collections import Counter
+from openai import OpenAI, AsyncOpenAI, RateLimitError
 from dotenv import load_dotenv
 import time
+from enrichment_cache import EnrichmentCache, content_hash
+from enrichment_stream import CheckpointedWriter, count_products, iter_products, resolve_catalog
+from catalog_store import compile_catalog
+from metrics import REGISTRY, serve
 
 load_dotenv()
 
-class ProductEnricher:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+SYSTEM_PROMPT = "You are a fashion expert who categorizes clothing items with style and occasion tags. Always respond with valid JSON only."
+
+DEFAULT_TAGS = {
+    "style_tags": ["casual"],
+    "occasion_tags": ["everyday"]
+}
+
+
+class FallbackTags(dict):
+    """DEFAULT_TAGS handed out when tagging fails; distinguishable so they are never cached"""
+
+
+class EnrichmentCancelled(Exception):
+    """Raised out of enrich_catalog when its should_stop callback asks it to stop"""
+
+# Completion budget per tag request; also used to estimate token usage for rate limiting
+MAX_TAG_TOKENS = 200
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `per_minute` units per minute"""
     
-    def generate_tags(self, product_name, description, brand="", category=""):
-        """Generate style and occasion tags for a product using GPT-4"""
-        
-        prompt = f"""
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+    
+    def refill(self):
+        """Add the units accrued since the last refill"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (0 if they are now)"""
+        self.refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits applied together"""
+    
+    def __init__(self, requests_per_minute=500, tokens_per_minute=40000):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self, estimated_tokens):
+        """Wait until one request and `estimated_tokens` tokens fit in both budgets"""
+        async with self.lock:
+            while True:
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self.requests.tokens -= 1
+            self.tokens.tokens -= min(estimated_tokens, self.tokens.capacity)
+
+
+def build_tag_prompt(product_name, description, brand="", category=""):
+    """Build the tagging prompt for a single product"""
+    return f"""
         Given this fashion product information:
         
         Product Name: {product_name}
@@ -36,76 +102,505 @@ class ProductEnricher:
           "occasion_tags": ["tag1", "tag2"]
         }}
         """
+
+
+def tag_messages(prompt):
+    """Chat messages for a tagging prompt"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def build_batch_prompt(batch):
+    """Build one tagging prompt for several (product_id, product) pairs"""
+    product_blocks = "\n".join(
+        f"""
+        ID: {product_id}
+        Product Name: {product.get('name', '')}
+        Brand: {product.get('brand', '')}
+        Category: {product.get('category', '')}
+        Description: {product.get('description', '')}
+        """
+        for product_id, product in batch
+    )
+    return f"""
+        Given these fashion products:
+        {product_blocks}
+        Analyze each product and assign appropriate style and occasion tags.
+        
+        Style tags should describe the aesthetic/vibe (e.g., "minimal", "athleisure", "sporty", "casual", "elegant", "boho", "edgy", "classic", "trendy", "vintage")
+        
+        Occasion tags should describe when/where to wear it (e.g., "gym", "yoga", "running", "work", "casual", "date night", "travel", "lounging", "outdoor", "studio")
+        
+        Return ONLY a valid JSON array with exactly one object per product ID, in this exact format:
+        [
+          {{"id": "<product ID>", "style_tags": ["tag1", "tag2"], "occasion_tags": ["tag1", "tag2"]}}
+        ]
+        """
+
+
+def validate_tags(tags):
+    """Return {"style_tags": [...], "occasion_tags": [...]} if tags is well-formed, else None"""
+    if not isinstance(tags, dict):
+        return None
+    validated = {}
+    for key in ("style_tags", "occasion_tags"):
+        values = tags.get(key)
+        if not isinstance(values, list) or not values or not all(isinstance(v, str) and v.strip() for v in values):
+            return None
+        validated[key] = [v.strip() for v in values]
+    return validated
+
+
+def tags_or_fallback(tags, product_name):
+    """Validated tags of a single-product response, or FallbackTags (never cached) if they are malformed"""
+    validated = validate_tags(tags)
+    if validated is None:
+        print(f"Malformed tags for {product_name}: {str(tags)[:200]}")
+        REGISTRY.inc('enrichment_fallback_tags_total')
+        return FallbackTags(DEFAULT_TAGS)
+    return validated
+
+
+def parse_batch_response(content, expected_ids):
+    """Map product ID to validated tags for every well-formed element of a batch response"""
+    try:
+        elements = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    if isinstance(elements, dict):
+        # Tolerate the array being wrapped in an object, e.g. {"products": [...]}
+        elements = next((v for v in elements.values() if isinstance(v, list)), [])
+    if not isinstance(elements, list):
+        return {}
+    
+    expected = set(expected_ids)
+    tags_by_id = {}
+    for element in elements:
+        if not isinstance(element, dict):
+            continue
+        product_id = str(element.get("id", ""))
+        tags = validate_tags(element)
+        if product_id in expected and tags:
+            tags_by_id[product_id] = tags
+    return tags_by_id
+
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most `size` items"""
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class ProductEnricher:
+    def __init__(self, base_url=None):
+        # base_url (or OPENAI_BASE_URL) can point at a local stub of the chat completions endpoint
+        self.base_url = base_url or os.getenv('OPENAI_BASE_URL') or None
+        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), base_url=self.base_url)
+        self.async_client = None
+    
+    @REGISTRY.timed('enricher')
+    def generate_tags(self, product_name, description, brand="", category=""):
+        """Generate style and occasion tags for a product using GPT-4"""
+        
+        prompt = build_tag_prompt(product_name, description, brand, category)
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a fashion expert who categorizes clothing items with style and occasion tags. Always respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.3
-            )
+            with REGISTRY.time('openai_request_seconds', caller='enrichment'):
+                response = self.client.chat.completions.create(
+                    model="gpt-4",
+                    messages=tag_messages(prompt),
+                    max_tokens=MAX_TAG_TOKENS,
+                    temperature=0.3
+                )
+            REGISTRY.record_usage('enrichment', response.usage)
             
             # Parse the JSON response
             tags_json = response.choices[0].message.content.strip()
             tags = json.loads(tags_json)
-            
-            return tags
-            
+        
         except Exception as e:
             print(f"Error generating tags for {product_name}: {e}")
+            REGISTRY.inc('openai_errors_total', caller='enrichment', error=type(e).__name__)
             # Return default tags if API fails
-            return {
-                "style_tags": ["casual"],
-                "occasion_tags": ["everyday"]
-            }
+            REGISTRY.inc('enrichment_fallback_tags_total')
+            return FallbackTags(DEFAULT_TAGS)
+        
+        return tags_or_fallback(tags, product_name)
+    
+    async def acomplete_with_backoff(self, prompt, max_tokens, limiter=None, max_retries=6, base_delay=1.0):
+        """Run one async chat completion; backs off exponentially on 429 rate-limit errors only
+        
+        Any other error, or a 429 after max_retries, is raised to the caller.
+        """
+        # Rough token estimate (~4 characters per token) plus the completion budget
+        estimated_tokens = (len(prompt) + len(SYSTEM_PROMPT)) // 4 + max_tokens
+        
+        for attempt in range(max_retries + 1):
+            if limiter:
+                await limiter.acquire(estimated_tokens)
+            try:
+                with REGISTRY.time('openai_request_seconds', caller='enrichment_async'):
+                    response = await self.async_client.chat.completions.create(
+                        model="gpt-4",
+                        messages=tag_messages(prompt),
+                        max_tokens=max_tokens,
+                        temperature=0.3
+                    )
+                REGISTRY.record_usage('enrichment_async', response.usage)
+                return response.choices[0].message.content.strip()
+            
+            except RateLimitError:
+                if attempt == max_retries:
+                    raise
+                REGISTRY.inc('openai_retries_total', caller='enrichment_async')
+                delay = base_delay * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
     
-    def enrich_catalog(self, input_file='catalog.json', output_file='catalog_enriched.json'):
-        """Enrich the entire product catalog with GPT-4 tags"""
+    @REGISTRY.timed('enricher')
+    async def agenerate_tags(self, product_name, description, brand="", category="", limiter=None):
+        """Async generate_tags through the rate limiter and 429 backoff"""
+        
+        prompt = build_tag_prompt(product_name, description, brand, category)
         
-        # Load the catalog
         try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                products = json.load(f)
-        except FileNotFoundError:
-            print(f"Error: {input_file} not found. Please run import_google_sheets.py first.")
-            return
+            content = await self.acomplete_with_backoff(prompt, MAX_TAG_TOKENS, limiter)
+            tags = json.loads(content)
         
-        print(f"Enriching {len(products)} products with GPT-4 tags...")
+        except Exception as e:
+            print(f"Error generating tags for {product_name}: {e}")
+            REGISTRY.inc('openai_errors_total', caller='enrichment_async', error=type(e).__name__)
+            REGISTRY.inc('enrichment_fallback_tags_total')
+            return FallbackTags(DEFAULT_TAGS)
         
-        enriched_products = []
+        return tags_or_fallback(tags, product_name)
+    
+    @REGISTRY.timed('enricher')
+    def generate_tags_batch(self, batch):
+        """Tag several (product_id, product) pairs with one GPT-4 request
         
-        for i, product in enumerate(products):
-            print(f"Processing product {i+1}/{len(products)}: {product.get('name', 'Unknown')}")
-            
-            # Generate tags
-            tags = self.generate_tags(
+        Products missing from the response, or returned malformed, are retried on their own.
+        """
+        
+        prompt = build_batch_prompt(batch)
+        
+        try:
+            with REGISTRY.time('openai_request_seconds', caller='enrichment_batch'):
+                response = self.client.chat.completions.create(
+                    model="gpt-4",
+                    messages=tag_messages(prompt),
+                    max_tokens=MAX_TAG_TOKENS * len(batch),
+                    temperature=0.3
+                )
+            REGISTRY.record_usage('enrichment_batch', response.usage)
+            tags_by_id = parse_batch_response(response.choices[0].message.content.strip(), [pid for pid, _ in batch])
+        
+        except Exception as e:
+            print(f"Error generating tags for batch of {len(batch)}: {e}")
+            REGISTRY.inc('openai_errors_total', caller='enrichment_batch', error=type(e).__name__)
+            tags_by_id = {}
+        
+        for product_id, product in batch:
+            if product_id not in tags_by_id:
+                tags_by_id[product_id] = self.generate_tags(
+                    product_name=product.get('name', ''),
+                    description=product.get('description', ''),
+                    brand=product.get('brand', ''),
+                    category=product.get('category', '')
+                )
+        
+        return tags_by_id
+    
+    @REGISTRY.timed('enricher')
+    async def agenerate_tags_batch(self, batch, limiter=None):
+        """Async generate_tags_batch; missing or malformed products are retried on their own"""
+        
+        prompt = build_batch_prompt(batch)
+        
+        try:
+            content = await self.acomplete_with_backoff(prompt, MAX_TAG_TOKENS * len(batch), limiter)
+            tags_by_id = parse_batch_response(content, [pid for pid, _ in batch])
+        
+        except Exception as e:
+            print(f"Error generating tags for batch of {len(batch)}: {e}")
+            REGISTRY.inc('openai_errors_total', caller='enrichment_async', error=type(e).__name__)
+            tags_by_id = {}
+        
+        retries = [(product_id, product) for product_id, product in batch if product_id not in tags_by_id]
+        retried = await asyncio.gather(*(
+            self.agenerate_tags(
                 product_name=product.get('name', ''),
                 description=product.get('description', ''),
                 brand=product.get('brand', ''),
-                category=product.get('category', '')
+                category=product.get('category', ''),
+                limiter=limiter
             )
+            for _, product in retries
+        ))
+        tags_by_id.update({product_id: tags for (product_id, _), tags in zip(retries, retried)})
+        
+        return tags_by_id
+    
+    async def atag_products(self, items, concurrency=8, limiter=None, batch_size=1, on_batch=None):
+        """Tag (product_id, product) pairs concurrently, bounded by a semaphore and a requests/tokens-per-minute limiter
+        
+        Returns product ID -> tags; on_batch(tags_by_id) is called as each batch completes.
+        """
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        all_tags = {}
+        
+        async def tag(batch):
+            async with semaphore:
+                if len(batch) == 1:
+                    product_id, product = batch[0]
+                    tags_by_id = {product_id: await self.agenerate_tags(
+                        product_name=product.get('name', ''),
+                        description=product.get('description', ''),
+                        brand=product.get('brand', ''),
+                        category=product.get('category', ''),
+                        limiter=limiter
+                    )}
+                else:
+                    tags_by_id = await self.agenerate_tags_batch(batch, limiter)
             
-            # Add tags to product
-            enriched_product = product.copy()
-            enriched_product.update(tags)
-            enriched_products.append(enriched_product)
+            done = len(all_tags)
+            all_tags.update(tags_by_id)
+            for offset, (_, product) in enumerate(batch, 1):
+                print(f"Processed product {done + offset}/{len(items)}: {product.get('name', 'Unknown')}")
+            if on_batch:
+                on_batch(tags_by_id)
+        
+        await asyncio.gather(*(tag(batch) for batch in chunked(items, batch_size)))
+        return all_tags
+    
+    def tag_sequential(self, items, batch_size=1, on_batch=None):
+        """Tag (product_id, product) pairs one blocking request (of batch_size products) at a time
+        
+        Returns product ID -> tags; on_batch(tags_by_id) is called as each batch completes.
+        """
+        
+        all_tags = {}
+        
+        for batch in chunked(items, batch_size):
+            if len(batch) == 1:
+                product_id, product = batch[0]
+                print(f"Processing product {len(all_tags)+1}/{len(items)}: {product.get('name', 'Unknown')}")
+                
+                # Generate tags
+                tags_by_id = {product_id: self.generate_tags(
+                    product_name=product.get('name', ''),
+                    description=product.get('description', ''),
+                    brand=product.get('brand', ''),
+                    category=product.get('category', '')
+                )}
+            else:
+                print(f"Processing products {len(all_tags)+1}-{len(all_tags)+len(batch)}/{len(items)}")
+                tags_by_id = self.generate_tags_batch(batch)
+            
+            all_tags.update(tags_by_id)
+            if on_batch:
+                on_batch(tags_by_id)
             
             # Add a small delay to avoid rate limiting
             time.sleep(1)
         
+        return all_tags
+    
+    @REGISTRY.timed('enricher')
+    def enrich_catalog(self, input_file='catalog.json', output_file='catalog_enriched.json',
+                       use_async=False, concurrency=8, requests_per_minute=500, tokens_per_minute=40000,
+                       batch_size=1, cache_file='enrichment_cache.db', checkpoint_every=200,
+                       on_progress=None, should_stop=None):
+        """Enrich the entire product catalog with GPT-4 tags
+        
+        With use_async=True, products are tagged concurrently through the async client
+        instead of one blocking request per second. With batch_size > 1, that many
+        products share each request's prompt. Tags are cached in cache_file keyed by a
+        hash of each product's name, brand, category and description, so re-runs only
+        call GPT-4 for new or changed products (cache_file=None disables the cache).
+        
+        Products are processed in windows of checkpoint_every. Each finished window is
+        appended to <output_file>.jsonl and checkpointed, so an interrupted run resumes
+        where it stopped; the JSONL stream is compacted into output_file at the end.
+        Returns the number of products written.
+        
+        on_progress(processed, failed, total) is called as products are tagged (failed
+        counts products given fallback tags). should_stop() is checked at the same points;
+        once it returns True the run stops with EnrichmentCancelled, keeping its checkpoint
+        and cached tags so a later run resumes from there.
+        """
+        
+        # A chunked import writes catalog.jsonl rather than catalog.json; read whichever is newer
+        input_file = resolve_catalog(input_file)
+        if not os.path.exists(input_file):
+            print(f"Error: {input_file} not found. Please run import_google_sheets.py first.")
+            return
+        
+        writer = CheckpointedWriter(f"{output_file}.jsonl", f"{output_file}.checkpoint", input_file)
+        if writer.completed:
+            print(f"Resuming from checkpoint: {writer.completed} products already enriched")
+        
+        report = None
+        if on_progress or should_stop:
+            if on_progress and writer.total is None:
+                writer.total = count_products(input_file)
+            total = writer.total
+            progress = {'processed': writer.completed, 'failed': 0}
+            
+            def report(processed, failed):
+                progress['processed'] += processed
+                progress['failed'] += failed
+                if on_progress:
+                    on_progress(progress['processed'], progress['failed'], total)
+                if should_stop and should_stop():
+                    raise EnrichmentCancelled(f"Enrichment stopped after {progress['processed']} products")
+            
+            report(0, 0)
+        
+        cache = EnrichmentCache(cache_file) if cache_file else None
+        try:
+            asyncio.run(self.aenrich_windows(
+                input_file, writer, cache,
+                use_async=use_async,
+                concurrency=concurrency,
+                limiter=RateLimiter(requests_per_minute, tokens_per_minute),
+                batch_size=batch_size,
+                window_size=checkpoint_every,
+                report=report
+            ))
+        finally:
+            writer.close()
+            if cache is not None:
+                cache.close()
+        
         # Save enriched catalog
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(enriched_products, f, indent=2, ensure_ascii=False)
+        writer.compact(output_file)
+        
+        # Memory-mappable copy AIStyler opens instead of parsing the JSON
+        compile_catalog(output_file)
         
         print(f"Successfully enriched catalog saved to {output_file}")
-        return enriched_products
+        return writer.completed
+    
+    async def aenrich_windows(self, input_file, writer, cache, use_async=False, concurrency=8, limiter=None,
+                              batch_size=1, window_size=200, report=None):
+        """Enrich the products after the writer's checkpoint, one window at a time"""
+        
+        if use_async:
+            # Retries are handled in acomplete_with_backoff so that only 429s are retried, with our own backoff
+            self.async_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), base_url=self.base_url, max_retries=0)
+        
+        try:
+            window = []
+            for index, product in enumerate(iter_products(input_file)):
+                if index < writer.completed:
+                    continue
+                window.append(product)
+                if len(window) >= window_size:
+                    await self.aenrich_window(window, writer, cache, use_async, concurrency, limiter, batch_size, report)
+                    window = []
+            if window:
+                await self.aenrich_window(window, writer, cache, use_async, concurrency, limiter, batch_size, report)
+        finally:
+            if use_async:
+                await self.async_client.close()
+                self.async_client = None
+    
+    async def aenrich_window(self, products, writer, cache, use_async, concurrency, limiter, batch_size, report=None):
+        """Tag one window of products (cached tags first) and append it to the writer
+        
+        report(processed, failed), if given, is called with the products each batch accounted for.
+        """
+        
+        start = writer.completed
+        hashes = [content_hash(product) for product in products]
+        tags_by_hash = cache.get_many(set(hashes)) if cache is not None else {}
+        copies = Counter(hashes)
+        
+        # One request per distinct uncached content; the first product with that content stands in for the rest
+        pending = {}
+        for i, (key, product) in enumerate(zip(hashes, products)):
+            if key not in tags_by_hash and key not in pending:
+                pending[key] = (str(start + i), product)
+        hash_by_id = {product_id: key for key, (product_id, _) in pending.items()}
+        
+        print(f"Enriching products {start + 1}-{start + len(products)} with GPT-4 tags "
+              f"({len(products) - len(pending)} cached, {len(pending)} to tag)...")
+        
+        def on_batch(tags_by_id):
+            # Fallback tags from failed requests are not cached, so the next run retries them
+            fresh = {hash_by_id[pid]: tags for pid, tags in tags_by_id.items() if not isinstance(tags, FallbackTags)}
+            if cache is not None and fresh:
+                cache.put_many(fresh)
+            if report:
+                # Every product sharing a tagged content counts, including duplicates that were never sent
+                report(sum(copies[hash_by_id[pid]] for pid in tags_by_id),
+                       sum(copies[hash_by_id[pid]] for pid, tags in tags_by_id.items() if isinstance(tags, FallbackTags)))
+        
+        if report:
+            report(sum(copies[key] for key in tags_by_hash), 0)
+        
+        items = list(pending.values())
+        if not items:
+            tags_by_id = {}
+        elif use_async:
+            tags_by_id = await self.atag_products(
+                items,
+                concurrency=concurrency,
+                limiter=limiter,
+                batch_size=batch_size,
+                on_batch=on_batch
+            )
+        else:
+            tags_by_id = self.tag_sequential(items, batch_size=batch_size, on_batch=on_batch)
+        
+        tags_by_hash.update({hash_by_id[pid]: tags for pid, tags in tags_by_id.items()})
+        
+        # Add tags to products
+        enriched_products = []
+        for key, product in zip(hashes, products):
+            enriched_product = product.copy()
+            enriched_product.update(tags_by_hash[key])
+            enriched_products.append(enriched_product)
+        
+        writer.append(enriched_products)
 
 def main():
-    enricher = ProductEnricher()
-    enricher.enrich_catalog()
+    parser = argparse.ArgumentParser(description="Enrich the product catalog with GPT-4 style and occasion tags")
+    parser.add_argument('--input', default='catalog.json', help="catalog to enrich (.json or .jsonl; catalog.jsonl is used if it is newer)")
+    parser.add_argument('--output', default='catalog_enriched.json', help="enriched catalog to write")
+    parser.add_argument('--async', dest='use_async', action='store_true', help="tag products concurrently")
+    parser.add_argument('--concurrency', type=int, default=8, help="max in-flight requests in async mode")
+    parser.add_argument('--rpm', type=int, default=500, help="requests per minute limit in async mode")
+    parser.add_argument('--tpm', type=int, default=40000, help="tokens per minute limit in async mode")
+    parser.add_argument('--batch-size', type=int, default=1, help="products packed into each tagging request")
+    parser.add_argument('--no-cache', action='store_true', help="re-tag every product instead of reusing cached tags")
+    parser.add_argument('--checkpoint-every', type=int, default=200, help="products per checkpointed window")
+    parser.add_argument('--base-url', default=None, help="chat completions base URL (e.g. a local stub server)")
+    parser.add_argument('--metrics-port', type=int, default=None, help="serve Prometheus metrics on this port while running")
+    parser.add_argument('--metrics-file', default=None, help="write Prometheus metrics to this file when done")
+    args = parser.parse_args()
+    
+    if args.metrics_port:
+        serve(args.metrics_port)
+    
+    enricher = ProductEnricher(base_url=args.base_url)
+    enricher.enrich_catalog(
+        input_file=args.input,
+        output_file=args.output,
+        use_async=args.use_async,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        batch_size=args.batch_size,
+        cache_file=None if args.no_cache else 'enrichment_cache.db',
+        checkpoint_every=args.checkpoint_every
+    )
+    
+    if args.metrics_file:
+        REGISTRY.dump(args.metrics_file)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
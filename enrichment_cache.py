@@ -0,0 +1,75 @@
+"""
+Persistent cache of GPT-4 tags keyed by a hash of each product's content
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Dict, Iterable
+
+# The product fields the tagging prompt is built from; a change to any of them invalidates the tags
+HASHED_FIELDS = ('name', 'brand', 'category', 'description')
+
+# Stay well under SQLite's limit on host parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+def content_hash(product: Dict) -> str:
+    """Stable hash of the product fields that determine its tags"""
+    payload = json.dumps([str(product.get(field, '') or '') for field in HASHED_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class EnrichmentCache:
+    """SQLite-backed map of content hash to {"style_tags": [...], "occasion_tags": [...]}"""
+
+    def __init__(self, path: str = 'enrichment_cache.db'):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tags (
+                content_hash TEXT PRIMARY KEY,
+                style_tags TEXT NOT NULL,
+                occasion_tags TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self.connection.commit()
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, Dict]:
+        """Return cached tags for whichever of the hashes are present"""
+        hashes = list(hashes)
+        found = {}
+        for start in range(0, len(hashes), _LOOKUP_CHUNK):
+            chunk = hashes[start:start + _LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT content_hash, style_tags, occasion_tags FROM tags WHERE content_hash IN ({placeholders})",
+                chunk
+            )
+            for key, style_tags, occasion_tags in rows:
+                found[key] = {
+                    "style_tags": json.loads(style_tags),
+                    "occasion_tags": json.loads(occasion_tags)
+                }
+        return found
+
+    def put_many(self, tags_by_hash: Dict[str, Dict]):
+        """Store (or replace) tags for each hash in one transaction"""
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO tags (content_hash, style_tags, occasion_tags, updated_at) VALUES (?, ?, ?, ?)",
+                [
+                    (key, json.dumps(tags.get('style_tags', [])), json.dumps(tags.get('occasion_tags', [])), now)
+                    for key, tags in tags_by_hash.items()
+                ]
+            )
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,334 @@
+"""
+Background enrichment jobs - a persisted job queue and a worker process that runs enrich_catalog outside the app
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Job states; a cancel request moves queued jobs straight to cancelled and running ones to cancelling
+QUEUED, RUNNING, CANCELLING, COMPLETED, FAILED, CANCELLED = (
+    'queued', 'running', 'cancelling', 'completed', 'failed', 'cancelled'
+)
+ACTIVE_STATES = (QUEUED, RUNNING, CANCELLING)
+
+# Workers and their running jobs refresh a heartbeat this often (seconds); one this old means the worker is gone
+HEARTBEAT_SECONDS = 5
+STALE_SECONDS = 30
+
+# Least time between two progress writes of a running job
+PROGRESS_INTERVAL = 1.0
+
+# enrich_catalog arguments a job may carry
+JOB_PARAMS = ('input_file', 'output_file', 'use_async', 'concurrency', 'requests_per_minute',
+              'tokens_per_minute', 'batch_size', 'cache_file', 'checkpoint_every')
+
+
+class JobQueue:
+    """Enrichment jobs in SQLite, shared by the app (which submits and polls) and the worker (which runs them)
+
+    Each call opens its own connection, so any thread or process can use the queue.
+    Only one job runs at a time, because every job writes the same checkpointed output.
+    A job whose worker stopped heartbeating is queued again and resumes from its checkpoint.
+    """
+
+    def __init__(self, path: str = 'enrichment_jobs.db'):
+        self.path = path
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER,
+                    resumed_from INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS workers (pid INTEGER PRIMARY KEY, heartbeat_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """A short-lived autocommit connection; multi-statement updates use explicit transactions"""
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def submit(self, **params) -> str:
+        """Queue an enrichment job with enrich_catalog arguments; returns its job ID"""
+        unknown = set(params) - set(JOB_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown enrichment job parameters: {', '.join(sorted(unknown))}")
+        job_id = uuid.uuid4().hex[:12]
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, status, params, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), time.time())
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """A job with its progress (see job_status), or None"""
+        with self.connect() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return job_status(row) if row else None
+
+    def jobs(self, limit: int = 20) -> List[Dict]:
+        """Most recent jobs first"""
+        with self.connect() as connection:
+            rows = connection.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [job_status(row) for row in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job, or ask a running one to stop at its next batch; False if it already finished"""
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            updated = connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED)
+            ).rowcount
+            updated += connection.execute(
+                "UPDATE jobs SET status = ? WHERE id = ? AND status = ?", (CANCELLING, job_id, RUNNING)
+            ).rowcount
+            connection.execute("COMMIT")
+        return bool(updated)
+
+    def claim(self) -> Optional[Dict]:
+        """Start the oldest queued job, unless one is already running; returns it, or None"""
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # Jobs of workers that died: unfinished work resumes from its checkpoint, pending cancels complete
+            connection.execute(
+                "UPDATE jobs SET status = ? WHERE status = ? AND heartbeat_at < ?", (QUEUED, RUNNING, now - STALE_SECONDS)
+            )
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE status = ? AND heartbeat_at < ?",
+                (CANCELLED, now, CANCELLING, now - STALE_SECONDS)
+            )
+            busy = connection.execute("SELECT 1 FROM jobs WHERE status IN (?, ?)", (RUNNING, CANCELLING)).fetchone()
+            row = None if busy else connection.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ?, error = NULL WHERE id = ?",
+                    (RUNNING, now, now, row['id'])
+                )
+            connection.execute("COMMIT")
+        return self.get(row['id']) if row is not None else None
+
+    def progress(self, job_id: str, processed: int, failed: int, total: Optional[int], resumed: bool = False):
+        """Record a running job's progress (resumed marks the count it started from in this run)"""
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET processed = ?, failed = ?, total = ?, heartbeat_at = ?, "
+                "resumed_from = CASE WHEN ? THEN ? ELSE resumed_from END WHERE id = ?",
+                (processed, failed, total, time.time(), resumed, processed, job_id)
+            )
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self.connect() as connection:
+            row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or row['status'] == CANCELLING
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None):
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def heartbeat(self, pid: int, job_id: Optional[str] = None):
+        """Mark a worker (and the job it runs) alive"""
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO workers (pid, heartbeat_at) VALUES (?, ?)", (pid, now))
+            if job_id is not None:
+                connection.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (now, job_id))
+
+    def retire(self, pid: int):
+        with self.connect() as connection:
+            connection.execute("DELETE FROM workers WHERE pid = ?", (pid,))
+
+    def worker_alive(self) -> bool:
+        """Whether some worker process heartbeated recently"""
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT 1 FROM workers WHERE heartbeat_at >= ?", (time.time() - STALE_SECONDS,)
+            ).fetchone()
+        return row is not None
+
+
+def job_status(row: sqlite3.Row) -> Dict:
+    """A job row as a dict with its parameters decoded and an ETA estimated from this run's rate"""
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['eta_seconds'] = None
+    if job['status'] in (RUNNING, CANCELLING) and job['total'] and job['started_at']:
+        done = job['processed'] - job['resumed_from']
+        elapsed = (job['heartbeat_at'] or time.time()) - job['started_at']
+        if done > 0 and elapsed > 0:
+            job['eta_seconds'] = max(0.0, (job['total'] - job['processed']) * elapsed / done)
+    return job
+
+
+class EnrichmentWorker:
+    """Runs queued jobs one at a time with ProductEnricher.enrich_catalog, until idle for idle_exit seconds"""
+
+    def __init__(self, queue: JobQueue, idle_exit: Optional[float] = 60, poll_seconds: float = 2.0):
+        self.queue = queue
+        self.idle_exit = idle_exit
+        self.poll_seconds = poll_seconds
+        self.pid = os.getpid()
+        self.job_id: Optional[str] = None
+        self.stopped = threading.Event()
+
+    def beat(self):
+        while not self.stopped.wait(HEARTBEAT_SECONDS):
+            self.queue.heartbeat(self.pid, self.job_id)
+
+    def run(self):
+        self.queue.heartbeat(self.pid)
+        threading.Thread(target=self.beat, daemon=True).start()
+        idle_since = time.time()
+        try:
+            while True:
+                job = self.queue.claim()
+                if job is None:
+                    if self.idle_exit is not None and time.time() - idle_since > self.idle_exit:
+                        return
+                    time.sleep(self.poll_seconds)
+                    continue
+                self.run_job(job)
+                idle_since = time.time()
+        finally:
+            self.stopped.set()
+            self.queue.retire(self.pid)
+
+    def run_job(self, job: Dict):
+        """Run one claimed job to completion, cancellation or failure"""
+        # Imported here so submitting and polling jobs never needs the OpenAI client
+        from enrich_with_gpt import EnrichmentCancelled, ProductEnricher
+
+        job_id = self.job_id = job['id']
+        print(f"Starting enrichment job {job_id}")
+        last_write = [0.0, True]
+
+        def on_progress(processed, failed, total):
+            now = time.time()
+            if now - last_write[0] >= PROGRESS_INTERVAL or last_write[1] or processed == total:
+                # The first report of a run is where it resumed from its checkpoint
+                self.queue.progress(job_id, processed, failed, total, resumed=last_write[1])
+                last_write[:] = [now, False]
+
+        try:
+            ProductEnricher().enrich_catalog(
+                **job['params'],
+                on_progress=on_progress,
+                should_stop=lambda: self.queue.cancel_requested(job_id)
+            )
+        except EnrichmentCancelled:
+            self.queue.finish(job_id, CANCELLED)
+            print(f"Enrichment job {job_id} cancelled")
+        except Exception as e:
+            self.queue.finish(job_id, FAILED, f"{type(e).__name__}: {e}")
+            print(f"Enrichment job {job_id} failed: {e}")
+        else:
+            self.queue.finish(job_id, COMPLETED)
+            print(f"Enrichment job {job_id} completed")
+        finally:
+            self.job_id = None
+
+
+def start_worker(queue_path: str = 'enrichment_jobs.db', idle_exit: float = 60) -> bool:
+    """Launch a detached worker process unless one is alive; returns whether one was launched
+
+    The worker belongs to no session or script run: it keeps going when the browser is
+    closed or the app restarts, and exits once the queue has been idle for idle_exit seconds.
+    """
+    if JobQueue(queue_path).worker_alive():
+        return False
+    command = [sys.executable, '-u', os.path.abspath(__file__), '--queue', queue_path, 'worker', '--idle-exit', str(idle_exit)]
+    log = open('enrichment_worker.log', 'ab')
+    if os.name == 'nt':
+        subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                         creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, start_new_session=True)
+    log.close()
+    return True
+
+
+def format_job(job: Dict) -> str:
+    total = job['total'] if job['total'] is not None else '?'
+    line = f"{job['id']}  {job['status']:<10}  {job['processed']}/{total} processed, {job['failed']} failed"
+    if job['eta_seconds'] is not None:
+        line += f", ETA {job['eta_seconds'] / 60:.1f} min"
+    if job['error']:
+        line += f"  ({job['error']})"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue, run and monitor background enrichment jobs")
+    parser.add_argument('--queue', default='enrichment_jobs.db', help="job queue database")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit = commands.add_parser('submit', help="queue a job and make sure a worker is running")
+    submit.add_argument('--input', default='catalog.json', help="catalog to enrich (.json or .jsonl)")
+    submit.add_argument('--output', default='catalog_enriched.json', help="enriched catalog to write")
+    submit.add_argument('--async', dest='use_async', action='store_true', help="tag products concurrently")
+    submit.add_argument('--batch-size', type=int, default=1, help="products packed into each tagging request")
+    submit.add_argument('--no-worker', action='store_true', help="only queue the job")
+
+    status = commands.add_parser('status', help="show recent jobs, or one job")
+    status.add_argument('job_id', nargs='?')
+
+    cancel = commands.add_parser('cancel', help="cancel a queued or running job")
+    cancel.add_argument('job_id')
+
+    worker = commands.add_parser('worker', help="run queued jobs in this process")
+    worker.add_argument('--idle-exit', type=float, default=None, help="exit after this many idle seconds (default: never)")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    if args.command == 'submit':
+        job_id = queue.submit(input_file=args.input, output_file=args.output,
+                              use_async=args.use_async, batch_size=args.batch_size)
+        print(f"Queued enrichment job {job_id}")
+        if not args.no_worker and start_worker(args.queue):
+            print("Started a background worker (log: enrichment_worker.log)")
+    elif args.command == 'status':
+        jobs = [queue.get(args.job_id)] if args.job_id else queue.jobs()
+        for job in jobs:
+            print(format_job(job) if job else f"No job {args.job_id}")
+    elif args.command == 'cancel':
+        print("Cancel requested" if queue.cancel(args.job_id) else f"Job {args.job_id} is not queued or running")
+    else:
+        EnrichmentWorker(queue, idle_exit=args.idle_exit).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Streaming, checkpointed output for catalog enrichment - JSONL records plus a resumable checkpoint
+"""
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Optional, TextIO
+
+# Characters of a JSON array file read at a time when streaming its elements
+_READ_CHUNK = 1 << 20
+
+# Whitespace and commas between array elements
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_products(path: str) -> Iterator[Dict]:
+    """Yield products from a JSON array file, or line by line from a .jsonl file
+
+    Both are streamed: memory follows the largest product, not the catalog.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+def iter_json_array(f: TextIO) -> Iterator:
+    """Yield the elements of a top-level JSON array one at a time, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    buffer = f.read(_READ_CHUNK).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("catalog is not a JSON array")
+    position, eof = 1, False
+    while True:
+        position = _SEPARATORS.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            if position == len(buffer):
+                raise json.JSONDecodeError("need more input", buffer, position)
+            # An element only counts as complete once it ends before the buffer does,
+            # or the file is exhausted; products are objects, so they end with "}"
+            element, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(_READ_CHUNK)
+            buffer, position, eof = buffer[position:] + more, 0, not more
+            continue
+        yield element
+        position = end
+        if position > _READ_CHUNK:
+            buffer, position = buffer[position:], 0
+
+
+def count_products(path: str) -> int:
+    """Number of products in a catalog file
+
+    A .jsonl catalog is counted by its non-blank lines without decoding them; a JSON
+    array has to be parsed (streamed, so memory stays bounded).
+    """
+    if path.endswith('.jsonl'):
+        with open(path, 'rb') as f:
+            return sum(1 for line in f if line.strip())
+    return sum(1 for _ in iter_products(path))
+
+
+def resolve_catalog(path: str) -> str:
+    """path, or the JSONL catalog a chunked import writes beside it (catalog.json -> catalog.jsonl)
+    if that is missing or older, so the latest import is the one read"""
+    root, ext = os.path.splitext(path)
+    jsonl = root + '.jsonl'
+    if ext != '.json' or not os.path.exists(jsonl):
+        return path
+    if not os.path.exists(path) or os.path.getmtime(jsonl) > os.path.getmtime(path):
+        return jsonl
+    return path
+
+
+def input_signature(path: str) -> Dict:
+    """Identify an input file version, so a checkpoint is only resumed against the same input"""
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def write_json_atomic(path: str, payload, **dump_kwargs):
+    """Write JSON to a temp file and rename it over path"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointedWriter:
+    """Appends enriched records to a JSONL file and checkpoints how many are durably written
+
+    The checkpoint records the record count and byte offset after each flush. A restarted
+    run against the same input truncates any partially written tail and resumes from there.
+    """
+
+    def __init__(self, stream_file: str, checkpoint_file: str, input_file: str):
+        self.stream_file = stream_file
+        self.checkpoint_file = checkpoint_file
+        self.signature = input_signature(input_file)
+        self.completed = 0
+        # Product count of the input, kept in the checkpoint so a resumed run need not count again
+        self.total: Optional[int] = None
+        offset = 0
+
+        checkpoint = self.load_checkpoint()
+        if checkpoint and checkpoint.get('input') == self.signature and os.path.exists(stream_file):
+            self.completed = checkpoint['completed']
+            self.total = checkpoint.get('total')
+            offset = checkpoint['offset']
+
+        self.stream = open(stream_file, 'a+b')
+        self.stream.truncate(offset)
+        self.stream.seek(offset)
+
+    def load_checkpoint(self):
+        """Return the saved checkpoint, or None if there is none"""
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def append(self, records: List[Dict]):
+        """Durably append records, then advance the checkpoint past them"""
+        for record in records:
+            self.stream.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+        self.completed += len(records)
+        write_json_atomic(self.checkpoint_file, {
+            "input": self.signature,
+            "completed": self.completed,
+            "total": self.total,
+            "offset": self.stream.tell()
+        })
+
+    def close(self):
+        self.stream.close()
+
+    def compact(self, output_file: str):
+        """Rewrite the JSONL stream as the indented JSON array AIStyler loads, then drop the stream and checkpoint"""
+        self.close()
+        tmp_path = f"{output_file}.tmp"
+        with open(self.stream_file, 'r', encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+            dst.write('[')
+            first = True
+            for line in src:
+                if not line.strip():
+                    continue
+                # Same layout json.dump(products, f, indent=2) produces, one record at a time
+                record = json.dumps(json.loads(line), indent=2, ensure_ascii=False)
+                dst.write(('\n' if first else ',\n') + '\n'.join('  ' + part for part in record.split('\n')))
+                first = False
+            dst.write('\n]' if not first else ']')
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, output_file)
+        for path in (self.stream_file, self.checkpoint_file):
+            if os.path.exists(path):
+                os.remove(path)
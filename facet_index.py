@@ -0,0 +1,154 @@
+"""
+Facet counts - how many products carry each style, occasion, category, brand, color and material value
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from catalog_diff import added_ids, survivor_map
+from catalog_store import CatalogStore, DictionaryColumn, TagColumn
+
+# Facet (named like the AIStyler filter it feeds) -> product field
+FACET_FIELDS = {
+    'style_preferences': 'style_tags',
+    'occasions': 'occasion_tags',
+    'categories': 'category',
+    'brands': 'brand',
+    'colors': 'color',
+    'materials': 'material',
+}
+
+_NO_IDS = np.zeros(0, dtype=np.int64)
+
+
+class Facet:
+    """One (product ID, value code) entry per value a product carries, plus the live count of every value"""
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.lookup: Dict[Any, int] = {}
+        self.owners = _NO_IDS
+        self.codes = np.zeros(0, dtype=np.int32)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def code(self, value) -> int:
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def add_entries(self, owners: np.ndarray, codes: np.ndarray):
+        self.owners = np.concatenate([self.owners, owners]) if len(self.owners) else owners
+        self.codes = np.concatenate([self.codes, codes]) if len(self.codes) else codes
+        counts = np.bincount(codes, minlength=len(self.values))
+        counts[:len(self.counts)] += self.counts
+        self.counts = counts
+
+    def renumbered(self, remap: np.ndarray) -> 'Facet':
+        """A copy with owners mapped through catalog_diff.survivor_map and removed products' entries dropped"""
+        facet = Facet()
+        facet.values, facet.lookup = list(self.values), dict(self.lookup)
+        owners = remap[self.owners]
+        kept = owners >= 0
+        facet.owners, facet.codes = owners[kept], self.codes[kept]
+        facet.counts = np.bincount(facet.codes, minlength=len(facet.values))
+        return facet
+
+    def count_map(self, counts: np.ndarray) -> Dict[Any, int]:
+        return {self.values[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+
+class FacetIndex:
+    """Value -> product count maps for every facet, carried over catalog changes (see with_changes)
+
+    Unconditional counts are maintained as products are added, so reading them costs
+    O(facet size). Counts conditioned on a set of product IDs (e.g. those matching the
+    current selection in the other facets) are one bincount over the facet's entries.
+    Product IDs are positions in the catalog, as everywhere else in AIStyler.
+    """
+
+    def __init__(self, products: Sequence = ()):
+        self.facets: Dict[str, Facet] = {facet: Facet() for facet in FACET_FIELDS}
+        self.size = 0
+        if isinstance(products, CatalogStore):
+            self.add_columns(products)
+        else:
+            self.add(range(len(products)), products)
+
+    def add_columns(self, store: CatalogStore):
+        """Index a columnar catalog straight from its dictionary codes, without visiting rows"""
+        for facet, field in FACET_FIELDS.items():
+            column = store.column(field)
+            if isinstance(column, TagColumn):
+                owners, codes = column.rows.astype(np.int64), np.asarray(column.codes)
+                # A tag repeated within one product counts once
+                keys = np.unique(owners * max(1, len(column.values)) + codes)
+                owners, codes = keys // max(1, len(column.values)), keys % max(1, len(column.values))
+            elif isinstance(column, DictionaryColumn):
+                codes = np.asarray(column.codes)
+                owners = np.flatnonzero(codes >= 0)
+                codes = codes[owners]
+            else:
+                if column is not None:
+                    self.add_values(facet, range(store.size), store)
+                continue
+            # Map the column's codes onto the facet's own vocabulary, dropping empty values
+            remap = np.array([self.facets[facet].code(v) if v else -1 for v in column.values] + [-1], dtype=np.int64)
+            codes = remap[codes]
+            keep = codes >= 0
+            self.facets[facet].add_entries(owners[keep], codes[keep].astype(np.int32))
+        self.size = max(self.size, store.size)
+
+    def add(self, product_ids: Iterable[int], products: Iterable):
+        """Count new products (or new versions of removed ones) under their IDs"""
+        product_ids = list(product_ids)
+        products = list(products)
+        for facet in FACET_FIELDS:
+            self.add_values(facet, product_ids, products)
+        if product_ids:
+            self.size = max(self.size, max(product_ids) + 1)
+
+    def add_values(self, facet: str, product_ids: Sequence[int], products: Iterable):
+        """Add the entries of one facet for products, counting each distinct non-empty value once per product"""
+        field = FACET_FIELDS[facet]
+        code = self.facets[facet].code
+        owners, codes = [], []
+        for product_id, product in zip(product_ids, products):
+            values = product.get(field)
+            if not values:
+                continue
+            if isinstance(values, (list, tuple)):
+                for value in dict.fromkeys(values):
+                    if value:
+                        owners.append(product_id)
+                        codes.append(code(value))
+            else:
+                owners.append(product_id)
+                codes.append(code(values))
+        self.facets[facet].add_entries(np.array(owners, dtype=np.int64), np.array(codes, dtype=np.int32))
+
+    def with_changes(self, source: np.ndarray, products: Sequence) -> 'FacetIndex':
+        """The counts of a changed catalog (see catalog_diff.diff_catalog), leaving these untouched
+
+        Entries of kept products are renumbered and only the added products are visited.
+        """
+        remap = survivor_map(source, self.size)
+        index = FacetIndex()
+        index.facets = {facet: self.facets[facet].renumbered(remap) for facet in FACET_FIELDS}
+        added = added_ids(source).tolist()
+        index.add(added, [products[i] for i in added])
+        index.size = len(products)
+        return index
+
+    def counts(self, facet: str, product_ids: Optional[Sequence[int]] = None) -> Dict[Any, int]:
+        """Value -> count for a facet, over the whole catalog or only the given products; zero counts are left out"""
+        index = self.facets[facet]
+        if product_ids is None:
+            return index.count_map(index.counts)
+        mask = np.zeros(self.size, dtype=bool)
+        mask[np.asarray(product_ids, dtype=np.int64)] = True
+        return index.count_map(np.bincount(index.codes[mask[index.owners]], minlength=len(index.values)))
+
+    def values(self, facet: str) -> List[Any]:
+        """Sorted values carried by at least one product"""
+        index = self.facets[facet]
+        return sorted(index.values[code] for code in np.flatnonzero(index.counts))
@@ -2,11 +2,21 @@
 Import product data from a CSV file (for when Google Sheets is not publicly accessible)
 """
 import pandas as pd
-import json
-import sys
+import argparse
+import os
+from catalog_store import compile_catalog, write_catalog_with_compiled
 
-def import_from_csv(csv_file_path):
-    """Import data from a CSV file and convert to JSON format"""
+def import_from_csv(csv_file_path, chunksize=None, output_file=None):
+    """Import data from a CSV file and convert to JSON format
+    
+    With chunksize, the CSV is streamed in chunks of that many rows and written to
+    JSONL (default catalog.jsonl) as it is read, so memory stays bounded.
+    """
+    
+    if chunksize:
+        return import_from_csv_chunked(csv_file_path, output_file or 'catalog.jsonl', chunksize)
+    
+    output_file = output_file or 'catalog.json'
     
     try:
         # Read the CSV data
@@ -15,21 +25,15 @@ def import_from_csv(csv_file_path):
         
         # Clean and process the data
         df = df.dropna(how='all')  # Remove completely empty rows
+        df = df.fillna("")  # Replace NaN values in one vectorized pass
         
         # Convert to list of dictionaries
         products = df.to_dict('records')
         
-        # Clean up any NaN values
-        for product in products:
-            for key, value in product.items():
-                if pd.isna(value):
-                    product[key] = ""
-        
         # Save to JSON file
-        with open('catalog.json', 'w', encoding='utf-8') as f:
-            json.dump(products, f, indent=2, ensure_ascii=False)
+        write_catalog_with_compiled(output_file, products)
         
-        print(f"Successfully imported {len(products)} products to catalog.json")
+        print(f"Successfully imported {len(products)} products to {output_file}")
         print(f"Sample product keys: {list(products[0].keys()) if products else 'No products found'}")
         
         return products
@@ -38,11 +42,62 @@ def import_from_csv(csv_file_path):
         print(f"Error importing from CSV: {e}")
         return None
 
+def import_from_csv_chunked(csv_file_path, output_file='catalog.jsonl', chunksize=50000):
+    """Stream a CSV into a JSONL catalog chunk by chunk; returns the number of products written"""
+    
+    tmp_file = f"{output_file}.tmp"
+    
+    try:
+        print(f"Importing data from {csv_file_path} in chunks of {chunksize} rows...")
+        total = 0
+        sample_keys = None
+        
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            # Read every column as text so a column's type does not depend on which chunk it is in
+            for chunk in pd.read_csv(csv_file_path, chunksize=chunksize, dtype=str):
+                # Clean and process the data
+                chunk = chunk.dropna(how='all')  # Remove completely empty rows
+                chunk = chunk.fillna("")
+                if chunk.empty:
+                    continue
+                
+                if sample_keys is None:
+                    sample_keys = list(chunk.columns)
+                
+                # One JSON object per line, serialized by pandas for the whole chunk
+                f.write(chunk.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n') + '\n')
+                total += len(chunk)
+                print(f"  {total} products written...")
+        
+        # Replace the previous catalog only once the whole file has been imported
+        os.replace(tmp_file, output_file)
+        
+        # Compiling loads the whole catalog once; the import itself stays chunked
+        compile_catalog(output_file)
+        
+        print(f"Successfully imported {total} products to {output_file}")
+        print(f"Sample product keys: {sample_keys if sample_keys else 'No products found'}")
+        
+        return total
+        
+    except Exception as e:
+        print(f"Error importing from CSV: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        return None
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python import_csv.py <csv_file_path>")
-        print("Example: python import_csv.py products.csv")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Import product data from a CSV file",
+        usage="python import_csv.py <csv_file_path> [--chunksize N] [--output FILE]",
+        epilog="Example: python import_csv.py products.csv"
+    )
+    parser.add_argument('csv_file', help="path to the CSV file")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="stream the CSV in chunks of N rows and write JSONL (for very large files)")
+    parser.add_argument('--output', default=None,
+                        help="output file (default catalog.json, or catalog.jsonl with --chunksize, "
+                             "which the enricher and app read instead of an older or missing catalog.json)")
+    args = parser.parse_args()
     
-    csv_file = sys.argv[1]
-    import_from_csv(csv_file)
\ No newline at end of file
+    import_from_csv(args.csv_file, chunksize=args.chunksize, output_file=args.output)
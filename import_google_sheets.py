@@ -5,6 +5,7 @@ import pandas as pd
 import json
 import os
 from dotenv import load_dotenv
+from catalog_store import write_catalog_with_compiled
 
 load_dotenv()
 
@@ -36,8 +37,7 @@ def import_from_google_sheets():
                     product[key] = ""
         
         # Save to JSON file
-        with open('catalog.json', 'w', encoding='utf-8') as f:
-            json.dump(products, f, indent=2, ensure_ascii=False)
+        write_catalog_with_compiled('catalog.json', products)
         
         print(f"Successfully imported {len(products)} products to catalog.json")
         print(f"Sample product keys: {list(products[0].keys()) if products else 'No products found'}")
@@ -0,0 +1,223 @@
+"""
+In-process metrics - counters, gauges and latency histograms for AIStyler and ProductEnricher, rendered in Prometheus text format
+"""
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATIO_BUCKETS = (0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'ai_stylist_method_seconds': ('histogram', "Latency of instrumented AIStyler and ProductEnricher methods", LATENCY_BUCKETS),
+    'ai_stylist_catalog_products': ('gauge', "Products in the most recently loaded catalog", None),
+    'ai_stylist_catalog_load_seconds': ('histogram', "Time to load the catalog when an AIStyler is created", LATENCY_BUCKETS),
+    'ai_stylist_catalog_changes_total': ('counter', "Products added and removed by hot catalog refreshes (an edit counts as both)", None),
+    'ai_stylist_filter_selectivity': ('histogram', "Share of the catalog matched by a recommendation query's filters", RATIO_BUCKETS),
+    'ai_stylist_cache_requests_total': ('counter', "Cache lookups by cache and result", None),
+    'openai_request_seconds': ('histogram', "OpenAI chat completion latency (whole stream for streamed requests)", LATENCY_BUCKETS),
+    'openai_first_token_seconds': ('histogram', "Time to the first streamed token of an OpenAI chat completion", LATENCY_BUCKETS),
+    'openai_tokens_total': ('counter', "OpenAI tokens used, by caller and kind (prompt or completion)", None),
+    'openai_retries_total': ('counter', "OpenAI requests retried after a rate-limit error", None),
+    'openai_errors_total': ('counter', "OpenAI requests that failed, by caller and error type", None),
+    'enrichment_fallback_tags_total': ('counter', "Products given the default tags because tagging failed", None),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus exposes them"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated q-quantile, interpolating linearly within the bucket it falls in (like histogram_quantile)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+def label_key(labels: Dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Metrics:
+    """Thread-safe registry of the metrics in METRICS, keyed by name and label values"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values: Dict[str, Dict[Labels, object]] = {name: {} for name in METRICS}
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        """Add to a counter"""
+        key = label_key(labels)
+        with self.lock:
+            series = self.values[name]
+            series[key] = series.get(key, 0.0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge"""
+        with self.lock:
+            self.values[name][label_key(labels)] = float(value)
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one value in a histogram"""
+        key = label_key(labels)
+        with self.lock:
+            series = self.values[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name: str, **labels) -> Iterator[None]:
+        """Observe the wall time of a block, in seconds, whether or not it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, component: str):
+        """Decorator recording a method's latency in ai_stylist_method_seconds{component, method}
+
+        Works on plain and async functions. Generators are timed up to their first item only,
+        so instrument those where they finish instead.
+        """
+        def decorate(func):
+            labels = {'component': component, 'method': func.__name__}
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.time('ai_stylist_method_seconds', **labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time('ai_stylist_method_seconds', **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record_usage(self, caller: str, usage):
+        """Count the prompt and completion tokens of an OpenAI response's usage, when it reports one"""
+        if usage is None:
+            return
+        for kind in ('prompt', 'completion'):
+            tokens = getattr(usage, f'{kind}_tokens', None)
+            if tokens:
+                self.inc('openai_tokens_total', tokens, caller=caller, kind=kind)
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self.lock:
+            for name, (kind, help_text, _) in METRICS.items():
+                series = self.values[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(series.items()):
+                    if kind != 'histogram':
+                        lines.append(f"{name}{format_labels(labels)} {value:g}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{format_labels(labels, (('le', f'{bound:g}'),))} {cumulative}")
+                    lines.append(f"{name}_bucket{format_labels(labels, (('le', '+Inf'),))} {value.count}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {value.sum:g}")
+                    lines.append(f"{name}_count{format_labels(labels)} {value.count}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """Current series per metric as plain rows (histograms summarized), for display"""
+        rows: Dict[str, List[Dict]] = {}
+        with self.lock:
+            for name, (kind, _, _) in METRICS.items():
+                for labels, value in sorted(self.values[name].items()):
+                    row = dict(labels)
+                    if kind == 'histogram':
+                        row.update({
+                            'count': value.count,
+                            'mean': value.sum / value.count if value.count else None,
+                            'p50': value.quantile(0.5),
+                            'p95': value.quantile(0.95),
+                            'p99': value.quantile(0.99)
+                        })
+                    else:
+                        row['value'] = value
+                    rows.setdefault(name, []).append(row)
+        return rows
+
+    def reset(self):
+        with self.lock:
+            self.values = {name: {} for name in METRICS}
+
+    def dump(self, path: str):
+        """Write the Prometheus text to a file, e.g. at the end of a batch job"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+
+
+# The process-wide registry every module records into
+REGISTRY = Metrics()
+
+
+def serve(port: int, host: str = '127.0.0.1', registry: Metrics = REGISTRY) -> ThreadingHTTPServer:
+    """Serve GET /metrics from a daemon thread; returns the server (call shutdown() to stop it)"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,275 @@
+"""
+Outfit engine - scores item combinations for coherence, color harmony and budget, and beam-searches the best outfits
+"""
+import heapq
+import random
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
+from catalog_diff import added_ids, survivor_map
+from catalog_index import normalize
+from catalog_store import parse_price_cents
+
+# Outfit slots and the category words that place a product in each; a category goes to the first slot it matches
+OUTFIT_SLOTS = (
+    ('dresses', ('dress', 'jumpsuit', 'romper')),
+    ('tops', ('top', 'tee', 'tank', 'shirt', 'bra', 'hoodie', 'sweater', 'sleeve', 'blouse', 'pullover')),
+    ('bottoms', ('bottom', 'legging', 'short', 'pant', 'jogger', 'skirt', 'tight')),
+    ('shoes', ('shoe', 'sneaker', 'boot', 'sandal', 'trainer')),
+    ('outerwear', ('outerwear', 'jacket', 'coat', 'vest', 'parka')),
+    ('accessories', ('accessor', 'bag', 'hat', 'cap', 'belt', 'sock', 'bottle', 'mat', 'scarf', 'jewel')),
+)
+
+# Products whose category matches no slot; they only fill outfits the slotted products cannot complete
+UNSLOTTED = 'other'
+
+# Display order of an outfit's items
+SLOT_ORDER = {slot: position for position, (slot, _) in enumerate(OUTFIT_SLOTS + ((UNSLOTTED, ()),))}
+
+# Body areas each slot dresses; an outfit never holds two items covering the same area
+SLOT_COVERS = {
+    'dresses': frozenset({'torso', 'legs'}),
+    'tops': frozenset({'torso'}),
+    'bottoms': frozenset({'legs'}),
+    'shoes': frozenset({'feet'}),
+    'outerwear': frozenset({'layer'}),
+    'accessories': frozenset({'accessory'}),
+    UNSLOTTED: frozenset(),
+}
+
+# Areas a complete outfit dresses (a top and bottom, or a dress)
+CORE_AREAS = frozenset({'torso', 'legs'})
+
+# Color words that go with anything
+NEUTRAL_COLORS = ('black', 'white', 'grey', 'gray', 'navy', 'beige', 'cream', 'tan', 'khaki', 'ivory', 'denim', 'charcoal')
+
+# Score weights
+STYLE_MATCH = 1.0
+OCCASION_MATCH = 1.0
+TAG_COHERENCE = 0.5
+COLOR_HARMONY = 0.3
+CORE_BONUS = 1.0
+
+
+def tag_set(product, field: str) -> FrozenSet[str]:
+    tags = product.get(field) or []
+    if isinstance(tags, str):
+        tags = [tags]
+    return frozenset(str(t).lower() for t in tags)
+
+
+def is_neutral(color: str) -> bool:
+    return not color or any(word in color for word in NEUTRAL_COLORS)
+
+
+class OutfitEngine:
+    """Builds whole outfits for an AIStyler catalog
+
+    Products are partitioned into outfit slots once, by category. A request keeps each
+    slot's products matching both the wanted style and occasion, the best few per slot,
+    and beam-searches combinations that dress distinct body areas, scoring every pair of
+    items for shared style/occasion tags and color harmony within an optional budget.
+    Products in no slot only fill outfits the slotted ones cannot extend.
+    """
+
+    def __init__(self, stylist, candidates_per_slot: int = 12, beam_width: int = 24):
+        self.stylist = stylist
+        self.candidates_per_slot = candidates_per_slot
+        self.beam_width = beam_width
+        self.lock = threading.Lock()
+        self._slot_ids: Optional[Dict[str, np.ndarray]] = None
+
+    @property
+    def slot_ids(self) -> Dict[str, np.ndarray]:
+        """Sorted product IDs per outfit slot (UNSLOTTED holds the rest), computed on first use"""
+        if self._slot_ids is None:
+            with self.lock:
+                if self._slot_ids is None:
+                    claimed = np.zeros(0, dtype=np.int64)
+                    slot_ids = {}
+                    for slot, words in OUTFIT_SLOTS:
+                        ids = np.asarray(self.stylist.filter_ids(categories=list(words)), dtype=np.int64)
+                        slot_ids[slot] = np.setdiff1d(ids, claimed, assume_unique=True)
+                        claimed = np.union1d(claimed, ids)
+                    slot_ids[UNSLOTTED] = np.setdiff1d(np.arange(len(self.stylist.products)), claimed, assume_unique=True)
+                    self._slot_ids = slot_ids
+        return self._slot_ids
+
+    def with_changes(self, stylist, source: np.ndarray) -> 'OutfitEngine':
+        """An engine for a changed catalog (see catalog_diff.diff_catalog), leaving this one untouched
+
+        Slot partitions already computed are renumbered; only the added products are placed in slots.
+        """
+        engine = OutfitEngine(stylist, self.candidates_per_slot, self.beam_width)
+        if self._slot_ids is None:
+            return engine
+        remap = survivor_map(source, len(self.stylist.products))
+        added: Dict[str, List[int]] = {slot: [] for slot in SLOT_COVERS}
+        for product_id in added_ids(source).tolist():
+            category = normalize(stylist.products[product_id].get('category', ''))
+            # Same substring match as filter_ids(categories=...), first matching slot wins
+            slot = next((slot for slot, words in OUTFIT_SLOTS if any(word in category for word in words)), UNSLOTTED)
+            added[slot].append(product_id)
+        slot_ids = {}
+        for slot, ids in self._slot_ids.items():
+            ids = remap[ids]
+            slot_ids[slot] = np.sort(np.concatenate([ids[ids >= 0], np.array(added[slot], dtype=np.int64)]))
+        engine._slot_ids = slot_ids
+        return engine
+
+    def slot_scores(self, style: str, occasion: str) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """(product IDs, match scores) per slot for a style and occasion, before any randomness
+
+        Depends only on the style and occasion, so batch callers compute it once per pair.
+        """
+        style_ids = np.asarray(self.stylist.filter_ids(style_preferences=[style]), dtype=np.int64) if style else None
+        occasion_ids = np.asarray(self.stylist.filter_ids(occasions=[occasion]), dtype=np.int64) if occasion else None
+
+        slot_scores = {}
+        for slot, ids in self.slot_ids.items():
+            scores = np.zeros(len(ids))
+            if style_ids is not None:
+                scores += STYLE_MATCH * np.isin(ids, style_ids, assume_unique=True)
+            if occasion_ids is not None:
+                scores += OCCASION_MATCH * np.isin(ids, occasion_ids, assume_unique=True)
+            # Only items matching the style and the occasion (whichever are given) are considered
+            keep = scores == STYLE_MATCH * (style_ids is not None) + OCCASION_MATCH * (occasion_ids is not None)
+            if keep.any():
+                slot_scores[slot] = (ids[keep], scores[keep])
+        return slot_scores
+
+    def candidates(self, slot_scores: Dict[str, Tuple[np.ndarray, np.ndarray]], rng: random.Random) -> Dict[str, List[Dict]]:
+        """The best-matching products of each slot, with what scoring needs already extracted"""
+        candidates = {}
+        for slot, (ids, scores) in slot_scores.items():
+            # Random tie-breaking keeps repeated requests from always returning the same outfit
+            jittered = scores + 0.01 * np.random.default_rng(rng.getrandbits(32)).random(len(ids))
+            top = np.arange(len(ids))
+            if len(ids) > self.candidates_per_slot:
+                top = np.argpartition(-jittered, self.candidates_per_slot - 1)[:self.candidates_per_slot]
+            top = top[np.argsort(-jittered[top], kind='stable')]
+
+            candidates[slot] = []
+            for i in top:
+                product = self.stylist.products[int(ids[i])]
+                cents = parse_price_cents(product.get('price'))
+                candidates[slot].append({
+                    'id': int(ids[i]),
+                    'slot': slot,
+                    'product': product,
+                    'score': float(jittered[i]),
+                    'style_tags': tag_set(product, 'style_tags'),
+                    'occasion_tags': tag_set(product, 'occasion_tags'),
+                    'color': str(product.get('color', '') or '').lower(),
+                    'cents': max(cents, 0)
+                })
+        return candidates
+
+    @staticmethod
+    def pair_scores(items: List[Dict]) -> List[List[float]]:
+        """How well each pair of items goes together, as a matrix over the items
+
+        Tag coherence is the Jaccard overlap of style tags plus that of occasion tags; colors
+        harmonize when either is neutral or both are the same.
+        """
+        if not items:
+            return []
+        score = np.zeros((len(items), len(items)))
+        for field in ('style_tags', 'occasion_tags'):
+            vocabulary = {tag: i for i, tag in enumerate(sorted(set().union(*(item[field] for item in items))))}
+            tags = np.zeros((len(items), max(1, len(vocabulary))))
+            for row, item in enumerate(items):
+                tags[row, [vocabulary[tag] for tag in item[field]]] = 1.0
+            shared = tags @ tags.T
+            counts = tags.sum(axis=1)
+            union = counts[:, None] + counts[None, :] - shared
+            score += TAG_COHERENCE * np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+
+        colors = [item['color'] for item in items]
+        neutral = np.array([is_neutral(color) for color in colors])
+        same = np.array([[a == b for b in colors] for a in colors])
+        score += np.where(neutral[:, None] | neutral[None, :] | same, COLOR_HARMONY, -COLOR_HARMONY)
+        return score.tolist()
+
+    @staticmethod
+    def expansion_order(candidates: Dict[str, List[Dict]]) -> List[Tuple[str, List[Dict]]]:
+        """Slots in the order the beam tries them; UNSLOTTED last, so it is only used when nothing else fits"""
+        return sorted(candidates.items(), key=lambda item: item[0] == UNSLOTTED)
+
+    def outfits(self,
+                style_preference: str = "casual",
+                occasion: str = "everyday",
+                max_items: int = 3,
+                top_k: int = 3,
+                budget: Optional[float] = None,
+                rng: Optional[random.Random] = None,
+                slot_scores: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None,
+                seed: int = 0) -> List[Dict]:
+        """The top_k outfits of up to max_items items, best first
+
+        Each outfit is {"items": [...], "score": float, "total_price": float}. budget caps
+        the total price in dollars. Outfits are as large as the catalog allows, up to max_items.
+        rng drives tie-breaking (a Random seeded with seed by default, so the same request
+        and seed give the same outfits and the global random state is never touched);
+        slot_scores may be passed in when already computed for this style and occasion.
+        """
+        if slot_scores is None:
+            slot_scores = self.slot_scores(style_preference, occasion)
+        candidates = self.candidates(slot_scores, rng or random.Random(seed))
+        budget_cents = None if budget is None else int(round(budget * 100))
+
+        # Every pair score is computed once up front; the search only looks them up
+        flat = [candidate for slot_candidates in candidates.values() for candidate in slot_candidates]
+        for position, candidate in enumerate(flat):
+            candidate['position'] = position
+        pairs = self.pair_scores(flat)
+
+        # A beam state is (score, items, covered areas, total cents)
+        beam = [(0.0, (), frozenset(), 0)]
+        for _ in range(max_items):
+            expanded = {}
+            for score, items, covered, cents in beam:
+                extended = False
+                for slot, slot_candidates in self.expansion_order(candidates):
+                    if SLOT_COVERS[slot] & covered or (slot == UNSLOTTED and extended):
+                        continue
+                    for candidate in slot_candidates:
+                        total = cents + candidate['cents']
+                        # Bound: prices only add up, so an over-budget partial outfit never recovers
+                        if budget_cents is not None and total > budget_cents:
+                            continue
+                        extended = True
+                        key = frozenset(item['id'] for item in items) | {candidate['id']}
+                        if key in expanded:
+                            continue
+                        new_covered = covered | SLOT_COVERS[slot]
+                        row = pairs[candidate['position']]
+                        new_score = score + candidate['score'] + sum(row[item['position']] for item in items)
+                        if CORE_AREAS <= new_covered and not CORE_AREAS <= covered:
+                            new_score += CORE_BONUS
+                        expanded[key] = (new_score, items + (candidate,), new_covered, total)
+            if not expanded:
+                break
+            beam = heapq.nlargest(self.beam_width, expanded.values(), key=lambda state: state[0])
+
+        # Prefer alternatives that differ in at least half their items; near-copies only fill leftover places
+        chosen, near_copies = [], []
+        for state in beam:
+            ids = {item['id'] for item in state[1]}
+            if not ids:
+                continue
+            if all(len(ids & seen) <= len(ids) - max(1, len(ids) // 2) for seen in (
+                    {item['id'] for item in other[1]} for other in chosen)):
+                chosen.append(state)
+            else:
+                near_copies.append(state)
+        chosen = sorted(chosen + near_copies[:max(0, top_k - len(chosen))], key=lambda state: -state[0])[:top_k]
+
+        return [
+            {
+                'items': [item['product'] for item in sorted(items, key=lambda item: SLOT_ORDER[item['slot']])],
+                'score': round(score, 3),
+                'total_price': cents / 100
+            }
+            for score, items, _, cents in chosen
+        ]
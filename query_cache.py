@@ -0,0 +1,90 @@
+"""
+Memoized recommendation queries - LRU/TTL cache of filtered candidate sets keyed by normalized filter signature
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set
+from metrics import REGISTRY
+
+
+class QueryCache:
+    """LRU of query results keyed by (filter signature, catalog version)
+
+    Results are only ever served for the catalog version they were computed on. The
+    first lookup or store for a newer catalog version drops every older entry, and
+    stores for a version that has already been superseded are ignored, so a reload
+    invalidates the cache without anyone having to clear it. Entries also expire after
+    ttl_seconds; the least recently used are evicted past max_entries.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[tuple[Hashable, object], tuple[float, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.catalog_version: object = None
+        self.retired: Set[object] = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, signature: Hashable, catalog_version: object = None) -> Optional[Any]:
+        """Return the cached result for a filter signature on this catalog version, else None"""
+        key = (signature, catalog_version)
+        with self.lock:
+            self.advance(catalog_version)
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                REGISTRY.inc('ai_stylist_cache_requests_total', cache='query', result='miss')
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            REGISTRY.inc('ai_stylist_cache_requests_total', cache='query', result='hit')
+            return entry[1]
+
+    def put(self, signature: Hashable, result: Any, catalog_version: object = None):
+        """Remember the result of a query for this catalog version"""
+        key = (signature, catalog_version)
+        with self.lock:
+            self.advance(catalog_version)
+            if catalog_version in self.retired:
+                return
+            self.entries[key] = (time.time(), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def advance(self, catalog_version: object):
+        """Switch to a catalog version not seen before, dropping the entries of older ones"""
+        if catalog_version == self.catalog_version or catalog_version in self.retired:
+            return
+        if self.catalog_version is not None:
+            self.retired.add(self.catalog_version)
+            self.invalidations += 1
+        self.catalog_version = catalog_version
+        for key in [k for k in self.entries if k[1] != catalog_version]:
+            del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit, miss, eviction and invalidation counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,48 @@
+"""
+Deterministic ranking - relevance scores plus a seeded tie-break, with partial top-k selection
+"""
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+# How far the seeded tie-break can move a product: products whose relevance differs by
+# less than this trade places between seeds, clearly more relevant ones stay ahead
+EXPLORATION = 0.25
+
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+
+
+def tie_break(product_ids: np.ndarray, seed: int) -> np.ndarray:
+    """A value in [0, 1) per product ID that is fixed for a given seed (splitmix64 of ID and seed)
+
+    Needs no random generator state, so the same query and seed rank identically in any process.
+    """
+    with np.errstate(over='ignore'):
+        z = np.asarray(product_ids, dtype=np.uint64) + np.uint64(seed % 2**64) * _GOLDEN_GAMMA + _GOLDEN_GAMMA
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)).astype(np.float64) / 2.0 ** 53
+
+
+def price_fit(cents: np.ndarray, price_range: Optional[Tuple[Optional[float], Optional[float]]]) -> np.ndarray:
+    """1.0 at the middle of a closed price range, falling to 0.0 at its edges; 0.0 for open or no ranges"""
+    if not price_range or price_range[0] is None or price_range[1] is None:
+        return np.zeros(len(cents))
+    low, high = price_range[0] * 100, price_range[1] * 100
+    half = (high - low) / 2
+    if half <= 0:
+        return np.ones(len(cents))
+    return np.clip(1.0 - np.abs(cents - (low + half)) / half, 0.0, 1.0)
+
+
+def top_ranked(product_ids: Sequence[int], relevance: np.ndarray, k: int, seed: int = 0) -> List[int]:
+    """The k product IDs with the highest relevance, best first, ties broken by the seed
+
+    Uses partial selection, so only the k winners are ever sorted.
+    """
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    if k <= 0 or not len(product_ids):
+        return []
+    keys = relevance + EXPLORATION * tie_break(product_ids, seed)
+    top = np.argpartition(-keys, k - 1)[:k] if len(keys) > k else np.arange(len(keys))
+    return product_ids[top[np.argsort(-keys[top], kind='stable')]].tolist()
@@ -0,0 +1,145 @@
+"""
+Lexical retrieval over the catalog - a BM25 index on product name, description and tags for grounding advice prompts
+"""
+import heapq
+import math
+from array import array
+from collections import Counter
+from typing import Dict, List, Sequence
+import numpy as np
+from catalog_diff import added_ids, survivor_map
+from catalog_index import as_ids, merge_postings, to_postings
+from text_vectors import STOPWORDS, tokenize
+
+# Product fields whose text is indexed, with how many times each counts toward term frequency
+INDEXED_FIELDS = (
+    ('name', 2),
+    ('category', 1),
+    ('brand', 1),
+    ('color', 1),
+    ('material', 1),
+    ('style_tags', 2),
+    ('occasion_tags', 2),
+    ('description', 1)
+)
+
+# Rough characters per token for budgeting prompt context without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def terms(text: str) -> List[str]:
+    """Index terms of a text - lowercased word tokens without stopwords"""
+    return [t for t in tokenize(text) if t not in STOPWORDS]
+
+
+def product_terms(product) -> List[str]:
+    """All weighted index terms of one product"""
+    found = []
+    for field, weight in INDEXED_FIELDS:
+        value = product.get(field)
+        if not value:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(v) for v in value)
+        found += terms(value) * weight
+    return found
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class BM25Index:
+    """Okapi BM25 over the products of a catalog (IDs are positions in the product list)
+
+    Postings hold (product ID, term frequency) pairs per term; a query only touches the
+    postings of its own terms, accumulating scores into one dense array.
+    """
+
+    def __init__(self, products: Sequence[Dict], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(products)
+        self.doc_ids: Dict[str, array] = {}
+        self.freqs: Dict[str, array] = {}
+        self.lengths = np.zeros(self.size, dtype=np.float32)
+        self.build(products)
+
+    def build(self, products: Sequence[Dict]):
+        """Tokenize every product once and build the postings"""
+        doc_ids: Dict[str, List[int]] = {}
+        freqs: Dict[str, List[int]] = {}
+        for product_id, product in enumerate(products):
+            counts = Counter(product_terms(product))
+            self.lengths[product_id] = sum(counts.values())
+            for term, count in counts.items():
+                doc_ids.setdefault(term, []).append(product_id)
+                freqs.setdefault(term, []).append(count)
+
+        self.doc_ids = {term: array('l', ids) for term, ids in doc_ids.items()}
+        self.freqs = {term: array('l', counts) for term, counts in freqs.items()}
+        self.average_length = float(self.lengths.mean()) if self.size else 0.0
+
+    def with_changes(self, source: np.ndarray, products: Sequence[Dict]) -> 'BM25Index':
+        """The index of a changed catalog (see catalog_diff.diff_catalog), leaving this one untouched
+
+        Only the added products are tokenized; existing postings are renumbered.
+        """
+        added = added_ids(source)
+        new = BM25Index([products[i] for i in added.tolist()], self.k1, self.b)
+        remap = survivor_map(source, self.size)
+        index = BM25Index.__new__(BM25Index)
+        index.k1, index.b = self.k1, self.b
+        index.size = len(products)
+        index.lengths = np.zeros(index.size, dtype=np.float32)
+        kept = np.flatnonzero(source >= 0)
+        index.lengths[kept] = self.lengths[source[kept]]
+        index.lengths[added] = new.lengths
+        index.doc_ids, index.freqs = {}, {}
+        for term in list(self.doc_ids) + [term for term in new.doc_ids if term not in self.doc_ids]:
+            ids, positions = merge_postings(self.doc_ids.get(term), remap, new.doc_ids.get(term), added)
+            if len(ids):
+                freqs = np.concatenate([as_ids(self.freqs.get(term)), as_ids(new.freqs.get(term))])
+                index.doc_ids[term], index.freqs[term] = to_postings(ids), to_postings(freqs[positions])
+        index.average_length = float(index.lengths.mean()) if index.size else 0.0
+        return index
+
+    def idf(self, term: str) -> float:
+        matches = len(self.doc_ids.get(term, ()))
+        return math.log(1 + (self.size - matches + 0.5) / (matches + 0.5))
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every product for the query (zero where no query term occurs)"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        if not self.size:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / (self.average_length or 1.0))
+        for term, query_count in Counter(terms(query)).items():
+            if term not in self.doc_ids:
+                continue
+            ids = np.asarray(self.doc_ids[term])
+            tf = np.asarray(self.freqs[term], dtype=np.float32)
+            scores[ids] += query_count * self.idf(term) * tf * (self.k1 + 1) / (tf + norm[ids])
+        return scores
+
+    def search(self, query: str, k: int = 5) -> List[int]:
+        """IDs of the k highest-scoring products, best first; products with no matching term are skipped"""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            # Partial selection: only the top k are ever sorted
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        return heapq.nlargest(k, matched.tolist(), key=lambda i: (scores[i], -i))
+
+
+def select_within_budget(lines: List[str], token_budget: int) -> List[str]:
+    """Keep lines in order until the next one would exceed the token budget"""
+    selected = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line)
+        if used + cost > token_budget:
+            break
+        selected.append(line)
+        used += cost
+    return selected
@@ -0,0 +1,112 @@
+"""
+Local stub of the OpenAI chat completions endpoint for exercising the enrichment pipeline offline
+
+Usage: python stub_openai_server.py [--port 8011] [--latency 0.2] [--rate-limit-every 10]
+Then:  python enrich_with_gpt.py --async --base-url http://127.0.0.1:8011/v1
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STYLES = ["minimal", "athleisure", "sporty", "casual", "elegant", "classic", "trendy"]
+OCCASIONS = ["gym", "yoga", "running", "work", "date night", "travel", "lounging", "everyday"]
+
+
+def random_tags():
+    """Random style and occasion tags in the shape the enricher expects"""
+    return {
+        "style_tags": random.sample(STYLES, 2),
+        "occasion_tags": random.sample(OCCASIONS, 2)
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/chat/completions with random style and occasion tags
+
+    Batch prompts (products introduced by "ID: <id>" lines) get a JSON array keyed by ID.
+    """
+
+    latency = 0.0
+    rate_limit_every = 0
+    counter = itertools.count(1)
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        with self.lock:
+            request_number = next(self.counter)
+
+        if self.rate_limit_every and request_number % self.rate_limit_every == 0:
+            self.send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}})
+            return
+
+        time.sleep(self.latency)
+
+        prompt = "\n".join(m.get('content', '') for m in request.get('messages', []))
+        product_ids = re.findall(r'^\s*ID: (\S+)', prompt, flags=re.MULTILINE)
+        if product_ids:
+            content = json.dumps([{"id": product_id, **random_tags()} for product_id in product_ids])
+        else:
+            content = json.dumps(random_tags())
+        prompt_tokens = sum(len(m.get('content', '')) for m in request.get('messages', [])) // 4
+        self.send_json(200, {
+            "id": f"chatcmpl-stub-{request_number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get('model', 'gpt-4'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_tokens + len(content) // 4
+            }
+        })
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8011, latency=0.0, rate_limit_every=0):
+    """Run the stub server until interrupted"""
+    StubHandler.latency = latency
+    StubHandler.rate_limit_every = rate_limit_every
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    print(f"Stub chat completions endpoint at http://127.0.0.1:{port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the OpenAI chat completions endpoint")
+    parser.add_argument('--port', type=int, default=8011)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to wait before each response")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="answer every Nth request with HTTP 429")
+    args = parser.parse_args()
+    serve(args.port, args.latency, args.rate_limit_every)
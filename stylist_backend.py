@@ -1,164 +1,570 @@
 """
 Backend logic for the AI stylist - filtering and recommendation engine
 """
+import copy
+import hashlib
 import json
 import random
-from typing import List, Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 from openai import OpenAI
 import os
 from dotenv import load_dotenv
+import numpy as np
+from catalog_diff import diff_catalog, product_hash
+from catalog_index import CatalogIndex
+from facet_index import FacetIndex, FACET_FIELDS
+from catalog_store import CatalogStore, PriceColumn, parse_price_cents, open_compiled
+from enrichment_stream import iter_products, resolve_catalog
+from advice_cache import AdviceCache
+from query_cache import QueryCache
+from metrics import REGISTRY
+from retrieval import BM25Index, select_within_budget
+from text_index import TrigramIndex
+from outfit_engine import OutfitEngine
+from ranking import price_fit, top_ranked
+from vector_index import VectorIndex, product_key, product_text, vector_index_path
 
 load_dotenv()
 
+def advice_error_message(error: Exception) -> str:
+    """Shown in place of advice when the OpenAI request fails"""
+    return f"I'd love to help with styling advice! However, I'm having trouble accessing my AI assistant right now. Please make sure your OpenAI API key is configured correctly. Error: {error}"
+
+# Profile keys that select products in a recommendation request
+PROFILE_FILTERS = ('style_preferences', 'occasions', 'categories', 'brands', 'colors', 'materials')
+
+# Distinct (style, occasion) pairs whose slot scores an outfit batch keeps around
+BATCH_SIGNATURE_CACHE = 256
+
+def filter_signature(profile: Dict) -> Tuple:
+    """Hashable, normalized form of a profile's filters; profiles with equal signatures match the same products"""
+    signature = []
+    for key in PROFILE_FILTERS:
+        values = profile.get(key) or []
+        if isinstance(values, str):
+            values = [values]
+        if values:
+            signature.append((key, tuple(sorted({str(v).lower() for v in values}))))
+    price_range = profile.get('price_range')
+    if price_range and any(bound is not None for bound in price_range):
+        signature.append(('price_range', tuple(price_range)))
+    return tuple(signature)
+
+def catalog_version(catalog_file: str) -> str:
+    """Version of a catalog file's contents as of now; any rewrite of the file changes it"""
+    try:
+        stat = os.stat(catalog_file)
+    except OSError:
+        return f"{catalog_file}:missing"
+    return f"{os.path.abspath(catalog_file)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def customer_seed(profile: Dict, position: int, seed: int) -> int:
+    """Per-customer seed derived from the batch seed, so re-runs repeat every customer's picks"""
+    key = f"{seed}:{profile.get('customer_id', position)}".encode('utf-8')
+    return int.from_bytes(hashlib.sha1(key).digest()[:8], 'big')
+
+def customer_rng(profile: Dict, position: int, seed: int) -> random.Random:
+    """Per-customer Random, so batch picks never touch the global random state"""
+    return random.Random(customer_seed(profile, position, seed))
+
 class AIStyler:
-    def __init__(self, catalog_file='catalog_enriched.json'):
+    def __init__(self, catalog_file='catalog_enriched.json', columnar=False, advice_cache=None, query_cache=None):
         self.catalog_file = catalog_file
-        self.products = self.load_catalog()
+        self.columnar = columnar
+        # Identifies the catalog file contents that were loaded (set by load_catalog); part of
+        # every cache key derived from them, so caches shared across reloads never serve stale results
+        self.catalog_version = None
+        self.source_file = catalog_file
+        self.advice_cache = advice_cache or AdviceCache()
+        self.query_cache = query_cache or QueryCache()
+        with REGISTRY.time('ai_stylist_catalog_load_seconds'):
+            self.products = self.load_catalog()
+            if columnar and not isinstance(self.products, CatalogStore):
+                # Keep the catalog in typed columns; rows are exposed as read-only dict-like views
+                self.products = CatalogStore.from_records(self.products)
+        REGISTRY.set('ai_stylist_catalog_products', len(self.products))
+        # The columnar store filters with vectorized masks; the inverted index serves the list-backed catalog
+        self.index = None if columnar else CatalogIndex(self.products)
+        # Value counts behind the get_available_* lists and the counts shown next to filter options
+        self.facets_lock = threading.Lock()
+        self._facets = None
         self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.retriever_lock = threading.Lock()
+        self._retriever = None
+        self.vector_lock = threading.Lock()
+        self._vector_index = None
+        self.product_keys: Optional[List[str]] = None
+        self.rows_by_key: Dict[str, List[int]] = {}
+        # product_hash of every product, computed on the first refresh
+        self.product_hashes: Optional[List[bytes]] = None
+        self.last_change: Optional[Dict] = None
+        self.text_index_lock = threading.Lock()
+        self._text_index = None
+        # (lowest, highest) price in dollars, set by the first get_price_bounds
+        self.price_bounds: Optional[Tuple[float, float]] = None
+        self.outfit_engine = OutfitEngine(self)
+    
+    @property
+    def retriever(self) -> BM25Index:
+        """BM25 index over the catalog, built on first use so catalog load stays fast"""
+        if self._retriever is None:
+            with self.retriever_lock:
+                if self._retriever is None:
+                    self._retriever = BM25Index(self.products)
+        return self._retriever
+    
+    @property
+    def facets(self) -> FacetIndex:
+        """Facet value counts, built on first use so catalog load stays fast"""
+        if self._facets is None:
+            with self.facets_lock:
+                if self._facets is None:
+                    self._facets = FacetIndex(self.products)
+        return self._facets
+    
+    @property
+    def vector_index(self) -> VectorIndex:
+        """Semantic search index, loaded from beside the loaded catalog file (source_file) and synced with it on first use
+        
+        Only products added, edited or removed since the index was saved are re-embedded.
+        """
+        if self._vector_index is None:
+            with self.vector_lock:
+                if self._vector_index is None:
+                    self._vector_index = self.load_vector_index()
+        return self._vector_index
+    
+    def load_vector_index(self) -> VectorIndex:
+        keys = [product_key(p) for p in self.products]
+        path = vector_index_path(self.source_file)
+        try:
+            index = VectorIndex.load(path)
+            changed = any(index.sync(self.products, keys))
+        except (FileNotFoundError, ValueError, KeyError, json.JSONDecodeError):
+            index = VectorIndex()
+            index.add(keys, [product_text(p) for p in self.products])
+            index.train()
+            changed = True
+        if changed:
+            self.save_vector_index(index)
+        self.set_product_keys(keys)
+        return index
+    
+    def save_vector_index(self, index: VectorIndex):
+        path = vector_index_path(self.source_file)
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"Warning: could not save vector index to {path}: {e}")
+    
+    def set_product_keys(self, keys: List[str]):
+        """Remember each product's product_key and the products sharing each key, for resolving vector search hits"""
+        rows_by_key: Dict[str, List[int]] = {}
+        for product_id, key in enumerate(keys):
+            rows_by_key.setdefault(key, []).append(product_id)
+        self.product_keys = keys
+        self.rows_by_key = rows_by_key
+    
+    @REGISTRY.timed('stylist')
+    def search_ids(self, query: str, k: int = 10) -> List[int]:
+        """IDs of the k products closest in meaning to a free-text query, best first"""
+        index = self.vector_index
+        product_ids = []
+        for key, _ in index.search(query, k):
+            product_ids.extend(self.rows_by_key.get(key, ()))
+        return product_ids[:k]
+    
+    @REGISTRY.timed('stylist')
+    def search(self, query: str, k: int = 10) -> List[Dict]:
+        """The k products closest in meaning to a free-text query, best first"""
+        return self.products_for_ids(self.search_ids(query, k))
+    
+    @property
+    def text_index(self) -> TrigramIndex:
+        """Trigram index over name, brand and description, built on first use"""
+        if self._text_index is None:
+            with self.text_index_lock:
+                if self._text_index is None:
+                    self._text_index = TrigramIndex(self.products)
+        return self._text_index
+    
+    @REGISTRY.timed('stylist')
+    def search_catalog(self, search_term: str, typo_tolerant: bool = False):
+        """IDs (a sorted NumPy array) of products whose name, brand or description contains the term
+        
+        With typo_tolerant, a term with no exact match returns near spellings instead.
+        """
+        return self.text_index.search(search_term, typo_tolerant=typo_tolerant)
     
     def load_catalog(self):
-        """Load the enriched product catalog"""
+        """Load the enriched product catalog (a JSON array, or JSONL from a chunked import)
+        
+        In columnar mode an up-to-date compiled store (see catalog_store.compile_catalog)
+        is memory-mapped instead of parsing the JSON.
+        """
+        self.catalog_version = catalog_version(self.catalog_file)
+        self.source_file = self.catalog_file
+        if self.columnar:
+            compiled = open_compiled(self.catalog_file)
+            if compiled is not None:
+                return compiled
+        
         try:
-            with open(self.catalog_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return list(iter_products(self.catalog_file))
         except FileNotFoundError:
             print(f"Warning: {self.catalog_file} not found. Using basic catalog.")
+            basic = resolve_catalog('catalog.json')
+            self.catalog_version = catalog_version(basic)
+            self.source_file = basic
+            if self.columnar:
+                compiled = open_compiled(basic)
+                if compiled is not None:
+                    return compiled
             try:
-                with open('catalog.json', 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                return list(iter_products(basic))
             except FileNotFoundError:
                 return []
     
+    def catalog_source(self) -> str:
+        """The file load_catalog would read now: the catalog file, or the basic catalog until it exists"""
+        return self.catalog_file if os.path.exists(self.catalog_file) else resolve_catalog('catalog.json')
+    
+    def catalog_changed(self) -> bool:
+        """Whether the catalog on disk differs from this snapshot's; one stat call, cheap enough to poll"""
+        return catalog_version(self.catalog_source()) != self.catalog_version
+    
+    def hashes(self) -> List[bytes]:
+        if self.product_hashes is None:
+            self.product_hashes = [product_hash(p) for p in self.products]
+        return self.product_hashes
+    
+    @REGISTRY.timed('stylist')
+    def refresh(self) -> 'AIStyler':
+        """This snapshot if the catalog on disk is unchanged, else a new snapshot with only the changes applied
+        
+        The file is re-read and diffed against the loaded products by content hash (see
+        catalog_diff.diff_catalog). Products take their position in the file, exactly as a
+        fresh load numbers them, so IDs cached under the file's catalog_version stay valid
+        whichever way a snapshot of it was built. Indexes this snapshot has built are
+        carried over with only the changed products removed or indexed, and the others
+        stay lazy. This snapshot is never modified, so queries running on it finish on the
+        catalog they started with; CatalogService.refresh swaps the new one in for later queries.
+        """
+        source = self.catalog_source()
+        version = catalog_version(source)
+        if version == self.catalog_version:
+            return self
+        products = list(iter_products(source))
+        origin, hashes = diff_catalog(self.hashes(), products)
+        kept = int((origin >= 0).sum())
+        
+        stylist = copy.copy(self)
+        stylist.catalog_version = version
+        stylist.source_file = source
+        if isinstance(self.products, CatalogStore):
+            stylist.products = self.products.with_changes(origin, products)
+        else:
+            stylist.products = products
+        stylist.product_hashes = hashes
+        stylist.price_bounds = None
+        stylist.last_change = {"added": len(products) - kept, "removed": len(self.products) - kept, "source": source}
+        
+        stylist.index = self.index.with_changes(origin, stylist.products) if self.index is not None else None
+        stylist.facets_lock = threading.Lock()
+        stylist._facets = self._facets.with_changes(origin, stylist.products) if self._facets is not None else None
+        stylist.retriever_lock = threading.Lock()
+        stylist._retriever = self._retriever.with_changes(origin, stylist.products) if self._retriever is not None else None
+        stylist.text_index_lock = threading.Lock()
+        stylist._text_index = self._text_index.with_changes(origin, stylist.products) if self._text_index is not None else None
+        stylist.vector_lock = threading.Lock()
+        if self._vector_index is not None:
+            keys = [self.product_keys[i] if i >= 0 else product_key(p) for i, p in zip(origin.tolist(), products)]
+            index = self._vector_index.copy()
+            if any(index.sync(stylist.products, keys)):
+                stylist.save_vector_index(index)
+            stylist.set_product_keys(keys)
+            stylist._vector_index = index
+        else:
+            stylist.product_keys, stylist.rows_by_key = None, {}
+        stylist.outfit_engine = self.outfit_engine.with_changes(stylist, origin)
+        
+        REGISTRY.set('ai_stylist_catalog_products', len(stylist.products))
+        REGISTRY.inc('ai_stylist_catalog_changes_total', stylist.last_change['added'], change='added')
+        REGISTRY.inc('ai_stylist_catalog_changes_total', stylist.last_change['removed'], change='removed')
+        return stylist
+    
+    def products_for_ids(self, product_ids: List[int]) -> List[Dict]:
+        """Resolve product IDs from the index into product dicts"""
+        return [self.products[int(i)] for i in product_ids]
+    
+    @REGISTRY.timed('stylist')
     def filter_by_style(self, style_preferences: List[str]) -> List[Dict]:
         """Filter products by style tags"""
         if not style_preferences:
             return self.products
         
-        filtered = []
-        for product in self.products:
-            product_styles = product.get('style_tags', [])
-            if any(style.lower() in [s.lower() for s in product_styles] for style in style_preferences):
-                filtered.append(product)
-        
-        return filtered
+        return self.products_for_ids(self.filter_ids(style_preferences=style_preferences))
     
+    @REGISTRY.timed('stylist')
     def filter_by_occasion(self, occasions: List[str]) -> List[Dict]:
         """Filter products by occasion tags"""
         if not occasions:
             return self.products
         
-        filtered = []
-        for product in self.products:
-            product_occasions = product.get('occasion_tags', [])
-            if any(occasion.lower() in [o.lower() for o in product_occasions] for occasion in occasions):
-                filtered.append(product)
-        
-        return filtered
+        return self.products_for_ids(self.filter_ids(occasions=occasions))
     
+    @REGISTRY.timed('stylist')
     def filter_by_category(self, categories: List[str]) -> List[Dict]:
         """Filter products by category"""
         if not categories:
             return self.products
         
-        filtered = []
-        for product in self.products:
-            product_category = product.get('category', '').lower()
-            if any(cat.lower() in product_category for cat in categories):
-                filtered.append(product)
-        
-        return filtered
+        return self.products_for_ids(self.filter_ids(categories=categories))
     
+    @REGISTRY.timed('stylist')
     def filter_by_brand(self, brands: List[str]) -> List[Dict]:
         """Filter products by brand"""
         if not brands:
             return self.products
         
-        filtered = []
-        for product in self.products:
-            product_brand = product.get('brand', '').lower()
-            if any(brand.lower() in product_brand for brand in brands):
-                filtered.append(product)
-        
-        return filtered
+        return self.products_for_ids(self.filter_ids(brands=brands))
     
+    @REGISTRY.timed('stylist')
     def get_recommendations(self, 
                           style_preferences: List[str] = None,
                           occasions: List[str] = None,
                           categories: List[str] = None,
                           brands: List[str] = None,
-                          max_items: int = 6) -> List[Dict]:
-        """Get product recommendations based on filters"""
+                          max_items: int = 6,
+                          colors: List[str] = None,
+                          materials: List[str] = None,
+                          price_range: Tuple[Optional[float], Optional[float]] = None,
+                          seed: int = 0) -> List[Dict]:
+        """Get product recommendations based on filters
+        
+        price_range is (min, max) in dollars; either bound may be None. Results are ranked
+        by relevance (see relevance) with ties broken by seed, so the same query and seed
+        always return the same products in the same order.
+        """
+        
+        product_ids, relevance = self.candidates({
+            'style_preferences': style_preferences,
+            'occasions': occasions,
+            'categories': categories,
+            'brands': brands,
+            'colors': colors,
+            'materials': materials,
+            'price_range': price_range
+        })
+        return self.products_for_ids(top_ranked(product_ids, relevance, max_items, seed))
+    
+    @REGISTRY.timed('stylist')
+    def candidates(self, profile: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """(product IDs, relevance) of everything matching a profile's filters, before ranking
+        
+        Memoized in query_cache on the normalized filter signature and catalog version, so
+        a repeated query skips filtering and scoring entirely. The arrays are shared
+        between callers and read-only.
+        """
+        
+        signature = filter_signature(profile)
+        cached = self.query_cache.get(signature, self.catalog_version)
+        if cached is not None:
+            return cached
+        
+        filters = {key: list(value) for key, value in signature}
+        product_ids = np.asarray(self.filter_ids(**filters), dtype=np.int64)
+        REGISTRY.observe('ai_stylist_filter_selectivity', len(product_ids) / max(1, len(self.products)))
+        relevance = self.relevance(
+            product_ids,
+            filters.get('style_preferences'),
+            filters.get('occasions'),
+            filters.get('price_range')
+        )
+        product_ids.flags.writeable = False
+        relevance.flags.writeable = False
+        self.query_cache.put(signature, (product_ids, relevance), self.catalog_version)
+        return product_ids, relevance
+    
+    def relevance(self,
+                  product_ids: List[int],
+                  style_preferences: List[str] = None,
+                  occasions: List[str] = None,
+                  price_range: Tuple[Optional[float], Optional[float]] = None) -> np.ndarray:
+        """Relevance of each filtered product: how many of the requested tags it carries, plus price fit
         
-        # Start with all products
-        filtered_products = self.products.copy()
+        Every filtered product matches at least one requested style and occasion, so only
+        requests naming several of either separate products by tag count.
+        """
+        
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        relevance = np.zeros(len(product_ids))
+        if not len(product_ids):
+            return relevance
+        
+        for key, values in (('style_preferences', style_preferences), ('occasions', occasions)):
+            if values and len(values) > 1:
+                for value in values:
+                    matching = np.asarray(self.filter_ids(**{key: [value]}), dtype=np.int64)
+                    relevance += np.isin(product_ids, matching, assume_unique=True)
+        
+        if price_range:
+            if isinstance(self.products, CatalogStore) and isinstance(self.products.column('price'), PriceColumn):
+                cents = np.asarray(self.products.column('price').cents)[product_ids]
+            else:
+                cents = np.array([parse_price_cents(self.products[i].get('price')) for i in product_ids.tolist()])
+            relevance += price_fit(cents, price_range)
+        return relevance
+    
+    def filter_ids(self,
+                   style_preferences: List[str] = None,
+                   occasions: List[str] = None,
+                   categories: List[str] = None,
+                   brands: List[str] = None,
+                   colors: List[str] = None,
+                   materials: List[str] = None,
+                   price_range: Tuple[Optional[float], Optional[float]] = None) -> List[int]:
+        """Resolve filters to sorted product IDs"""
+        
+        if isinstance(self.products, CatalogStore):
+            # Columnar catalog: every predicate is a boolean mask, combined in one vectorized pass
+            mask = self.products.filter_mask(
+                style_preferences=style_preferences,
+                occasions=occasions,
+                categories=categories,
+                brands=brands,
+                colors=colors,
+                materials=materials,
+                price_range=price_range
+            )
+            return mask.nonzero()[0].tolist()
         
-        # Apply filters
+        # Collect the postings of every active filter and let the index plan the intersection
+        predicates = []
         if style_preferences:
-            filtered_products = [p for p in filtered_products if p in self.filter_by_style(style_preferences)]
+            predicates.append(self.index.postings_for('style_tags', style_preferences))
         
         if occasions:
-            filtered_products = [p for p in filtered_products if p in self.filter_by_occasion(occasions)]
+            predicates.append(self.index.postings_for('occasion_tags', occasions))
         
-        if categories:
-            filtered_products = [p for p in filtered_products if p in self.filter_by_category(categories)]
+        for field, values in (('category', categories), ('brand', brands),
+                              ('color', colors), ('material', materials)):
+            if values:
+                predicates.append(self.index.postings_for(field, values, substring=True))
         
-        if brands:
-            filtered_products = [p for p in filtered_products if p in self.filter_by_brand(brands)]
+        product_ids = self.index.query(predicates)
         
-        # Shuffle and limit results
-        random.shuffle(filtered_products)
-        return filtered_products[:max_items]
+        if price_range:
+            min_price, max_price = price_range
+            # Unparseable prices (-1 cents) never fall inside a range
+            min_cents = 0 if min_price is None else max(0, int(round(min_price * 100)))
+            max_cents = float('inf') if max_price is None else int(round(max_price * 100))
+            product_ids = [
+                i for i in product_ids
+                if min_cents <= parse_price_cents(self.products[i].get('price')) <= max_cents
+            ]
+        
+        return product_ids
     
+    @REGISTRY.timed('stylist')
     def create_outfit(self, 
                      style_preference: str = "casual",
                      occasion: str = "everyday",
-                     max_items: int = 3) -> List[Dict]:
+                     max_items: int = 3,
+                     seed: int = 0) -> List[Dict]:
         """Create a complete outfit recommendation"""
         
-        # Try to get items from different categories for a complete outfit
-        outfit_categories = ['tops', 'bottoms', 'accessories', 'shoes', 'outerwear']
-        outfit = []
-        
-        for category in outfit_categories:
-            if len(outfit) >= max_items:
-                break
-                
-            items = self.get_recommendations(
-                style_preferences=[style_preference],
-                occasions=[occasion],
-                categories=[category],
-                max_items=1
-            )
+        outfits = self.create_outfits(style_preference, occasion, max_items, top_k=1, seed=seed)
+        return outfits[0]['items'] if outfits else []
+    
+    def recommend_batch(self, profiles: Iterable[Dict], seed: int = 0) -> Iterator[Dict]:
+        """Recommendations for many customer profiles, yielded one per profile in input order
+        
+        A profile holds get_recommendations arguments (style_preferences, occasions, ...,
+        price_range, max_items) plus an optional customer_id. Profiles with the same
+        filters share one filter and relevance pass (see candidates); each is then ranked
+        with its own seed.
+        """
+        
+        for position, profile in enumerate(profiles):
+            picks = top_ranked(*self.candidates(profile), profile.get('max_items', 6), customer_seed(profile, position, seed))
+            yield {
+                "customer_id": profile.get('customer_id', position),
+                "recommendations": [dict(p) for p in self.products_for_ids(picks)]
+            }
+    
+    def create_outfits_batch(self, profiles: Iterable[Dict], seed: int = 0) -> Iterator[Dict]:
+        """Outfits for many customer profiles, yielded one per profile in input order
+        
+        A profile holds create_outfits arguments (style_preference, occasion, max_items,
+        top_k, budget) plus an optional customer_id. Slot scoring is shared by every
+        profile with the same style and occasion.
+        """
+        
+        resolved: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        for position, profile in enumerate(profiles):
+            style = profile.get('style_preference', 'casual')
+            occasion = profile.get('occasion', 'everyday')
+            slot_scores = resolved.get((style, occasion))
+            if slot_scores is None:
+                slot_scores = resolved[(style, occasion)] = self.outfit_engine.slot_scores(style, occasion)
+                if len(resolved) > BATCH_SIGNATURE_CACHE:
+                    resolved.popitem(last=False)
             
-            if items:
-                outfit.extend(items)
-        
-        # If we don't have enough items, fill with general recommendations
-        if len(outfit) < max_items:
-            additional_items = self.get_recommendations(
-                style_preferences=[style_preference],
-                occasions=[occasion],
-                max_items=max_items - len(outfit)
+            outfits = self.outfit_engine.outfits(
+                style, occasion,
+                max_items=profile.get('max_items', 3),
+                top_k=profile.get('top_k', 1),
+                budget=profile.get('budget'),
+                rng=customer_rng(profile, position, seed),
+                slot_scores=slot_scores
             )
-            
-            # Avoid duplicates
-            for item in additional_items:
-                if item not in outfit:
-                    outfit.append(item)
-                    if len(outfit) >= max_items:
-                        break
+            for outfit in outfits:
+                outfit['items'] = [dict(p) for p in outfit['items']]
+            yield {"customer_id": profile.get('customer_id', position), "outfits": outfits}
+    
+    @REGISTRY.timed('stylist')
+    def create_outfits(self,
+                       style_preference: str = "casual",
+                       occasion: str = "everyday",
+                       max_items: int = 3,
+                       top_k: int = 3,
+                       budget: Optional[float] = None,
+                       seed: int = 0) -> List[Dict]:
+        """Create the top_k alternative outfits, best first
         
-        return outfit
+        Each outfit is {"items": [...], "score": float, "total_price": float}; budget caps
+        the total price in dollars. Ties are broken by seed, so the same request and seed
+        always return the same outfits. See outfit_engine.OutfitEngine.
+        """
+        return self.outfit_engine.outfits(style_preference, occasion, max_items, top_k, budget, seed=seed)
     
-    def get_ai_styling_advice(self, user_input: str) -> str:
-        """Get personalized styling advice using GPT-4"""
+    @REGISTRY.timed('stylist')
+    def relevant_products(self, user_input: str, k: int = 8) -> List[Dict]:
+        """The k catalog products most relevant to a question (BM25 over name, description and tags)
+        
+        Falls back to a random sample when no product shares a term with the question.
+        """
+        product_ids = self.retriever.search(user_input, k)
+        if not product_ids:
+            return random.sample(self.products, min(5, len(self.products)))
+        return self.products_for_ids(product_ids)
+    
+    def build_advice_messages(self, user_input: str, context_tokens: int = 300) -> List[Dict]:
+        """Build the chat messages for a styling advice request
         
-        # Get some sample products for context
-        sample_products = random.sample(self.products, min(5, len(self.products)))
-        product_context = "\n".join([
+        The product context holds the catalog items most relevant to the question,
+        best first, trimmed to roughly context_tokens tokens.
+        """
+        
+        product_lines = [
             f"- {p.get('name', 'Unknown')} by {p.get('brand', 'Unknown')} ({p.get('category', 'Unknown')}): {p.get('description', '')}"
-            for p in sample_products
-        ])
+            for p in self.relevant_products(user_input)
+        ]
+        product_context = "\n".join(select_within_budget(product_lines, context_tokens) or product_lines[:1])
         
         prompt = f"""
         You are a professional fashion stylist. A user is asking for styling advice.
@@ -177,50 +583,147 @@ class AIStyler:
         Keep your response conversational and helpful, around 2-3 paragraphs.
         """
         
+        return [
+            {"role": "system", "content": "You are a knowledgeable and friendly fashion stylist who gives practical, personalized advice."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    @REGISTRY.timed('stylist')
+    def get_ai_styling_advice(self, user_input: str) -> str:
+        """Get personalized styling advice using GPT-4
+        
+        Answers are cached per catalog version; repeated or near-identical questions
+        are served from the advice cache without calling the API.
+        """
+        
+        cached = self.advice_cache.get(user_input, self.catalog_version)
+        if cached is not None:
+            return cached
+        
+        try:
+            messages = self.build_advice_messages(user_input)
+            with REGISTRY.time('openai_request_seconds', caller='advice'):
+                response = self.client.chat.completions.create(
+                    model="gpt-4",
+                    messages=messages,
+                    max_tokens=400,
+                    temperature=0.7
+                )
+            REGISTRY.record_usage('advice', response.usage)
+            
+            advice = response.choices[0].message.content.strip()
+            self.advice_cache.put(user_input, advice, self.catalog_version)
+            return advice
+            
+        except Exception as e:
+            REGISTRY.inc('openai_errors_total', caller='advice', error=type(e).__name__)
+            return advice_error_message(e)
+    
+    def stream_ai_styling_advice(self, user_input: str) -> Iterator[str]:
+        """Yield styling advice token by token as GPT-4 generates it
+        
+        Cached answers are yielded in one piece; a completed stream is added to the cache.
+        """
+        
+        cached = self.advice_cache.get(user_input, self.catalog_version)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
         try:
-            response = self.client.chat.completions.create(
+            messages = self.build_advice_messages(user_input)
+            start = time.perf_counter()
+            stream = self.client.chat.completions.create(
                 model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a knowledgeable and friendly fashion stylist who gives practical, personalized advice."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 max_tokens=400,
-                temperature=0.7
+                temperature=0.7,
+                stream=True
             )
             
-            return response.choices[0].message.content.strip()
+            for event in stream:
+                # Only reported in a final chunk when the server includes usage in streams
+                REGISTRY.record_usage('advice_stream', getattr(event, 'usage', None))
+                if not event.choices:
+                    continue
+                token = event.choices[0].delta.content
+                if token:
+                    if not chunks:
+                        REGISTRY.observe('openai_first_token_seconds', time.perf_counter() - start, caller='advice_stream')
+                    chunks.append(token)
+                    yield token
+            REGISTRY.observe('openai_request_seconds', time.perf_counter() - start, caller='advice_stream')
             
         except Exception as e:
-            return f"I'd love to help with styling advice! However, I'm having trouble accessing my AI assistant right now. Please make sure your OpenAI API key is configured correctly. Error: {e}"
+            REGISTRY.inc('openai_errors_total', caller='advice_stream', error=type(e).__name__)
+            yield advice_error_message(e)
+            return
+        
+        advice = "".join(chunks).strip()
+        if advice:
+            self.advice_cache.put(user_input, advice, self.catalog_version)
     
+    @REGISTRY.timed('stylist')
     def get_available_styles(self) -> List[str]:
         """Get all available style tags from the catalog"""
-        styles = set()
-        for product in self.products:
-            styles.update(product.get('style_tags', []))
-        return sorted(list(styles))
+        return self.facets.values('style_preferences')
     
+    @REGISTRY.timed('stylist')
     def get_available_occasions(self) -> List[str]:
         """Get all available occasion tags from the catalog"""
-        occasions = set()
-        for product in self.products:
-            occasions.update(product.get('occasion_tags', []))
-        return sorted(list(occasions))
+        return self.facets.values('occasions')
     
+    @REGISTRY.timed('stylist')
     def get_available_categories(self) -> List[str]:
         """Get all available categories from the catalog"""
-        categories = set()
-        for product in self.products:
-            category = product.get('category', '')
-            if category:
-                categories.add(category)
-        return sorted(list(categories))
+        return self.facets.values('categories')
     
+    @REGISTRY.timed('stylist')
     def get_available_brands(self) -> List[str]:
         """Get all available brands from the catalog"""
-        brands = set()
-        for product in self.products:
-            brand = product.get('brand', '')
-            if brand:
-                brands.add(brand)
-        return sorted(list(brands))
\ No newline at end of file
+        return self.facets.values('brands')
+    
+    @REGISTRY.timed('stylist')
+    def get_available_colors(self) -> List[str]:
+        """Get all available colors from the catalog"""
+        return self.facets.values('colors')
+    
+    @REGISTRY.timed('stylist')
+    def get_available_materials(self) -> List[str]:
+        """Get all available materials from the catalog"""
+        return self.facets.values('materials')
+    
+    @REGISTRY.timed('stylist')
+    def facet_counts(self, selection: Optional[Dict] = None) -> Dict[str, Dict[str, int]]:
+        """Value -> product count for every facet, given the current filter selection
+        
+        selection holds get_recommendations filters (style_preferences, occasions, ...,
+        price_range). Each facet is counted over the products matching the selection in
+        all the other facets, so the count beside an option is how many products selecting
+        it would add; values with no such products are left out. Without a selection the
+        counts come straight from the facet index.
+        """
+        
+        selection = selection or {}
+        counts = {}
+        for facet in FACET_FIELDS:
+            others = {key: value for key, value in selection.items() if key != facet and value}
+            if not others:
+                counts[facet] = self.facets.counts(facet)
+            else:
+                counts[facet] = self.facets.counts(facet, self.candidates(others)[0])
+        return counts
+    
+    @REGISTRY.timed('stylist')
+    def get_price_bounds(self) -> Tuple[float, float]:
+        """Get the lowest and highest parseable price in dollars (computed once per snapshot)"""
+        if self.price_bounds is None:
+            column = self.products.column('price') if isinstance(self.products, CatalogStore) else None
+            if isinstance(column, PriceColumn):
+                cents = column.cents[column.cents >= 0]
+            else:
+                cents = np.array([parse_price_cents(product.get('price')) for product in self.products], dtype=np.int64)
+                cents = cents[cents >= 0]
+            self.price_bounds = (int(cents.min()) / 100, int(cents.max()) / 100) if len(cents) else (0.0, 0.0)
+        return self.price_bounds
\ No newline at end of file
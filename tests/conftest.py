@@ -0,0 +1,21 @@
+"""
+Shared fixtures - a small synthetic catalog and a dummy OpenAI key (no test talks to the API)
+"""
+import json
+import pytest
+from create_sample_data import create_synthetic_catalog
+
+
+@pytest.fixture
+def catalog_file(tmp_path, monkeypatch):
+    """A 300-product synthetic catalog as JSONL"""
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    path = str(tmp_path / 'catalog.jsonl')
+    create_synthetic_catalog(300, path, 7)
+    return path
+
+
+@pytest.fixture
+def products(catalog_file):
+    with open(catalog_file, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
@@ -0,0 +1,27 @@
+"""
+AdviceCache - exact and near-duplicate reuse of styling advice
+"""
+from advice_cache import AdviceCache
+
+
+def test_near_duplicate_question_reuses_answer():
+    cache = AdviceCache()
+    cache.put("What to wear for date night", "A silk slip dress")
+    assert cache.get("what to wear for date night?") == "A silk slip dress"
+    assert cache.get("What to wear for a date night") == "A silk slip dress"
+    assert cache.stats()['exact_hits'] == 1 and cache.stats()['semantic_hits'] == 1
+
+
+def test_negated_question_is_a_miss():
+    cache = AdviceCache()
+    cache.put("what to wear for date night", "A silk slip dress")
+    assert cache.get("what not to wear for date night") is None
+    assert cache.get("what shouldn't I wear for date night") is None
+    cache.put("what not to wear for date night", "Gym shorts")
+    assert cache.get("what to wear for date night") == "A silk slip dress"
+
+
+def test_catalog_version_is_part_of_the_key():
+    cache = AdviceCache()
+    cache.put("what to wear for date night", "A silk slip dress", catalog_version='v1')
+    assert cache.get("what to wear for date night", catalog_version='v2') is None
@@ -0,0 +1,92 @@
+"""
+AIStyler.refresh - a refreshed snapshot numbers products exactly as a fresh load of the file does
+"""
+import json
+import os
+import pytest
+from create_sample_data import create_synthetic_catalog
+from query_cache import QueryCache
+from stylist_backend import AIStyler
+
+PROFILES = [
+    {'style_preferences': ['casual']},
+    {'occasions': ['workout'], 'max_items': 10},
+    {'categories': ['top'], 'price_range': (20, 120)},
+    {}
+]
+
+
+@pytest.fixture
+def catalog_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    path = str(tmp_path / 'catalog.jsonl')
+    create_synthetic_catalog(300, path, 7)
+    return path
+
+
+def edit_catalog(path: str):
+    """Remove, edit, insert and append products, bumping the file's mtime"""
+    with open(path, encoding='utf-8') as f:
+        products = [json.loads(line) for line in f]
+    del products[5]
+    products[10] = dict(products[10], name=products[10]['name'] + ' II', price='$1')
+    products.insert(3, dict(products[0], name='Inserted Product'))
+    products.append(dict(products[1], name='Appended Product'))
+    with open(path, 'w', encoding='utf-8') as f:
+        for product in products:
+            f.write(json.dumps(product) + '\n')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def warm(stylist: AIStyler):
+    """Build every lazy index so refresh carries them over instead of leaving them lazy"""
+    stylist.retriever, stylist.text_index
+    stylist.outfit_engine.slot_ids
+    stylist.facet_counts()
+
+
+def results(stylist: AIStyler):
+    return {
+        'recommendations': [[dict(p) for p in stylist.get_recommendations(**profile, seed=3)] for profile in PROFILES],
+        'search': stylist.search_catalog('product').tolist(),
+        'fuzzy': stylist.search_catalog('prodcut', typo_tolerant=True).tolist(),
+        'relevant': [dict(p) for p in stylist.relevant_products('comfortable running shoes')],
+        'outfits': list(stylist.create_outfits_batch([{'style_preference': 'casual', 'top_k': 3}], seed=3)),
+        'facets': stylist.facet_counts(),
+    }
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_refresh_matches_fresh_load(catalog_file, columnar):
+    stylist = AIStyler(catalog_file, columnar=columnar)
+    warm(stylist)
+    before = results(stylist)
+    edit_catalog(catalog_file)
+
+    refreshed = stylist.refresh()
+    fresh = AIStyler(catalog_file, columnar=columnar)
+    assert refreshed.last_change['added'] == 3 and refreshed.last_change['removed'] == 2
+    assert [dict(p) for p in refreshed.products] == [dict(p) for p in fresh.products]
+    assert results(refreshed) == results(fresh)
+    # The old snapshot still serves the catalog it was loaded with
+    assert results(stylist) == before
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_shared_query_cache_across_refresh_and_reload(catalog_file, columnar):
+    cache = QueryCache()
+    stylist = AIStyler(catalog_file, columnar=columnar, query_cache=cache)
+    warm(stylist)
+    edit_catalog(catalog_file)
+
+    refreshed = stylist.refresh()
+    # Fills the shared cache under the new file's version...
+    from_refresh = [[dict(p) for p in refreshed.get_recommendations(**profile, seed=3)] for profile in PROFILES]
+    # ...which a full reload of the same file then reads back
+    reloaded = AIStyler(catalog_file, columnar=columnar, query_cache=cache)
+    from_reload = [[dict(p) for p in reloaded.get_recommendations(**profile, seed=3)] for profile in PROFILES]
+    uncached = AIStyler(catalog_file, columnar=columnar)
+    expected = [[dict(p) for p in uncached.get_recommendations(**profile, seed=3)] for profile in PROFILES]
+    assert from_refresh == expected
+    assert from_reload == expected
@@ -0,0 +1,27 @@
+"""
+CatalogStore - the columnar catalog reads back the products it was built from and filters like the list catalog
+"""
+import pytest
+from catalog_store import CatalogStore
+from stylist_backend import AIStyler
+from test_filtering import FILTERS, scan
+
+
+def test_rows_equal_products(products):
+    store = CatalogStore.from_records(products)
+    assert len(store) == len(products)
+    assert [row.copy() for row in store] == products
+    assert store[-1] == products[-1]
+
+
+def test_saved_store_reads_back(tmp_path, products):
+    path = str(tmp_path / 'catalog.catalog')
+    CatalogStore(products).save(path)
+    assert [row.copy() for row in CatalogStore.open(path)] == products
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_columnar_filters_match_scan(catalog_file, products, filters):
+    stylist = AIStyler(catalog_file, columnar=True)
+    assert isinstance(stylist.products, CatalogStore)
+    assert stylist.filter_ids(**filters) == scan(products, **filters)
@@ -0,0 +1,29 @@
+"""
+Compiled catalogs - opened in place of the JSON while current, ignored once the source changes
+"""
+import json
+from catalog_store import open_compiled, write_catalog_with_compiled
+from stylist_backend import AIStyler
+
+
+def test_compiled_copy_is_used_until_source_changes(tmp_path, products):
+    catalog_file = str(tmp_path / 'catalog_enriched.json')
+    write_catalog_with_compiled(catalog_file, products)
+
+    store = open_compiled(catalog_file)
+    assert store is not None
+    assert [row.copy() for row in store] == products
+
+    with open(catalog_file, 'w', encoding='utf-8') as f:
+        json.dump(products[:-1], f)
+    assert open_compiled(catalog_file) is None
+
+
+def test_columnar_styler_opens_compiled_copy(tmp_path, monkeypatch, products):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    catalog_file = str(tmp_path / 'catalog_enriched.json')
+    write_catalog_with_compiled(catalog_file, products)
+
+    stylist = AIStyler(catalog_file, columnar=True)
+    assert stylist.products.source is not None
+    assert [row.copy() for row in stylist.products] == products
@@ -0,0 +1,70 @@
+"""
+Enrichment tag cache - re-runs only tag new or changed products
+"""
+import json
+from enrich_with_gpt import FallbackTags, ProductEnricher
+from enrichment_cache import EnrichmentCache, content_hash
+
+TAGS = {"style_tags": ["casual"], "occasion_tags": ["everyday"]}
+
+
+def test_cache_round_trip(tmp_path, products):
+    cache = EnrichmentCache(str(tmp_path / 'cache.db'))
+    keys = [content_hash(product) for product in products[:3]]
+    cache.put_many({keys[0]: TAGS, keys[1]: {"style_tags": ["sporty"], "occasion_tags": []}})
+    assert cache.get_many(keys) == {keys[0]: TAGS, keys[1]: {"style_tags": ["sporty"], "occasion_tags": []}}
+    cache.close()
+
+    # Tags outlive the connection
+    assert EnrichmentCache(str(tmp_path / 'cache.db')).get_many(keys[:1]) == {keys[0]: TAGS}
+
+
+def test_hash_covers_only_prompt_fields(products):
+    product = products[0]
+    assert content_hash({**product, "price": "$1.00"}) == content_hash(product)
+    assert content_hash({**product, "description": "changed"}) != content_hash(product)
+
+
+class Tagger:
+    """Stands in for the GPT-4 calls, recording which products were sent"""
+
+    def __init__(self, fail=()):
+        self.tagged = []
+        self.fail = set(fail)
+
+    def __call__(self, items, batch_size=1, on_batch=None):
+        tags_by_id = {}
+        for product_id, product in items:
+            self.tagged.append(product['name'])
+            tags_by_id[product_id] = FallbackTags(TAGS) if product['name'] in self.fail else dict(TAGS)
+        if on_batch:
+            on_batch(tags_by_id)
+        return tags_by_id
+
+
+def enrich(tmp_path, monkeypatch, catalog, fail=()):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    input_file = str(tmp_path / 'catalog.json')
+    output_file = str(tmp_path / 'catalog_enriched.json')
+    with open(input_file, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f)
+
+    enricher = ProductEnricher()
+    tagger = Tagger(fail)
+    monkeypatch.setattr(enricher, 'tag_sequential', tagger)
+    enricher.enrich_catalog(input_file, output_file, cache_file=str(tmp_path / 'cache.db'))
+    with open(output_file, encoding='utf-8') as f:
+        return tagger.tagged, json.load(f)
+
+
+def test_rerun_tags_only_changed_products(tmp_path, monkeypatch, products):
+    catalog = [dict(product, name=f"Product {i}") for i, product in enumerate(products[:20])]
+    tagged, enriched = enrich(tmp_path, monkeypatch, catalog, fail={"Product 3"})
+    assert sorted(tagged) == sorted(product['name'] for product in catalog)
+    assert all(product['style_tags'] == ["casual"] for product in enriched)
+
+    catalog[5] = dict(catalog[5], description="A different description")
+    tagged, enriched = enrich(tmp_path, monkeypatch, catalog)
+    # Fallback tags were not cached, so the failed product is retried along with the edited one
+    assert sorted(tagged) == ["Product 3", "Product 5"]
+    assert [product['name'] for product in enriched] == [product['name'] for product in catalog]
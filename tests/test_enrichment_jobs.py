@@ -0,0 +1,84 @@
+"""
+Enrichment jobs - queue states, cancellation and resuming a cancelled run
+"""
+import json
+import time
+import pytest
+from enrich_with_gpt import ProductEnricher
+from enrichment_jobs import (ACTIVE_STATES, CANCELLED, CANCELLING, COMPLETED, QUEUED, RUNNING, STALE_SECONDS,
+                             EnrichmentWorker, JobQueue)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'))
+
+
+def test_queued_job_cancels_immediately(queue):
+    job_id = queue.submit(input_file='catalog.json')
+    assert queue.get(job_id)['status'] == QUEUED
+    assert queue.cancel(job_id)
+    assert queue.get(job_id)['status'] == CANCELLED
+    assert not queue.cancel(job_id)
+    assert queue.claim() is None
+
+
+def test_unknown_parameters_are_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit(input_file='catalog.json', temperature=0.3)
+
+
+def test_one_job_runs_at_a_time(queue):
+    first, second = queue.submit(), queue.submit()
+    assert queue.claim()['id'] == first
+    assert queue.claim() is None
+
+    assert queue.cancel(first)
+    assert queue.get(first)['status'] == CANCELLING
+    assert queue.cancel_requested(first)
+    assert queue.get(second)['status'] in ACTIVE_STATES
+
+
+def test_job_of_dead_worker_is_requeued(queue):
+    job_id = queue.submit()
+    queue.claim()
+    with queue.connect() as connection:
+        connection.execute("UPDATE jobs SET heartbeat_at = ?", (time.time() - STALE_SECONDS - 1,))
+    assert queue.claim()['id'] == job_id
+    assert queue.get(job_id)['status'] == RUNNING
+
+
+def test_cancelled_run_stops_and_resumes(tmp_path, monkeypatch, queue, products):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.chdir(tmp_path)
+    with open('catalog.json', 'w', encoding='utf-8') as f:
+        json.dump(products[:20], f)
+    params = dict(input_file='catalog.json', output_file='catalog_enriched.json', checkpoint_every=5)
+    job_id = queue.submit(**params)
+    tagged = []
+
+    def tag_sequential(self, items, batch_size=1, on_batch=None):
+        all_tags = {}
+        for product_id, _ in items:
+            tagged.append(product_id)
+            if len(tagged) == 8:
+                # Cancelled from the app while the second window is being tagged
+                queue.cancel(job_id)
+            all_tags[product_id] = {"style_tags": ["casual"], "occasion_tags": ["everyday"]}
+            on_batch({product_id: all_tags[product_id]})
+        return all_tags
+
+    monkeypatch.setattr(ProductEnricher, 'tag_sequential', tag_sequential)
+    worker = EnrichmentWorker(queue)
+    worker.run_job(queue.claim())
+    job = queue.get(job_id)
+    assert job['status'] == CANCELLED
+    assert job['total'] == 20 and job['processed'] < 20
+
+    resumed_id = queue.submit(**params)
+    worker.run_job(queue.claim())
+    job = queue.get(resumed_id)
+    assert job['status'] == COMPLETED
+    assert (job['resumed_from'], job['processed'], job['total']) == (5, 20, 20)
+    with open('catalog_enriched.json', encoding='utf-8') as f:
+        assert [product['name'] for product in json.load(f)] == [product['name'] for product in products[:20]]
@@ -0,0 +1,79 @@
+"""
+Enrichment output stream - checkpoint resume, compaction and streamed catalog reads
+"""
+import io
+import json
+import os
+import pytest
+import enrichment_stream
+from enrichment_stream import CheckpointedWriter, count_products, iter_json_array, iter_products
+
+
+@pytest.fixture
+def paths(tmp_path, products):
+    input_file = str(tmp_path / 'catalog.json')
+    with open(input_file, 'w', encoding='utf-8') as f:
+        json.dump(products[:10], f)
+    return input_file, str(tmp_path / 'out.json.jsonl'), str(tmp_path / 'out.json.checkpoint')
+
+
+def test_resume_from_checkpoint(paths, products):
+    input_file, stream_file, checkpoint_file = paths
+    writer = CheckpointedWriter(stream_file, checkpoint_file, input_file)
+    writer.total = 10
+    writer.append(products[:4])
+    offset = writer.stream.tell()
+    # A crash mid-write leaves a partial record after the checkpointed offset
+    writer.stream.write(b'{"name": "half a rec')
+    writer.close()
+
+    writer = CheckpointedWriter(stream_file, checkpoint_file, input_file)
+    assert (writer.completed, writer.total) == (4, 10)
+    assert os.path.getsize(stream_file) == offset
+    writer.append(products[4:10])
+
+    output_file = stream_file[:-len('.jsonl')]
+    writer.compact(output_file)
+    with open(output_file, encoding='utf-8') as f:
+        text = f.read()
+    assert json.loads(text) == products[:10]
+    assert text == json.dumps(products[:10], indent=2, ensure_ascii=False)
+    assert not os.path.exists(stream_file) and not os.path.exists(checkpoint_file)
+
+
+def test_changed_input_starts_over(paths, products):
+    input_file, stream_file, checkpoint_file = paths
+    writer = CheckpointedWriter(stream_file, checkpoint_file, input_file)
+    writer.append(products[:4])
+    writer.close()
+
+    with open(input_file, 'w', encoding='utf-8') as f:
+        json.dump(products[:12], f)
+    writer = CheckpointedWriter(stream_file, checkpoint_file, input_file)
+    assert writer.completed == 0 and writer.total is None
+    assert os.path.getsize(stream_file) == 0
+    writer.close()
+
+
+@pytest.mark.parametrize('text', [
+    '[]', ' [ ] ', '[1, "two", {"a": [3, "]"]}, null]', '[\n  {"name": "x,y"},\n  {"name": "\\"]"}\n]'
+])
+def test_json_array_streams_like_json_load(monkeypatch, text):
+    # Tiny reads so elements straddle chunk boundaries
+    monkeypatch.setattr(enrichment_stream, '_READ_CHUNK', 3)
+    assert list(iter_json_array(io.StringIO(text))) == json.loads(text)
+
+
+def test_json_array_rejects_other_documents():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"name": "x"}')))
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(io.StringIO('[{"name": "x"}')))
+
+
+def test_both_formats_read_the_same(catalog_file, products, paths):
+    input_file = paths[0]
+    assert list(iter_products(catalog_file)) == products
+    assert count_products(catalog_file) == len(products)
+    assert list(iter_products(input_file)) == products[:10]
+    assert count_products(input_file) == 10
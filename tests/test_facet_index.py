@@ -0,0 +1,53 @@
+"""
+FacetIndex - facet counts equal a count over the products themselves
+"""
+from collections import Counter
+import numpy as np
+import pytest
+from catalog_store import CatalogStore
+from facet_index import FACET_FIELDS, FacetIndex
+from stylist_backend import AIStyler
+from test_filtering import scan
+
+SELECTIONS = [
+    {'style_preferences': ['casual']},
+    {'style_preferences': ['sporty'], 'occasions': ['gym', 'running']},
+    {'categories': ['Leggings'], 'colors': ['Black'], 'price_range': (20, 120)},
+]
+
+
+def brute_counts(products, facet, product_ids=None):
+    """Each distinct non-empty value counted once per product"""
+    field = FACET_FIELDS[facet]
+    counts = Counter()
+    for product_id in range(len(products)) if product_ids is None else product_ids:
+        values = products[product_id].get(field)
+        values = values if isinstance(values, list) else [values]
+        counts.update(value for value in dict.fromkeys(values) if value)
+    return dict(counts)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_counts_match_products(products, columnar):
+    index = FacetIndex(CatalogStore(products) if columnar else products)
+    for facet in FACET_FIELDS:
+        assert index.counts(facet) == brute_counts(products, facet)
+        assert index.values(facet) == sorted(brute_counts(products, facet))
+        assert index.counts(facet, range(0, len(products), 3)) == brute_counts(products, facet, range(0, len(products), 3))
+
+
+def test_changed_catalog_counts(products):
+    changed = products[30:] + [dict(products[0], brand='New Brand', style_tags=['edgy', 'edgy'])]
+    source = np.append(np.arange(30, len(products)), -1)
+    index = FacetIndex(products).with_changes(source, changed)
+    for facet in FACET_FIELDS:
+        assert index.counts(facet) == brute_counts(changed, facet)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_selection_counts_each_facet_over_the_others(catalog_file, products, columnar, selection):
+    counts = AIStyler(catalog_file, columnar=columnar).facet_counts(selection)
+    for facet in FACET_FIELDS:
+        others = {key: value for key, value in selection.items() if key != facet}
+        assert counts[facet] == brute_counts(products, facet, scan(products, **others))
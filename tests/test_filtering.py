@@ -0,0 +1,50 @@
+"""
+AIStyler.filter_ids - the posting-list query planner agrees with a scan of the catalog
+"""
+import pytest
+from catalog_store import parse_price_cents
+from stylist_backend import AIStyler
+
+FILTERS = [
+    {},
+    {'style_preferences': ['casual']},
+    {'style_preferences': ['CASUAL', 'sporty'], 'occasions': ['gym']},
+    {'occasions': ['everyday'], 'categories': ['top'], 'brands': ['nike', 'alo']},
+    {'colors': ['black'], 'materials': ['nylon']},
+    {'categories': ['legging'], 'price_range': (20, 100)},
+    {'price_range': (None, 50)},
+    {'brands': ['no such brand']},
+]
+
+
+def scan(products, style_preferences=None, occasions=None, categories=None, brands=None,
+         colors=None, materials=None, price_range=None):
+    """The filters applied product by product"""
+    def tags(product, field, wanted):
+        return any(str(t).lower() in {w.lower() for w in wanted} for t in product.get(field) or [])
+
+    def contains(product, field, wanted):
+        return any(w.lower() in str(product.get(field, '')).lower() for w in wanted)
+
+    matches = []
+    for product_id, product in enumerate(products):
+        if style_preferences and not tags(product, 'style_tags', style_preferences):
+            continue
+        if occasions and not tags(product, 'occasion_tags', occasions):
+            continue
+        if any(values and not contains(product, field, values) for field, values in (
+                ('category', categories), ('brand', brands), ('color', colors), ('material', materials))):
+            continue
+        if price_range:
+            cents = parse_price_cents(product.get('price'))
+            low, high = price_range
+            if cents < 0 or (low is not None and cents < low * 100) or (high is not None and cents > high * 100):
+                continue
+        matches.append(product_id)
+    return matches
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_planner_matches_scan(catalog_file, products, filters):
+    stylist = AIStyler(catalog_file)
+    assert stylist.filter_ids(**filters) == scan(products, **filters)
@@ -0,0 +1,71 @@
+"""
+OutfitEngine - beam-searched outfits dress distinct areas, match the request and stay in budget
+"""
+import json
+import pytest
+from catalog_index import normalize
+from catalog_store import parse_price_cents
+from outfit_engine import OUTFIT_SLOTS, SLOT_COVERS, UNSLOTTED
+from stylist_backend import AIStyler
+
+
+def slot_of(product):
+    category = normalize(product.get('category', ''))
+    return next((slot for slot, words in OUTFIT_SLOTS if any(word in category for word in words)), UNSLOTTED)
+
+
+def tags(product, field):
+    return {tag.lower() for tag in product.get(field) or []}
+
+
+@pytest.fixture
+def stylist(catalog_file):
+    return AIStyler(catalog_file)
+
+
+@pytest.mark.parametrize('style, occasion', [('casual', 'everyday'), ('sporty', 'gym'), ('minimal', 'running')])
+def test_outfits_are_coherent(stylist, style, occasion):
+    outfits = stylist.create_outfits(style, occasion, max_items=4, top_k=3)
+    assert outfits
+    for outfit in outfits:
+        covered = set()
+        for product in outfit['items']:
+            assert not SLOT_COVERS[slot_of(product)] & covered
+            covered |= SLOT_COVERS[slot_of(product)]
+            assert style in tags(product, 'style_tags')
+            assert occasion in tags(product, 'occasion_tags')
+    assert [outfit['score'] for outfit in outfits] == sorted((outfit['score'] for outfit in outfits), reverse=True)
+
+
+def test_budget_caps_total_price(stylist):
+    for budget in (80, 150, 250):
+        outfits = stylist.create_outfits('casual', 'everyday', max_items=4, budget=budget)
+        assert outfits
+        for outfit in outfits:
+            cents = sum(max(parse_price_cents(product['price']), 0) for product in outfit['items'])
+            assert cents == round(outfit['total_price'] * 100) <= budget * 100
+
+
+def test_same_seed_same_outfits(stylist):
+    first = stylist.create_outfits('casual', 'everyday', seed=3)
+    assert stylist.create_outfits('casual', 'everyday', seed=3) == first
+
+
+def unslotted_catalog(tmp_path, monkeypatch, categories):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    path = str(tmp_path / 'catalog.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([{'name': f'Item {i}', 'category': category, 'price': '$20', 'color': 'Black',
+                    'style_tags': ['casual'], 'occasion_tags': ['everyday']}
+                   for i, category in enumerate(categories)], f)
+    return AIStyler(path)
+
+
+def test_unslotted_items_only_fill_gaps(tmp_path, monkeypatch):
+    stylist = unslotted_catalog(tmp_path, monkeypatch, ['Tops', 'Leggings', 'Yoga Blocks'])
+    outfit = stylist.create_outfit('casual', 'everyday', max_items=3)
+    assert [product['category'] for product in outfit] == ['Tops', 'Leggings', 'Yoga Blocks']
+
+    stylist = unslotted_catalog(tmp_path, monkeypatch, ['Tops', 'Leggings', 'Sneakers', 'Yoga Blocks'])
+    outfit = stylist.create_outfit('casual', 'everyday', max_items=3)
+    assert [product['category'] for product in outfit] == ['Tops', 'Leggings', 'Sneakers']
@@ -0,0 +1,81 @@
+"""
+Async enrichment under rate limits - 429 backoff and the request/token budgets
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from openai import RateLimitError
+from enrich_with_gpt import ProductEnricher, RateLimiter, TokenBucket
+
+
+class FakeCompletions:
+    """Chat completions that fail with the queued errors before answering"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        message = SimpleNamespace(content=' {"style_tags": []} ')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def rate_limit_error():
+    response = SimpleNamespace(status_code=429, headers={}, request=None)
+    return RateLimitError('rate limited', response=response, body=None)
+
+
+def enricher_with(completions, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    enricher = ProductEnricher()
+    enricher.async_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return enricher
+
+
+def test_rate_limited_request_is_retried(monkeypatch):
+    completions = FakeCompletions(rate_limit_error(), rate_limit_error())
+    enricher = enricher_with(completions, monkeypatch)
+    content = asyncio.run(enricher.acomplete_with_backoff('prompt', 50, base_delay=0))
+    assert content == '{"style_tags": []}'
+    assert completions.calls == 3
+
+
+def test_retries_give_up_after_max_retries(monkeypatch):
+    completions = FakeCompletions(*[rate_limit_error() for _ in range(3)])
+    enricher = enricher_with(completions, monkeypatch)
+    with pytest.raises(RateLimitError):
+        asyncio.run(enricher.acomplete_with_backoff('prompt', 50, max_retries=2, base_delay=0))
+    assert completions.calls == 3
+
+
+def test_other_errors_are_not_retried(monkeypatch):
+    completions = FakeCompletions(ValueError('bad request'))
+    enricher = enricher_with(completions, monkeypatch)
+    with pytest.raises(ValueError):
+        asyncio.run(enricher.acomplete_with_backoff('prompt', 50, base_delay=0))
+    assert completions.calls == 1
+
+
+def test_token_bucket_waits_once_spent():
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60) == 0
+    bucket.tokens = 0
+    assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.05)
+    # Requests larger than the bucket only wait for a full bucket
+    assert bucket.wait_time(1000) == pytest.approx(60.0, abs=0.05)
+
+
+def test_limiter_charges_both_budgets():
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=1000)
+
+    async def acquire_twice():
+        await limiter.acquire(300)
+        await limiter.acquire(300)
+
+    asyncio.run(acquire_twice())
+    assert limiter.requests.wait_time(1) > 20
+    assert limiter.tokens.wait_time(500) > 0
+    assert limiter.tokens.wait_time(400) == 0
@@ -0,0 +1,50 @@
+"""
+TrigramIndex - search results equal a lowercase substring scan of name, brand and description
+"""
+import numpy as np
+import pytest
+from text_index import SEARCH_FIELDS, PatchedTrigramIndex, TrigramIndex
+
+TERMS = ['', 'a', 'E', 'xq', 'ru', 'gg', 'legging', 'LULU', 'Sports Bra', 'made for run',
+         'stainless steel', 'tight in mesh', 'nike running', 'moisture-wicking fabric', 'no such thing']
+
+
+def scan(products, term):
+    """IDs of products with the term in a search field, one product at a time"""
+    term = term.lower()
+    return [product_id for product_id, product in enumerate(products)
+            if any(term in str(product.get(field, '') or '').lower() for field in SEARCH_FIELDS)]
+
+
+@pytest.mark.parametrize('term', TERMS)
+def test_search_matches_scan(products, term):
+    assert TrigramIndex(products).search(term).tolist() == scan(products, term)
+
+
+def test_matches_never_span_fields():
+    products = [{'name': 'Flow Tank', 'brand': 'Nike', 'description': ''}]
+    index = TrigramIndex(products)
+    assert index.search('tank').tolist() == [0]
+    assert index.search('tanknike').tolist() == []
+    assert index.search('k n').tolist() == []
+
+
+@pytest.mark.parametrize('term', TERMS)
+def test_patched_index_matches_scan(products, term):
+    changed = products[20:] + [{'name': 'Heatherglow Windbreaker', 'brand': 'Nike', 'description': 'Made for running.'}]
+    source = np.append(np.arange(20, len(products)), -1)
+    index = TrigramIndex(products).with_changes(source, changed)
+    assert isinstance(index, PatchedTrigramIndex)
+    assert index.search(term).tolist() == scan(changed, term)
+
+
+def test_misspelling_falls_back_to_near_matches(products):
+    index = TrigramIndex(products)
+    intended = scan(products, 'stainless steel')
+    assert index.search('stainles steel').tolist() == []
+
+    results = index.search('stainles steel', typo_tolerant=True).tolist()
+    # The products the user meant share the most trigrams, so they rank first
+    assert sorted(results[:len(intended)]) == intended
+    # An exact match never falls back
+    assert index.search('stainless steel', typo_tolerant=True).tolist() == intended
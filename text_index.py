@@ -0,0 +1,229 @@
+"""
+Substring search over product name, brand and description - a positional byte trigram index
+"""
+import math
+from typing import Dict, Sequence
+import numpy as np
+from catalog_diff import survivor_map
+
+# Fields a Browse Catalog search matches against
+SEARCH_FIELDS = ('name', 'brand', 'description')
+
+# Separates fields and products in the text blob; queries never contain it, so no match spans two fields
+_SEPARATOR = b'\x00'
+
+# Bytes of text per block when extracting trigrams, to bound the scratch memory
+_BUILD_CHUNK = 1 << 22
+
+# Text bytes per entry of the position -> product lookup table
+_BUCKET_BITS = 8
+
+# Share of a query's trigrams a product must contain to count as a typo-tolerant match
+FUZZY_OVERLAP = 0.5
+
+# A catalog change is applied as a removal mask plus a small index over the added products
+# until either covers this share of the catalog; then the whole index is rebuilt
+MAX_PATCHED_SHARE = 0.2
+
+_EMPTY = np.zeros(0, dtype=np.uint32)
+
+
+def search_text(product) -> bytes:
+    """Lowercased UTF-8 search text of a product, fields separated"""
+    text = '\x00'.join(str(product.get(field, '') or '') for field in SEARCH_FIELDS)
+    return text.lower().encode('utf-8')
+
+
+def trigram_codes(data: np.ndarray) -> np.ndarray:
+    """24-bit code of every byte trigram in a uint8 array"""
+    data = data.astype(np.int32)
+    return (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+
+
+def search_needle(term: str) -> bytes:
+    """The bytes a search term is matched as"""
+    return str(term or '').lower().encode('utf-8').replace(_SEPARATOR, b'')
+
+
+def rank_fuzzy(shared: np.ndarray, trigrams: int) -> np.ndarray:
+    """IDs of products sharing at least FUZZY_OVERLAP of a query's trigrams, most shared first"""
+    products = np.flatnonzero(shared >= max(1, math.ceil(FUZZY_OVERLAP * trigrams)))
+    return products[np.argsort(-shared[products], kind='stable')]
+
+
+class TrigramIndex:
+    """Byte positions of every trigram in the search text of a catalog (IDs are positions in the product list)
+
+    A query of three or more bytes takes the positions of its rarest trigram and keeps
+    those where the query trigrams covering the rest of it occur at the matching offsets, so the result
+    is exactly what a lowercase substring scan returns, without touching product text.
+    """
+
+    def __init__(self, products: Sequence[Dict]):
+        self.size = len(products)
+        texts = [search_text(p) for p in products]
+        lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=self.size)
+        self.offsets = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.blob = _SEPARATOR.join(texts) + _SEPARATOR
+        del texts
+        # First product overlapping each 256-byte bucket of text; resolving a position then takes a step or two
+        bucket_starts = np.arange(0, len(self.blob), 1 << _BUCKET_BITS, dtype=np.int64)
+        self.bucket_first = (np.searchsorted(self.offsets, bucket_starts, side='right') - 1).astype(np.int64)
+        self.build()
+
+    def build(self):
+        """Sort every (trigram, position) pair of the text once; each trigram's positions end up contiguous"""
+        data = np.frombuffer(self.blob, dtype=np.uint8)
+        parts = []
+        for start in range(0, len(data), _BUILD_CHUNK):
+            # Overlap blocks by two bytes so trigrams crossing a block boundary are kept
+            codes = trigram_codes(data[start:start + _BUILD_CHUNK + 2])
+            # Trigrams touching a separator can never be part of a query
+            keep = ((codes >> 16) != 0) & (((codes >> 8) & 0xFF) != 0) & ((codes & 0xFF) != 0)
+            parts.append((codes[keep].astype(np.int64) << 32) | (np.flatnonzero(keep) + start))
+
+        pairs = np.sort(np.concatenate(parts)) if parts else _EMPTY
+        codes = (pairs >> 32).astype(np.int32)
+        starts = np.flatnonzero(np.diff(codes, prepend=-1))
+        self.codes = codes[starts]
+        self.starts = np.append(starts, len(pairs)).astype(np.int64)
+        # Byte positions fit 32 bits for any catalog text under 4 GB, halving the index size
+        self.positions = (pairs & 0xFFFFFFFF).astype(np.uint32)
+
+    def postings(self, code: int) -> np.ndarray:
+        """Sorted byte positions where the trigram starts"""
+        i = int(np.searchsorted(self.codes, code))
+        if i < len(self.codes) and self.codes[i] == code:
+            return self.positions[self.starts[i]:self.starts[i + 1]]
+        return _EMPTY
+
+    def product_ids(self, positions: np.ndarray) -> np.ndarray:
+        """Sorted distinct IDs of the products the byte positions fall in"""
+        ids = self.bucket_first[positions >> _BUCKET_BITS]
+        while True:
+            # Step forward past products that end at or before the position
+            ahead = self.offsets[ids + 1] <= positions
+            if not ahead.any():
+                break
+            ids += ahead
+        # Positions are sorted, so duplicate IDs are adjacent
+        return ids[np.diff(ids, prepend=-1) != 0]
+
+    def search(self, term: str, typo_tolerant: bool = False) -> np.ndarray:
+        """Sorted IDs of products whose name, brand or description contains the term (case-insensitive)
+
+        With typo_tolerant, a term with no exact match falls back to products sharing most
+        of its trigrams, best overlap first.
+        """
+        needle = search_needle(term)
+        if not needle:
+            return np.arange(self.size)
+        if len(needle) < 3:
+            return self.scan(needle)
+
+        codes = trigram_codes(np.frombuffer(needle, dtype=np.uint8))
+        lists = [self.postings(c) for c in codes]
+        rarest = min(range(len(lists)), key=lambda j: len(lists[j]))
+        # Candidate match starts: where the rarest trigram occurs, shifted back to the needle start
+        matches = lists[rarest].astype(np.int64) - rarest
+        matches = matches[matches >= 0].astype(np.uint32)
+        # Trigrams at offsets 0, 3, 6, ... and the last one already cover every byte of the needle
+        cover = sorted(set(range(0, len(lists), 3)) | {len(lists) - 1})
+        for j in cover:
+            positions = lists[j]
+            if j == rarest or not len(matches):
+                continue
+            # Probe by binary search; cost follows the rarest trigram, not the catalog
+            wanted = matches + np.uint32(j)
+            found = np.searchsorted(positions, wanted)
+            matches = matches[positions[np.minimum(found, len(positions) - 1)] == wanted]
+
+        if not len(matches) and typo_tolerant:
+            return self.fuzzy(np.unique(codes))
+        return self.product_ids(matches)
+
+    def scan(self, needle: bytes) -> np.ndarray:
+        """Match one- and two-byte terms, which are shorter than a trigram, with a vectorized pass over the text"""
+        data = np.frombuffer(self.blob, dtype=np.uint8)
+        hits = data == needle[0]
+        if len(needle) == 2:
+            hits[:-1] &= data[1:] == needle[1]
+            hits[-1] = False
+        if not self.size:
+            return _EMPTY
+        # One OR-reduction per product's byte range instead of resolving every hit
+        return np.flatnonzero(np.logical_or.reduceat(hits, self.offsets[:-1]))
+
+    def fuzzy(self, codes: np.ndarray) -> np.ndarray:
+        """IDs of products containing at least FUZZY_OVERLAP of the trigrams, most shared first"""
+        shared = self.shared(codes)
+        return rank_fuzzy(shared, len(codes)) if shared.any() else _EMPTY
+
+    def shared(self, codes: np.ndarray) -> np.ndarray:
+        """How many of the trigrams each product contains"""
+        per_trigram = [self.product_ids(self.postings(c)) for c in codes]
+        if not any(len(ids) for ids in per_trigram):
+            return np.zeros(self.size, dtype=np.int64)
+        return np.bincount(np.concatenate(per_trigram), minlength=self.size)
+
+    def with_changes(self, source: np.ndarray, products: Sequence[Dict]):
+        """The index of a changed catalog (see catalog_diff.diff_catalog), leaving this one untouched
+
+        Returns a PatchedTrigramIndex over this one, or a rebuilt index once the change is too large.
+        """
+        return patched(self, survivor_map(source, self.size)[:-1], products)
+
+
+def patched(base: TrigramIndex, base_ids: np.ndarray, products: Sequence[Dict]):
+    """PatchedTrigramIndex of base for a catalog, or a fresh TrigramIndex once more than MAX_PATCHED_SHARE is patched"""
+    kept = int((base_ids >= 0).sum())
+    if len(products) - kept > MAX_PATCHED_SHARE * len(products) or \
+            base.size - kept > MAX_PATCHED_SHARE * base.size:
+        return TrigramIndex(products)
+    return PatchedTrigramIndex(base, base_ids, products)
+
+
+class PatchedTrigramIndex:
+    """A TrigramIndex of an earlier catalog with removed products masked out, plus a TrigramIndex of the added ones
+
+    Products of the base index may sit anywhere in this catalog, so matches from the
+    two indexes are mapped to this catalog's IDs and sorted together.
+    """
+
+    def __init__(self, base: TrigramIndex, base_ids: np.ndarray, products: Sequence[Dict]):
+        self.base = base
+        # Base product ID -> ID in this catalog, -1 for removed products
+        self.base_ids = base_ids
+        from_base = np.zeros(len(products), dtype=bool)
+        from_base[base_ids[base_ids >= 0]] = True
+        # Sorted IDs in this catalog of the products in the added index
+        self.added_ids = np.flatnonzero(~from_base)
+        self.added = TrigramIndex([products[i] for i in self.added_ids.tolist()])
+        self.size = len(products)
+
+    def with_changes(self, source: np.ndarray, products: Sequence[Dict]):
+        """The index of a further changed catalog; rebuilt from scratch once too much of it is patched"""
+        return patched(self.base, survivor_map(source, self.size)[self.base_ids], products)
+
+    def combine(self, base_matches: np.ndarray, added_matches: np.ndarray) -> np.ndarray:
+        """Sorted IDs in this catalog of matches from the base and added indexes"""
+        ids = self.base_ids[base_matches]
+        return np.sort(np.concatenate([ids[ids >= 0], self.added_ids[added_matches]]))
+
+    def search(self, term: str, typo_tolerant: bool = False) -> np.ndarray:
+        """Same results as TrigramIndex.search on the whole catalog"""
+        needle = search_needle(term)
+        if not needle:
+            return np.arange(self.size)
+        matches = self.combine(self.base.search(term), self.added.search(term))
+        if len(matches) or not typo_tolerant or len(needle) < 3:
+            return matches
+
+        codes = np.unique(trigram_codes(np.frombuffer(needle, dtype=np.uint8)))
+        shared = np.zeros(self.size, dtype=np.int64)
+        base_shared = self.base.shared(codes)
+        alive = self.base_ids >= 0
+        shared[self.base_ids[alive]] = base_shared[alive]
+        shared[self.added_ids] = self.added.shared(codes)
+        return rank_fuzzy(shared, len(codes)) if shared.any() else _EMPTY
@@ -0,0 +1,99 @@
+"""
+Local text vectors - hashed word and character n-gram features, no model or network needed
+"""
+import re
+import zlib
+from typing import Dict, Iterable, List
+import numpy as np
+
+DEFAULT_DIM = 512
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Function words carry no meaning for matching questions or products
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me my of on or should
+so the to what when where which with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric word tokens"""
+    return _TOKEN_PATTERN.findall(str(text or '').lower())
+
+
+def features(text: str) -> List[str]:
+    """Word unigrams, word bigrams and in-word character trigrams of the non-stopword tokens"""
+    words = [w for w in tokenize(text) if w not in STOPWORDS]
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return grams
+
+
+def hash_embed(text: str, dim: int = DEFAULT_DIM) -> np.ndarray:
+    """L2-normalized signed feature-hashing vector of a text (stable across processes)"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for gram in features(text):
+        h = zlib.crc32(gram.encode('utf-8'))
+        vector[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def hash_embed_many(texts: Iterable[str], dim: int = DEFAULT_DIM, block_size: int = 4096) -> np.ndarray:
+    """hash_embed for many texts at once, as rows of one float32 matrix
+
+    Catalog texts repeat most of their words, so the grams of each distinct word (and
+    word pair) are generated and hashed once, then reused. Rows are accumulated a block
+    at a time to bound the scratch memory.
+    """
+    # Words never contain '_', so word pairs can share the cache under "first_second"
+    cache: Dict[str, List[int]] = {}
+
+    def buckets(grams: List[str]) -> List[int]:
+        # Column in the high bits, sign in bit 0 - the same split hash_embed makes
+        hashes = [zlib.crc32(g.encode('utf-8')) for g in grams]
+        return [((h % dim) << 1) | ((h >> 31) & 1) for h in hashes]
+
+    def accumulate(rows: List[int], codes: List[int], count: int) -> np.ndarray:
+        codes = np.asarray(codes, dtype=np.int64)
+        cells = np.asarray(rows, dtype=np.int64) * dim + (codes >> 1)
+        block = np.bincount(cells, weights=np.where(codes & 1, 1.0, -1.0), minlength=count * dim)
+        return block.astype(np.float32).reshape(count, dim)
+
+    texts = list(texts)
+    # Filled in place block by block, then normalized in place, so the rows exist only once
+    matrix = np.empty((len(texts), dim), dtype=np.float32)
+    start = 0
+    rows, codes = [], []
+    count = 0
+    for text in texts:
+        words = [w for w in tokenize(text) if w not in STOPWORDS]
+        for key in words + [f"{a}_{b}" for a, b in zip(words, words[1:])]:
+            found = cache.get(key)
+            if found is None:
+                if '_' in key:
+                    found = buckets([f"b:{key}"])
+                else:
+                    padded = f"#{key}#"
+                    found = buckets([f"w:{key}"] + [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)])
+                cache[key] = found
+            codes += found
+            rows += [count] * len(found)
+        count += 1
+        if count == block_size:
+            matrix[start:start + count] = accumulate(rows, codes, count)
+            start += count
+            rows, codes = [], []
+            count = 0
+    if count:
+        matrix[start:start + count] = accumulate(rows, codes, count)
+
+    for block_start in range(0, len(matrix), block_size):
+        block = matrix[block_start:block_start + block_size]
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        block /= np.where(norms > 0, norms, 1.0)
+    return matrix
@@ -0,0 +1,260 @@
+"""
+Semantic product search - hashed text vectors in an IVF (inverted file) approximate nearest-neighbor index
+"""
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from text_vectors import DEFAULT_DIM, hash_embed, hash_embed_many
+
+FORMAT_VERSION = 1
+
+# Product fields that make up the searchable text of a product
+TEXT_FIELDS = ('name', 'brand', 'category', 'color', 'material', 'style_tags', 'occasion_tags', 'description')
+
+# Below this cosine similarity a match is mostly hash collisions, not shared words
+MIN_SIMILARITY = 0.1
+
+# Vectors compared with the centroids per matrix product when assigning partitions
+_ASSIGN_CHUNK = 8192
+
+
+def product_text(product) -> str:
+    """The text a product is embedded from"""
+    parts = []
+    for field in TEXT_FIELDS:
+        value = product.get(field)
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(v) for v in value)
+        if value:
+            parts.append(str(value))
+    return ' '.join(parts)
+
+
+def product_key(product) -> str:
+    """Stable key of a product's searchable content; an edit to that content changes the key"""
+    return hashlib.sha1(product_text(product).encode('utf-8')).hexdigest()
+
+
+def vector_index_path(catalog_file: str) -> str:
+    """Where the vector index of a catalog lives (catalog_enriched.json -> catalog_enriched.vectors)"""
+    return os.path.splitext(catalog_file)[0] + '.vectors'
+
+
+def kmeans(vectors: np.ndarray, clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns unit-length centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = nearest(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Reseed empty clusters from random vectors instead of letting them collapse
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        norms[empty] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+def nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for each vector"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_CHUNK):
+        labels[start:start + _ASSIGN_CHUNK] = np.argmax(vectors[start:start + _ASSIGN_CHUNK] @ centroids.T, axis=1)
+    return labels
+
+
+class VectorIndex:
+    """IVF index of unit vectors keyed by product content key
+
+    Vectors are partitioned by their nearest k-means centroid; a query scores only the
+    vectors in its nprobe closest partitions. Removed entries are tombstoned and new
+    ones are assigned to the existing partitions, so catalog edits never re-embed the
+    whole catalog; the partitions are retrained once the index drifts too far from the
+    set it was trained on.
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM, nprobe: int = 8):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.keys: List[str] = []
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        self.trained_size = 0
+        self.rows: Dict[str, List[int]] = {}
+        self.order = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    @classmethod
+    def build(cls, products: Iterable, **kwargs) -> 'VectorIndex':
+        """Embed a catalog and train the partitions on it"""
+        index = cls(**kwargs)
+        products = list(products)
+        index.add([product_key(p) for p in products], [product_text(p) for p in products])
+        index.train()
+        return index
+
+    def train(self):
+        """(Re)partition the live vectors around about sqrt(n) k-means centroids, dropping tombstones"""
+        if not self.alive.all():
+            keep = np.flatnonzero(self.alive)
+            self.keys = [self.keys[i] for i in keep]
+            self.vectors = self.vectors[keep]
+            self.alive = np.ones(len(keep), dtype=bool)
+        size = len(self.keys)
+        clusters = min(1024, int(np.sqrt(size)))
+        if clusters < 2:
+            self.centroids = np.zeros((0, self.dim), dtype=np.float32)
+        else:
+            # Train on a sample; assigning the rest is one matrix product per chunk
+            sample = self.vectors[np.random.default_rng(0).choice(size, min(size, 50 * clusters), replace=False)]
+            self.centroids = kmeans(sample, clusters)
+        self.assignments = nearest(self.vectors, self.centroids) if len(self.centroids) else np.zeros(size, dtype=np.int32)
+        self.trained_size = size
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the key lookup and the per-partition row lists"""
+        self.rows = {}
+        for row, key in enumerate(self.keys):
+            if self.alive[row]:
+                self.rows.setdefault(key, []).append(row)
+        self.order = np.argsort(self.assignments, kind='stable')
+        self.offsets = np.searchsorted(self.assignments[self.order], np.arange(max(1, len(self.centroids)) + 1))
+
+    def add(self, keys: Sequence[str], texts: Sequence[str]):
+        """Embed and insert entries, assigning each to its nearest existing partition"""
+        if not keys:
+            return
+        vectors = hash_embed_many(texts, self.dim)
+        assignments = nearest(vectors, self.centroids) if len(self.centroids) else np.zeros(len(keys), dtype=np.int32)
+        self.keys = self.keys + list(keys)
+        # The first add (a whole catalog) takes the matrix as is rather than copying it
+        self.vectors = np.concatenate([self.vectors, vectors]) if len(self.vectors) else vectors
+        self.alive = np.concatenate([self.alive, np.ones(len(keys), dtype=bool)])
+        self.assignments = np.concatenate([self.assignments, assignments])
+        self.refresh()
+
+    def remove(self, keys: Iterable[str]):
+        """Tombstone every entry with one of the keys"""
+        alive = np.array(self.alive)
+        for key in keys:
+            for row in self.rows.pop(key, []):
+                alive[row] = False
+        self.alive = alive
+
+    def copy(self) -> 'VectorIndex':
+        """A copy that can be synced without disturbing searches on this one; arrays are shared until replaced"""
+        index = VectorIndex(self.dim, self.nprobe)
+        index.__dict__.update(self.__dict__)
+        index.rows = {key: list(rows) for key, rows in self.rows.items()}
+        return index
+
+    def sync(self, products: Sequence, keys: Optional[Sequence[str]] = None) -> Tuple[int, int]:
+        """Bring the index in line with a catalog by adding and removing only what changed
+
+        keys, if given, are the precomputed product_key of each product. Returns (added, removed). Retrains when more than a third of the stored vectors
+        are tombstones or the live set has doubled since the last training.
+        """
+        wanted: Dict[str, int] = {}
+        texts: Dict[str, str] = {}
+        if keys is None:
+            keys = [product_key(p) for p in products]
+        for product, key in zip(products, keys):
+            wanted[key] = wanted.get(key, 0) + 1
+            if wanted[key] > len(self.rows.get(key, ())) and key not in texts:
+                texts[key] = product_text(product)
+
+        # Tombstone only the surplus copies of each key (all of them for keys no longer in the catalog)
+        alive = np.array(self.alive)
+        removed = 0
+        for key in list(self.rows):
+            rows = self.rows[key]
+            surplus = len(rows) - wanted.get(key, 0)
+            if surplus > 0:
+                alive[rows[-surplus:]] = False
+                del rows[-surplus:]
+                removed += surplus
+                if not rows:
+                    del self.rows[key]
+        self.alive = alive
+
+        new_keys, new_texts = [], []
+        for key, count in wanted.items():
+            missing = count - len(self.rows.get(key, ()))
+            if missing > 0:
+                new_keys += [key] * missing
+                new_texts += [texts[key]] * missing
+        self.add(new_keys, new_texts)
+
+        live = len(self)
+        if len(self.keys) > 1.5 * live or live > 2 * max(1, self.trained_size):
+            self.train()
+        return len(new_keys), removed
+
+    def search(self, query: str, k: int = 10, min_similarity: float = MIN_SIMILARITY) -> List[Tuple[str, float]]:
+        """The k live entries most similar to the query, as (key, cosine similarity), best first"""
+        vector = hash_embed(query, self.dim)
+        if not vector.any() or not len(self.keys):
+            return []
+
+        if len(self.centroids):
+            probed = np.argsort(-(self.centroids @ vector))[:self.nprobe]
+            candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probed])
+        else:
+            candidates = np.arange(len(self.keys))
+        candidates = candidates[self.alive[candidates]]
+        if not len(candidates):
+            return []
+
+        scores = self.vectors[candidates] @ vector
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.keys[candidates[i]], float(scores[i])) for i in top if scores[i] >= min_similarity]
+
+    def save(self, path: str):
+        """Write the index as .npy arrays plus meta.json, swapped in by rename like CatalogStore.save"""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in ('vectors', 'alive', 'assignments', 'centroids'):
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "dim": self.dim,
+                "nprobe": self.nprobe,
+                "trained_size": self.trained_size,
+                "keys": self.keys
+            }, f)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str) -> 'VectorIndex':
+        """Open a saved index; the vector matrix is memory-mapped"""
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector index version {meta.get('version')} in {path}")
+        index = cls(dim=meta["dim"], nprobe=meta["nprobe"])
+        index.keys = meta["keys"]
+        index.trained_size = meta["trained_size"]
+        index.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+        for name in ('alive', 'assignments', 'centroids'):
+            setattr(index, name, np.load(os.path.join(path, f"{name}.npy")))
+        index.refresh()
+        return index